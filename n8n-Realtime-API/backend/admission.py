@@ -0,0 +1,231 @@
+import os
+import math
+import heapq
+import asyncio
+import itertools
+import logging
+from contextlib import asynccontextmanager
+from urllib.parse import urlsplit
+from typing import Dict, Any, List, Optional, Tuple, AsyncIterator
+
+from fastapi import HTTPException
+
+from backend.log import log_event
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Upstream calls in flight per webhook host (0 disables the limit)
+ADMISSION_HOST_CONCURRENCY = int(os.getenv("ADMISSION_HOST_CONCURRENCY", "20"))
+# Upstream calls in flight per session (0 disables the limit)
+ADMISSION_SESSION_CONCURRENCY = int(os.getenv("ADMISSION_SESSION_CONCURRENCY", "2"))
+# Calls allowed to wait per host (and per session) before new ones are refused
+ADMISSION_QUEUE_SIZE = int(os.getenv("ADMISSION_QUEUE_SIZE", "100"))
+# Longest a call may wait for a slot (seconds), by priority
+ADMISSION_LIVE_DEADLINE = float(os.getenv("ADMISSION_LIVE_DEADLINE", "5"))
+ADMISSION_BATCH_DEADLINE = float(os.getenv("ADMISSION_BATCH_DEADLINE", "30"))
+
+# Priorities, lowest value served first
+LIVE = 0
+BATCH = 1
+PRIORITIES = {"live": LIVE, "batch": BATCH}
+
+# Weight of the latest call in the average service time used for Retry-After
+_SERVICE_TIME_WEIGHT = 0.2
+
+class AdmissionRejected(HTTPException):
+    """
+    Raised when a call is refused instead of queued, or waited past its deadline.
+
+    429 means the session itself is sending too much; 503 means the webhook
+    host is saturated. Both carry a Retry-After header.
+    """
+
+    def __init__(self, status_code: int, detail: str, retry_after: float):
+        self.retry_after = max(1, math.ceil(retry_after))
+        super().__init__(status_code=status_code, detail=detail, headers={"Retry-After": str(self.retry_after)})
+
+class _Gate:
+    """
+    Concurrency limit with a bounded priority queue. Waiters are served by
+    priority, then in arrival order.
+    """
+
+    def __init__(self, name: str, limit: int, queue_size: int, status_code: int):
+        self.name = name
+        self.limit = limit
+        self.queue_size = queue_size
+        self.status_code = status_code
+        self.active = 0
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._queued = 0
+        self._sequence = itertools.count()
+        self.service_time = 0.0
+        self.rejected = 0
+        self.timed_out = 0
+
+    @property
+    def idle(self) -> bool:
+        return self.active == 0 and self._queued == 0
+
+    def retry_after(self) -> float:
+        """
+        Estimate how long until a new call would get a slot.
+        """
+        if not self.limit:
+            return 1.0
+        return min(60.0, self.service_time * (self._queued + 1) / self.limit)
+
+    async def acquire(self, priority: int, timeout: float) -> None:
+        if not self.limit or (self.active < self.limit and not self._queued):
+            self.active += 1
+            return
+        if self._queued >= self.queue_size:
+            self.rejected += 1
+            raise AdmissionRejected(self.status_code, f"Too many queued requests for {self.name}", self.retry_after())
+
+        waiter = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._sequence), waiter))
+        self._queued += 1
+        try:
+            await asyncio.wait_for(waiter, timeout)
+        except asyncio.TimeoutError:
+            if waiter.done() and not waiter.cancelled():
+                # Granted right at the deadline
+                return
+            self._abandon(waiter)
+            self.timed_out += 1
+            raise AdmissionRejected(self.status_code, f"Timed out waiting for {self.name}", self.retry_after())
+        except BaseException:
+            if waiter.done() and not waiter.cancelled():
+                # Granted just as the caller went away; hand the slot on
+                self.release()
+            else:
+                self._abandon(waiter)
+            raise
+
+    def _abandon(self, waiter: asyncio.Future) -> None:
+        # release() skips cancelled waiters left in the heap
+        waiter.cancel()
+        self._queued -= 1
+
+    def release(self, service_time: Optional[float] = None) -> None:
+        if service_time is not None:
+            self.service_time += (service_time - self.service_time) * _SERVICE_TIME_WEIGHT
+        while self._waiters:
+            _, _, waiter = heapq.heappop(self._waiters)
+            if waiter.done():
+                continue
+            # The slot passes straight to the next waiter
+            self._queued -= 1
+            waiter.set_result(None)
+            return
+        self.active -= 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "active": self.active,
+            "queued": self._queued,
+            "limit": self.limit,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "avg_service_time": round(self.service_time, 3),
+        }
+
+class AdmissionController:
+    """
+    Bound upstream concurrency per webhook host and per session.
+
+    A call first takes a slot for its session, then one for the webhook
+    host. When a limit is reached the call waits in a priority queue
+    (live turns before batch work) until its deadline; when the queue is
+    full it is refused at once with 429 (session) or 503 (host).
+    """
+
+    def __init__(
+        self,
+        host_limit: int = ADMISSION_HOST_CONCURRENCY,
+        session_limit: int = ADMISSION_SESSION_CONCURRENCY,
+        queue_size: int = ADMISSION_QUEUE_SIZE,
+        deadlines: Optional[Dict[int, float]] = None
+    ):
+        self.host_limit = host_limit
+        self.session_limit = session_limit
+        self.queue_size = queue_size
+        self.deadlines = deadlines or {LIVE: ADMISSION_LIVE_DEADLINE, BATCH: ADMISSION_BATCH_DEADLINE}
+        self._hosts: Dict[str, _Gate] = {}
+        self._sessions: Dict[str, _Gate] = {}
+        self.admitted = 0
+        self.session_rejected = 0
+
+    def _gate(self, gates: Dict[str, _Gate], key: str, limit: int, status_code: int) -> _Gate:
+        gate = gates.get(key)
+        if gate is None:
+            gate = gates[key] = _Gate(key, limit, self.queue_size, status_code)
+        return gate
+
+    def _forget_idle(self, gates: Dict[str, _Gate], key: str) -> None:
+        gate = gates.get(key)
+        if gate is not None and gate.idle:
+            if gates is self._sessions:
+                self.session_rejected += gate.rejected + gate.timed_out
+            del gates[key]
+
+    @asynccontextmanager
+    async def admit(self, webhook_url: str, session_id: str, priority: int = LIVE) -> AsyncIterator[None]:
+        """
+        Hold a session slot and a host slot for the duration of an upstream call.
+
+        Args:
+            webhook_url: The webhook being called; its host picks the host queue
+            session_id: The session making the call
+            priority: LIVE or BATCH
+
+        Raises:
+            AdmissionRejected: 429 or 503 with a Retry-After header
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.deadlines.get(priority, ADMISSION_LIVE_DEADLINE)
+        host = urlsplit(webhook_url).netloc or webhook_url
+
+        session_gate = self._gate(self._sessions, session_id, self.session_limit, 429)
+        try:
+            await session_gate.acquire(priority, deadline - loop.time())
+        except BaseException as e:
+            self._forget_idle(self._sessions, session_id)
+            if isinstance(e, AdmissionRejected):
+                log_event(logger, logging.WARNING, "admission.rejected", session_id=session_id, status=e.status_code, reason=e.detail)
+            raise
+
+        host_gate = self._gate(self._hosts, host, self.host_limit, 503)
+        try:
+            await host_gate.acquire(priority, max(0.0, deadline - loop.time()))
+        except BaseException as e:
+            session_gate.release()
+            self._forget_idle(self._sessions, session_id)
+            if isinstance(e, AdmissionRejected):
+                log_event(logger, logging.WARNING, "admission.rejected", host=host, session_id=session_id, status=e.status_code, reason=e.detail)
+            raise
+
+        self.admitted += 1
+        start = loop.time()
+        try:
+            yield
+        finally:
+            elapsed = loop.time() - start
+            host_gate.release(elapsed)
+            session_gate.release(elapsed)
+            self._forget_idle(self._sessions, session_id)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Return per-host queue state and session totals.
+        """
+        return {
+            "admitted": self.admitted,
+            "hosts": {host: gate.get_stats() for host, gate in self._hosts.items()},
+            "sessions": {
+                "active": len(self._sessions),
+                "rejected": self.session_rejected + sum(g.rejected + g.timed_out for g in self._sessions.values()),
+            },
+        }
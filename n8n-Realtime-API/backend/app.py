@@ -1,29 +1,81 @@
 import logging
 import os
-import json
-from typing import Optional, Dict, Any
-from fastapi import FastAPI, HTTPException, Request, Response
-from fastapi.responses import JSONResponse
-from fastapi.staticfiles import StaticFiles
+import time
+import uuid
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Optional, Dict, Any, List, AsyncIterator, Literal
+from fastapi import FastAPI, HTTPException, Request, Response, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, ORJSONResponse, StreamingResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 import uvicorn
+import aiohttp
 
-from backend.webhook import send_to_n8n
-from backend.realtime import create_realtime_session, format_n8n_response_for_realtime
+from backend.http_client import start_http_client, close_http_client, get_pool_stats
+from backend.webhook import send_to_n8n, stream_from_n8n, is_error_reply
+from backend.realtime import format_n8n_response_for_realtime, OPENAI_API_KEY
+from backend.session_pool import RealtimeSessionPool, REALTIME_SESSION_POOL_SIZE
+from backend.session_store import create_session_store
+from backend.response_cache import response_cache
+from backend.circuit_breaker import n8n_breakers
+from backend.compression import get_compression_stats, bytes_saved
+from backend.admission import AdmissionController, AdmissionRejected, PRIORITIES, LIVE
+from backend.batch import fan_out, summarize, log_batch, N8N_BATCH_CONCURRENCY, N8N_BATCH_MAX_ITEMS
+from backend.jobs import JobHub, callback_url, check_callback_secret, CALLBACK_SECRET_HEADER, N8N_JOB_MODE, N8N_JOB_EVENTS_HEARTBEAT
+from backend.static_assets import create_static_app
+from backend.audio import supported_formats, TARGET_FORMAT
+from backend.relay import RealtimeRelay, get_relay_stats, get_session_audio_stats, REALTIME_RELAY_MODE, RELAY_SAMPLE_RATE
+from backend.coalesce import SingleFlight
+from backend.profiling import (
+    Profiler, ProfilerBusy, LoopMonitor, check_admin_token, render_collapsed, pstats_bytes, render_pstats,
+    PROFILE_MODES, PROFILE_MAX_SECONDS, PROFILE_SAMPLE_INTERVAL, LOOP_MONITOR
+)
+from backend.tracing import (
+    TracingMiddleware, start_tracing, stop_tracing, get_tracing_stats, exporter as span_exporter,
+    span, current_span, parse_traceparent, SERVER, TRACING_ENABLED, TRACE_SAMPLE_RATE
+)
+from backend.turns import TurnMerger, TURN_MERGE_WINDOW_MS
+from backend import metrics
+from backend.log import setup_logging, shutdown_logging, log_event
+from backend.fastjson import loads, dumps_str, JSONDecodeError, HAS_ORJSON
 
 # Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+setup_logging()
 logger = logging.getLogger(__name__)
 
+# Pool of pre-minted Realtime sessions (only refilled when an API key is configured)
+session_pool = RealtimeSessionPool(
+    size=REALTIME_SESSION_POOL_SIZE if OPENAI_API_KEY else 0
+)
+
+# Application lifespan - owns the shared HTTP client pool and the session pool
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # A previous lifespan (e.g. in tests) may have stopped the log listener
+    setup_logging()
+    await start_http_client()
+    await start_tracing()
+    await session_pool.start()
+    if LOOP_MONITOR:
+        loop_monitor.start()
+    try:
+        yield
+    finally:
+        await loop_monitor.stop()
+        await job_hub.close()
+        await session_pool.stop()
+        await stop_tracing()
+        await close_http_client()
+        shutdown_logging()
+
 # Initialize FastAPI app
 app = FastAPI(
     title="N8N Voice Interface with Realtime API",
     description="A voice interface for n8n workflows using OpenAI's Realtime API",
-    version="2.0.0"
+    version="2.0.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse if HAS_ORJSON else JSONResponse
 )
 
 # Add CORS middleware
@@ -35,8 +87,27 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Store active realtime sessions
-active_sessions = {}
+# Record per-endpoint latency for /api/metrics
+app.add_middleware(metrics.MetricsMiddleware)
+
+# Open a server span per request, continuing the caller's traceparent
+app.add_middleware(TracingMiddleware)
+
+# Store active realtime sessions (TTL + LRU bounded, optionally shared by workers)
+active_sessions = create_session_store()
+
+# Identical in-flight transcriptions share one n8n call
+transcription_flight = SingleFlight()
+
+# Bounds n8n calls per webhook host and per session, live turns first
+admission = AdmissionController()
+
+# Async n8n jobs and the per-session channels their results are pushed on
+job_hub = JobHub()
+
+# Event-loop lag and blocked-loop reports, and on-demand profiles (/api/admin)
+loop_monitor = LoopMonitor()
+profiler = Profiler()
 
 # Model for the frontend configuration
 class FrontendConfig(BaseModel):
@@ -46,11 +117,30 @@ class FrontendConfig(BaseModel):
 class RealtimeSessionRequest(BaseModel):
     webhook_url: str
     model_type: Optional[str] = "standard"  # "standard" lub "mini"
+    merge_window_ms: Optional[int] = None  # Merge transcripts arriving within this window (0 disables)
+    relay: Optional[bool] = False  # Audio goes through the backend (/api/relay/{id}); no ephemeral token is minted
 
 # n8n response for realtime
 class N8nRealtimeResponse(BaseModel):
     transcription: str
     session_id: str
+    stream: Optional[bool] = False  # Stream n8n chunks back as NDJSON
+    item_id: Optional[str] = None  # Realtime conversation item ID, used to drop duplicates
+    priority: Optional[Literal["live", "batch"]] = "live"  # Live voice turns are admitted before batch work
+    job: Optional[bool] = False  # Return a job id at once; n8n posts the result to /api/webhook/{session_id} later
+
+# One transcript of a batch
+class N8nBatchItem(BaseModel):
+    session_id: str
+    transcription: str
+    item_id: Optional[str] = None
+
+# Batch of transcripts to forward
+class N8nBatchRequest(BaseModel):
+    items: List[N8nBatchItem]
+    stream: Optional[bool] = False  # NDJSON, one line per item as it completes
+    concurrency: Optional[int] = None  # Items in flight at once, at most N8N_BATCH_CONCURRENCY
+    priority: Optional[Literal["live", "batch"]] = "batch"
 
 # n8n response
 class N8nResponse(BaseModel):
@@ -59,26 +149,43 @@ class N8nResponse(BaseModel):
 
 # Create Realtime session endpoint
 @app.post("/api/realtime/session")
-async def create_session(request: RealtimeSessionRequest):
+async def create_session(request: RealtimeSessionRequest, response: Response):
     """
     Create a new Realtime API session and return ephemeral token.
+    A pre-minted session from the pool is returned when one is ready.
     """
     try:
-        # Log webhook URL and model type
-        logger.info(f"Creating session with webhook URL: {request.webhook_url}")
-        logger.info(f"Using model type: {request.model_type}")
-        
-        # Create a new session with specified model type
-        session_data = await create_realtime_session(model_type=request.model_type)
+        if request.relay:
+            # The backend holds the Realtime connection itself
+            if not OPENAI_API_KEY:
+                raise Exception("OPENAI_API_KEY environment variable not set")
+            session_data, pool_hit = {"id": f"relay_{uuid.uuid4().hex}", "relay": True}, False
+        else:
+            # Take a ready session from the pool or create one with specified model type
+            session_data, pool_hit = await session_pool.acquire(request.model_type)
+            response.headers["X-Session-Pool"] = "hit" if pool_hit else "miss"
         
         # Store webhook URL with session ID
         session_id = session_data.get('id')
+        request_span = current_span()
+        if request_span is not None:
+            request_span.set_attribute("session_id", session_id)
+            request_span.set_attribute("session.pool", "relay" if request.relay else "hit" if pool_hit else "miss")
         if session_id:
-            active_sessions[session_id] = {
-                "webhook_url": request.webhook_url
-            }
-            logger.info(f"Stored webhook URL for session {session_id}: {request.webhook_url}")
-            logger.info(f"Active sessions now: {active_sessions}")
+            merge_window_ms = request.merge_window_ms
+            await active_sessions.set(session_id, {
+                "webhook_url": request.webhook_url,
+                "merge_window_ms": TURN_MERGE_WINDOW_MS if merge_window_ms is None else max(merge_window_ms, 0),
+                "model_type": request.model_type,
+                "relay": bool(request.relay)
+            })
+            log_event(
+                logger, logging.INFO, "session.created",
+                session_id=session_id,
+                model_type=request.model_type,
+                pool="relay" if request.relay else "hit" if pool_hit else "miss",
+                webhook_url=request.webhook_url
+            )
         else:
             logger.error("No session ID received from create_realtime_session")
         
@@ -87,6 +194,33 @@ async def create_session(request: RealtimeSessionRequest):
         logger.error(f"Error creating session: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+# End Realtime session endpoint
+@app.delete("/api/realtime/session/{session_id}")
+async def end_session(session_id: str):
+    """
+    End a Realtime session and forget its webhook mapping.
+    """
+    if not await active_sessions.delete(session_id):
+        raise HTTPException(status_code=404, detail="Session not found")
+    log_event(logger, logging.INFO, "session.ended", session_id=session_id)
+    return {"status": "ended", "session_id": session_id}
+
+# Audio counters of a relayed session
+@app.get("/api/realtime/session/{session_id}/audio")
+async def get_session_audio(session_id: str):
+    """
+    Get the relay audio counters of a session: bytes received from the
+    browser, bytes sent upstream and bytes saved by the silence gate.
+    Live while the relay is connected, the final totals afterwards.
+    """
+    stats = get_session_audio_stats(session_id)
+    if stats is None:
+        session = await active_sessions.get(session_id, touch=False)
+        stats = session.get("audio") if session else None
+    if stats is None:
+        raise HTTPException(status_code=404, detail="No relayed audio for this session")
+    return {"session_id": session_id, **stats}
+
 # Process n8n response for Realtime API
 @app.post("/api/realtime/n8n-response")
 async def process_n8n_response(response: N8nResponse):
@@ -113,18 +247,24 @@ async def process_n8n_response(response: N8nResponse):
 async def n8n_webhook(session_id: str, request: Request):
     """
     Webhook endpoint for n8n to send responses back.
+    
+    The formatted event is returned. A callback carrying a job_id (query
+    parameter or body field) completes that async job and pushes the result
+    to the session's clients (SSE /api/events/{session_id} and the turn
+    WebSocket); unknown or already answered jobs get 404. A callback without
+    a job_id is only pushed, as n8n.callback, when it carries the shared
+    X-N8N-Callback-Secret (N8N_CALLBACK_SECRET).
     """
     try:
         # Get the webhook URL for this session
-        session = active_sessions.get(session_id)
+        session = await active_sessions.get(session_id)
         if not session:
-            logger.error(f"Session {session_id} not found in active sessions for webhook endpoint")
-            logger.info(f"Active sessions: {active_sessions}")
+            log_event(logger, logging.WARNING, "session.not_found", session_id=session_id, endpoint="webhook")
             raise HTTPException(status_code=404, detail="Session not found")
             
         # Get the request body
-        body = await request.json()
-        logger.info(f"Received webhook request from n8n: {body}")
+        body = loads(await request.body())
+        log_event(logger, logging.INFO, "callback.received", sampled=True, session_id=session_id, body=body)
         
         # Return the response formatted for Realtime API
         realtime_event = await format_n8n_response_for_realtime(
@@ -132,44 +272,516 @@ async def n8n_webhook(session_id: str, request: Request):
             session_id
         )
         
+        # Push it to the user as well; the pending job id (or the shared secret) authorizes the push
+        job_id = request.query_params.get("job_id") or body.get("job_id")
+        if job_id:
+            if not await job_hub.complete(session_id, str(job_id), realtime_event, body):
+                raise HTTPException(status_code=404, detail="Job not found or already answered")
+        elif check_callback_secret(request.headers.get(CALLBACK_SECRET_HEADER)):
+            await job_hub.publish(session_id, {"type": "n8n.callback", "event": realtime_event, "data": body})
+        
         return realtime_event
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error handling webhook: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+# Look up a session
+async def get_session(session_id: str) -> Dict[str, Any]:
+    """
+    Return the stored data for a session or raise 404 if it is unknown.
+    """
+    session = await active_sessions.get(session_id)
+    if not session:
+        log_event(logger, logging.WARNING, "session.not_found", session_id=session_id)
+        raise HTTPException(status_code=404, detail="Session not found")
+    return session
+
+# Look up the n8n webhook URL registered for a session
+async def get_session_webhook_url(session_id: str) -> str:
+    """
+    Return the webhook URL for a session or raise 404 if it is unknown.
+    """
+    return (await get_session(session_id))["webhook_url"]
+
+# Stream a transcription's n8n response chunk by chunk
+async def stream_transcription(session_id: str, transcription: str, priority: int = LIVE) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Forward a transcription to the session's n8n webhook and yield reply chunks.
+    The session is looked up before the first chunk so unknown sessions fail with 404;
+    admission is decided on the first chunk (AdmissionRejected).
+    """
+    webhook_url = await get_session_webhook_url(session_id)
+    
+    async def chunks() -> AsyncIterator[Dict[str, Any]]:
+        async with admission.admit(webhook_url, session_id, priority):
+            async for chunk in stream_from_n8n(webhook_url, {
+                "transcription": transcription,
+                "session_id": session_id
+            }):
+                yield chunk
+    
+    return chunks()
+
+# Key identifying duplicate deliveries of the same turn
+def turn_key(session_id: str, transcription: str, item_id: Optional[str] = None) -> tuple:
+    """
+    Build the coalescing key for a turn: the Realtime item ID when the client
+    sent one, otherwise the transcription text.
+    """
+    return (session_id, "item", item_id) if item_id else (session_id, "text", transcription)
+
+# Send a (possibly merged) turn to the session's n8n webhook
+async def send_turn(session_id: str, transcription: str, priority: int = LIVE) -> Dict[str, Any]:
+    """
+    Send a turn to the n8n webhook registered for a session, once admitted.
+    """
+    webhook_url = await get_session_webhook_url(session_id)
+    
+    # Send the transcription to n8n
+    async with admission.admit(webhook_url, session_id, priority):
+        n8n_response = await send_to_n8n(webhook_url, {
+            "transcription": transcription,
+            "session_id": session_id
+        })
+    
+    log_event(logger, logging.INFO, "turn.completed", sampled=True, session_id=session_id, response=n8n_response)
+    return n8n_response
+
+# Start a turn as an async n8n job
+async def start_job(session_id: str, transcription: str, base_url: str, priority: int = LIVE) -> Dict[str, Any]:
+    """
+    Send a turn to n8n in the background and return its job id at once.
+    
+    n8n gets job_id and callback_url in the payload, acknowledges, and
+    posts the result to the callback URL when the workflow finishes. A
+    call that fails or is refused fails the job instead; either way the
+    outcome is pushed to the session's clients.
+    
+    Args:
+        session_id: The Realtime session ID
+        transcription: The transcribed user utterance
+        base_url: Base URL of this server as seen by the caller
+        priority: LIVE or BATCH
+    
+    Returns:
+        {"job_id": ..., "status": "pending", "callback_url": ...}
+    
+    Raises:
+        HTTPException: 404 if the session is unknown, 503 if too many jobs are pending
+    """
+    webhook_url = await get_session_webhook_url(session_id)
+    try:
+        job_id = job_hub.create(session_id)
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    url = callback_url(base_url, session_id, job_id)
+    
+    async def run() -> None:
+        try:
+            async with admission.admit(webhook_url, session_id, priority):
+                ack = await send_to_n8n(webhook_url, {
+                    "transcription": transcription,
+                    "session_id": session_id,
+                    "job_id": job_id,
+                    "callback_url": url
+                })
+            if is_error_reply(ack):
+                await job_hub.fail(session_id, job_id, 502, ack["text"])
+        except HTTPException as e:
+            await job_hub.fail(session_id, job_id, e.status_code, e.detail)
+        except Exception as e:
+            logger.error(f"Error starting n8n job: {str(e)}", exc_info=True)
+            await job_hub.fail(session_id, job_id, 500, str(e))
+    
+    job_hub.run(run())
+    return {"job_id": job_id, "status": "pending", "callback_url": url}
+
+# Merges transcripts that arrive within a session's debounce window
+turn_merger = TurnMerger(send_turn)
+
+# Look up the session and send a transcription to its n8n webhook
+async def forward_transcription(
+    session_id: str,
+    transcription: str,
+    item_id: Optional[str] = None,
+    priority: int = LIVE
+) -> Dict[str, Any]:
+    """
+    Forward a transcription to the n8n webhook registered for a session.
+    Duplicate requests for a turn that is already in flight share its result,
+    and transcripts arriving within the session's merge window are sent as one turn.
+    
+    Args:
+        session_id: The Realtime session ID
+        transcription: The transcribed user utterance
+        item_id: The Realtime conversation item ID, if known
+        priority: LIVE or BATCH; batch work is never merged
+    
+    Returns:
+        The n8n response as returned by send_to_n8n
+    
+    Raises:
+        HTTPException: 404 if the session is unknown
+        AdmissionRejected: 429/503 if the call was refused or queued past its deadline
+    """
+    log_event(logger, logging.INFO, "turn.received", sampled=True, session_id=session_id, item_id=item_id, transcription=transcription)
+    
+    if priority != LIVE:
+        await get_session(session_id)
+        return await transcription_flight.do(
+            turn_key(session_id, transcription, item_id),
+            lambda: send_turn(session_id, transcription, priority)
+        )
+    
+    merge_window_ms = (await get_session(session_id)).get("merge_window_ms", TURN_MERGE_WINDOW_MS)
+    return await transcription_flight.do(
+        turn_key(session_id, transcription, item_id),
+        lambda: turn_merger.submit(session_id, transcription, merge_window_ms)
+    )
+
 # Forward transcription to n8n webhook
 @app.post("/api/forward-to-n8n")
-async def forward_to_n8n(data: N8nRealtimeResponse):
+async def forward_to_n8n(data: N8nRealtimeResponse, request: Request, response: Response):
     """
     Forward transcription from Realtime API to n8n webhook.
+    With "stream": true the n8n reply is returned as NDJSON, one {"text": ...}
+    object per chunk, as soon as each chunk arrives.
+    With "job": true the call returns 202 with a job id right away and the
+    result is pushed to the session when n8n calls back (see start_job).
+    When the webhook host or the session is saturated the call is refused
+    with 429/503 and a Retry-After header.
     """
+    priority = PRIORITIES[data.priority or "live"]
+    request_span = current_span()
+    if request_span is not None:
+        request_span.set_attribute("session_id", data.session_id)
+        request_span.set_attribute("item_id", data.item_id)
     try:
-        logger.info(f"Received transcription to forward: {data.transcription}")
-        logger.info(f"Session ID: {data.session_id}")
-        
-        # Get the webhook URL for this session
-        session = active_sessions.get(data.session_id)
-        if not session:
-            logger.error(f"Session {data.session_id} not found in active sessions")
-            logger.info(f"Active sessions: {active_sessions}")
-            raise HTTPException(status_code=404, detail="Session not found")
+        if data.job:
+            response.status_code = 202
+            return await start_job(data.session_id, data.transcription, str(request.base_url), priority)
+        if data.stream:
+            chunks = await stream_transcription(data.session_id, data.transcription, priority)
+            # Wait for the first chunk so a refused call still gets its status code
+            try:
+                first = [await chunks.__anext__()]
+            except StopAsyncIteration:
+                first = []
             
-        webhook_url = session["webhook_url"]
-        logger.info(f"Found webhook URL for session: {webhook_url}")
-        
-        # Send the transcription to n8n
-        logger.info(f"Sending to n8n: {data.transcription}")
-        n8n_response = await send_to_n8n(webhook_url, {
-            "transcription": data.transcription,
-            "session_id": data.session_id
-        })
-        
-        logger.info(f"Received response from n8n: {n8n_response}")
-        return n8n_response
+            async def body() -> AsyncIterator[str]:
+                for chunk in first:
+                    yield dumps_str(chunk) + "\n"
+                async for chunk in chunks:
+                    yield dumps_str(chunk) + "\n"
+            
+            return StreamingResponse(body(), media_type="application/x-ndjson")
+        return await forward_transcription(data.session_id, data.transcription, data.item_id, priority)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error forwarding to n8n: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
+# Server-sent events for a session (async job results and n8n callbacks)
+@app.get("/api/events/{session_id}")
+async def session_events(session_id: str, request: Request, after: Optional[int] = None):
+    """
+    Stream a session's events as SSE.
+    
+    Events:
+        job.completed  {"type", "job_id", "event": <conversation.item.create>, "data": <n8n body>}
+        job.failed     {"type", "job_id", "status", "detail"}
+        n8n.callback   {"type", "event", "data"}  (callbacks without a job id)
+    
+    Each event carries an id; reconnecting with Last-Event-ID (or ?after=)
+    replays buffered events published since then.
+    """
+    await get_session(session_id)
+    last_event_id = request.headers.get("last-event-id", "")
+    if last_event_id.isdigit():
+        after = int(last_event_id)
+    if after is None:
+        after = job_hub.last_sequence(session_id)
+    
+    async def body() -> AsyncIterator[str]:
+        yield "retry: 3000\n\n"
+        async for sequence, event in job_hub.listen(session_id, after, heartbeat=N8N_JOB_EVENTS_HEARTBEAT):
+            if event is None:
+                yield ": keepalive\n\n"
+                continue
+            yield f"id: {sequence}\nevent: {event['type']}\ndata: {dumps_str(event)}\n\n"
+    
+    return StreamingResponse(body(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+# Forward many transcripts at once
+@app.post("/api/forward-to-n8n/batch")
+async def forward_batch_to_n8n(batch: N8nBatchRequest):
+    """
+    Forward a batch of transcripts (e.g. replays or bulk evaluations).
+    
+    Items are sent to n8n concurrently, at most `concurrency` at a time,
+    at batch priority unless asked otherwise. Each item gets its own result:
+        {"index": 0, "session_id": "...", "ok": true, "data": {...}}
+        {"index": 1, "session_id": "...", "ok": false, "status": 404, "detail": "..."}
+    A failed item never fails the batch. The response is
+    {"results": [...in request order...], "items", "succeeded", "failed"};
+    with "stream": true it is NDJSON instead, one result per line as items
+    complete, followed by a {"summary": {...}} line.
+    """
+    if len(batch.items) > N8N_BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"Batch too large (at most {N8N_BATCH_MAX_ITEMS} items)")
+    priority = PRIORITIES[batch.priority or "batch"]
+    concurrency = max(1, min(batch.concurrency or N8N_BATCH_CONCURRENCY, N8N_BATCH_CONCURRENCY))
+    
+    async def handle(index: int, item: N8nBatchItem) -> Dict[str, Any]:
+        result = {"index": index, "session_id": item.session_id}
+        try:
+            n8n_response = await forward_transcription(item.session_id, item.transcription, item.item_id, priority)
+        except AdmissionRejected as e:
+            return dict(result, ok=False, status=e.status_code, detail=e.detail, retry_after=e.retry_after)
+        except HTTPException as e:
+            return dict(result, ok=False, status=e.status_code, detail=e.detail)
+        except Exception as e:
+            logger.error(f"Error forwarding batch item to n8n: {str(e)}", exc_info=True)
+            return dict(result, ok=False, status=500, detail=str(e))
+        if is_error_reply(n8n_response):
+            return dict(result, ok=False, status=502, detail=n8n_response["text"])
+        return dict(result, ok=True, data=n8n_response)
+    
+    start = time.perf_counter()
+    if batch.stream:
+        async def body() -> AsyncIterator[str]:
+            results = []
+            async for _, result in fan_out(batch.items, handle, concurrency):
+                results.append(result)
+                yield dumps_str(result) + "\n"
+            summary = summarize(results)
+            log_batch(summary, concurrency, time.perf_counter() - start)
+            yield dumps_str({"summary": summary}) + "\n"
+        
+        return StreamingResponse(body(), media_type="application/x-ndjson")
+    
+    results: List[Optional[Dict[str, Any]]] = [None] * len(batch.items)
+    async for index, result in fan_out(batch.items, handle, concurrency):
+        results[index] = result
+    summary = summarize(results)
+    log_batch(summary, concurrency, time.perf_counter() - start)
+    return {"results": results, **summary}
+
+# Persistent turn channel between the browser and the backend
+@app.websocket("/api/ws/{session_id}")
+async def turn_channel(websocket: WebSocket, session_id: str, after: Optional[int] = None):
+    """
+    WebSocket carrying every turn of a conversation over one connection.
+    
+    Client frames:
+        {"type": "transcription", "id": "<message id>", "transcription": "...", "item_id": "...", "stream": false, "job": false,
+         "traceparent": "<optional W3C traceparent>"}
+        {"type": "ping", "id": "<message id>"}
+    Server frames:
+        {"type": "job.accepted", "id": "<message id>", "job_id": "..."}  (job only)
+        {"type": "n8n.response", "id": "<message id>", "data": {...}}
+        {"type": "n8n.chunk", "id": "<message id>", "data": {"text": "..."}}  (stream only)
+        {"type": "n8n.done", "id": "<message id>"}  (stream only)
+        {"type": "error", "id": "<message id>", "status": 404, "detail": "..."}
+        {"type": "pong", "id": "<message id>"}
+        Session events as on /api/events/{session_id}, with their "seq"
+        (pass ?after=<seq> when reconnecting to replay missed ones)
+    
+    Each transcription is handled in its own task, so several turns can be
+    in flight at once; replies are matched to requests by message id.
+    """
+    if await active_sessions.get(session_id) is None:
+        await websocket.close(code=4404, reason="Session not found")
+        return
+    await websocket.accept()
+    log_event(logger, logging.INFO, "turn_channel.opened", session_id=session_id)
+    
+    send_lock = asyncio.Lock()
+    in_flight = set()
+    
+    async def reply(message: Dict[str, Any]) -> None:
+        async with send_lock:
+            await websocket.send_text(dumps_str(message))
+    
+    async def push_events() -> None:
+        try:
+            async for sequence, event in job_hub.listen(session_id, job_hub.last_sequence(session_id) if after is None else after):
+                await reply(dict(event, seq=sequence))
+        except (WebSocketDisconnect, RuntimeError):
+            pass
+    
+    # Base URL n8n calls back on, as http(s)
+    base_url = "http" + str(websocket.base_url)[2:]
+    
+    async def handle_transcription(
+        message_id: Any, transcription: str, item_id: Optional[str], stream: bool, job: bool, traceparent: Optional[str] = None
+    ) -> None:
+        with span("ws transcription", SERVER, parse_traceparent(traceparent), session_id=session_id, item_id=item_id):
+            try:
+                if job:
+                    accepted = await start_job(session_id, transcription, base_url)
+                    await reply({"type": "job.accepted", "id": message_id, "job_id": accepted["job_id"]})
+                    return
+                # Merged turns are answered as a whole, so streaming only applies without a merge window
+                if stream and not (await get_session(session_id)).get("merge_window_ms", TURN_MERGE_WINDOW_MS):
+                    streamed = False
+                    
+                    async def relay_stream() -> Dict[str, Any]:
+                        # Runs only for the first request of a turn; duplicates get the joined text
+                        nonlocal streamed
+                        streamed = True
+                        parts = []
+                        async for chunk in await stream_transcription(session_id, transcription):
+                            parts.append(str(chunk.get("text", "")))
+                            await reply({"type": "n8n.chunk", "id": message_id, "data": chunk})
+                        await reply({"type": "n8n.done", "id": message_id})
+                        return {"text": "".join(parts)}
+                    
+                    n8n_response = await transcription_flight.do(turn_key(session_id, transcription, item_id), relay_stream)
+                    if streamed:
+                        return
+                else:
+                    n8n_response = await forward_transcription(session_id, transcription, item_id)
+                await reply({"type": "n8n.response", "id": message_id, "data": n8n_response})
+            except AdmissionRejected as e:
+                await reply({"type": "error", "id": message_id, "status": e.status_code, "detail": e.detail, "retry_after": e.retry_after})
+            except HTTPException as e:
+                await reply({"type": "error", "id": message_id, "status": e.status_code, "detail": e.detail})
+            except WebSocketDisconnect:
+                pass
+            except Exception as e:
+                logger.error(f"Error forwarding to n8n: {str(e)}", exc_info=True)
+                await reply({"type": "error", "id": message_id, "status": 500, "detail": str(e)})
+    
+    events_task = asyncio.create_task(push_events())
+    try:
+        while True:
+            raw = await websocket.receive_text()
+            try:
+                message = loads(raw)
+            except JSONDecodeError:
+                await reply({"type": "error", "id": None, "status": 400, "detail": "Invalid JSON"})
+                continue
+            if not isinstance(message, dict):
+                await reply({"type": "error", "id": None, "status": 400, "detail": "Expected a JSON object"})
+                continue
+            
+            message_id = message.get("id")
+            message_type = message.get("type")
+            if message_type == "transcription" and isinstance(message.get("transcription"), str):
+                task = asyncio.create_task(handle_transcription(
+                    message_id,
+                    message["transcription"],
+                    message.get("item_id"),
+                    bool(message.get("stream")),
+                    bool(message.get("job")),
+                    message.get("traceparent")
+                ))
+                in_flight.add(task)
+                task.add_done_callback(in_flight.discard)
+            elif message_type == "ping":
+                await reply({"type": "pong", "id": message_id})
+            else:
+                await reply({"type": "error", "id": message_id, "status": 400, "detail": f"Unsupported message type: {message_type}"})
+    except WebSocketDisconnect:
+        log_event(logger, logging.INFO, "turn_channel.closed", session_id=session_id)
+    finally:
+        events_task.cancel()
+        for task in in_flight:
+            task.cancel()
+
+# Server-side Realtime relay
+@app.websocket("/api/relay/{session_id}")
+async def relay_channel(websocket: WebSocket, session_id: str, audio_format: str = TARGET_FORMAT, traceparent: Optional[str] = None):
+    """
+    Relay a voice conversation through the backend.
+    
+    Query parameters:
+        audio_format: Format of the binary frames (pcm16, pcm16_48k, float32,
+                      float32_48k; see /api/config for what this server converts)
+        traceparent: W3C trace context the upstream connection is traced under
+    
+    Client frames:
+        binary: mono little-endian audio in `audio_format`
+        text: Realtime client events allowed by the relay (session.update,
+              input_audio_buffer.commit/clear, response.cancel)
+    Server frames:
+        Realtime server events as received from OpenAI, plus
+        {"type": "n8n.response", "item_id": "...", "data": {...}} for each answered turn
+        {"type": "error", "status": ..., "detail": "..."}
+    
+    Completed transcriptions are forwarded to n8n here and the reply is
+    injected into the conversation; the client only renders events.
+    """
+    session = await active_sessions.get(session_id)
+    if session is None or not session.get("relay"):
+        await websocket.close(code=4404, reason="Relay session not found")
+        return
+    if audio_format not in supported_formats():
+        await websocket.close(code=4400, reason=f"Unsupported audio format: {audio_format}")
+        return
+    await websocket.accept()
+    
+    send_lock = asyncio.Lock()
+    
+    async def send_to_client(event: Dict[str, Any]) -> None:
+        async with send_lock:
+            await websocket.send_text(dumps_str(event))
+    
+    relay = RealtimeRelay(
+        session_id, forward_transcription, send_to_client,
+        model_type=session.get("model_type") or "standard",
+        audio_format=audio_format
+    )
+    try:
+        with span("relay.connect", SERVER, parse_traceparent(traceparent), session_id=session_id, audio_format=audio_format):
+            await relay.connect()
+    except Exception as e:
+        logger.error(f"Error connecting Realtime relay: {str(e)}")
+        await send_to_client({"type": "error", "status": 502, "detail": f"Realtime connection failed: {str(e)}"})
+        await websocket.close(code=1011)
+        return
+    
+    async def pump() -> None:
+        try:
+            await relay.pump()
+        finally:
+            # Upstream is gone; end the browser side too
+            try:
+                await websocket.close()
+            except RuntimeError:
+                pass
+    
+    pump_task = asyncio.create_task(pump())
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            if message.get("bytes") is not None:
+                await relay.send_audio(message["bytes"])
+                continue
+            try:
+                event = loads(message.get("text") or "")
+            except JSONDecodeError:
+                await send_to_client({"type": "error", "status": 400, "detail": "Invalid JSON"})
+                continue
+            if not isinstance(event, dict) or not await relay.send_client_event(event):
+                await send_to_client({"type": "error", "status": 400, "detail": "Unsupported client event"})
+    except (WebSocketDisconnect, RuntimeError, ConnectionResetError, aiohttp.ClientError):
+        pass
+    finally:
+        pump_task.cancel()
+        await relay.close()
+        # Keep the final audio counters with the session
+        session = await active_sessions.get(session_id, touch=False)
+        if session is not None:
+            session["audio"] = relay.get_audio_stats()
+            await active_sessions.set(session_id, session)
+
 # Config endpoint to get frontend configuration
 @app.get("/api/config")
 async def get_config():
@@ -179,8 +791,95 @@ async def get_config():
     return {
         "realtime_api_enabled": True,
         "version": "2.0.0",
-        "available_models": ["standard", "mini"]  # Dodano dostępne modele
+        "available_models": ["standard", "mini"],  # Dodano dostępne modele
+        "relay_mode": REALTIME_RELAY_MODE and bool(OPENAI_API_KEY),
+        "relay_sample_rate": RELAY_SAMPLE_RATE,
+        "audio_formats": supported_formats(),
+        "job_mode": N8N_JOB_MODE,
+        # Share of turns the browser starts a sampled trace for (0 when tracing is off)
+        "trace_sample_rate": TRACE_SAMPLE_RATE if TRACING_ENABLED else 0
+    }
+
+# Component counters read at scrape time
+metrics.registry.gauge(
+    "session_store_size", "Sessions currently held in the session store",
+    callback=lambda: {(): len(active_sessions)}
+)
+metrics.registry.counter(
+    "session_store_removals_total", "Sessions removed from the session store, by reason",
+    ("reason",),
+    callback=lambda: {
+        ("lru",): active_sessions.evictions,
+        ("expired",): active_sessions.expirations,
+        ("ended",): active_sessions.ended
+    }
+)
+metrics.registry.counter(
+    "session_pool_requests_total", "Session requests served from the warm pool, by result",
+    ("result",),
+    callback=lambda: {("hit",): session_pool.hits, ("miss",): session_pool.misses}
+)
+metrics.registry.counter(
+    "response_cache_requests_total", "n8n response cache lookups, by result",
+    ("result",),
+    callback=lambda: {("hit",): response_cache.hits, ("miss",): response_cache.misses}
+)
+metrics.registry.counter(
+    "coalesced_requests_total", "Duplicate in-flight transcripts that shared an upstream call",
+    callback=lambda: {(): transcription_flight.coalesced}
+)
+metrics.registry.counter(
+    "relay_audio_bytes_total", "Relayed PCM16 audio bytes, sent upstream or saved by the silence gate",
+    ("result",),
+    callback=lambda: {("sent",): get_relay_stats()["audio_bytes"], ("saved",): get_relay_stats()["audio_bytes_saved"]}
+)
+metrics.registry.counter(
+    "n8n_compression_bytes_saved_total", "Bytes kept off the wire by compressing n8n payloads, by direction",
+    ("direction",),
+    callback=lambda: {(direction,): saved for direction, saved in bytes_saved().items()}
+)
+metrics.registry.counter(
+    "trace_spans_total", "Finished sampled spans, by export result",
+    ("result",),
+    callback=lambda: {("exported",): span_exporter.exported, ("dropped",): span_exporter.dropped, ("failed",): span_exporter.failed}
+)
+metrics.registry.gauge(
+    "event_loop_lag_seconds", "Recent event-loop heartbeat lag, by quantile",
+    ("quantile",),
+    callback=lambda: {
+        (quantile,): loop_monitor.lag_summary()[key] / 1000
+        for quantile, key in (("0.5", "p50"), ("0.99", "p99"), ("1", "max"))
+    }
+)
+metrics.registry.counter(
+    "event_loop_blocked_total", "Times a callback blocked the event loop past LOOP_BLOCK_THRESHOLD",
+    callback=lambda: {(): loop_monitor.blocked}
+)
+metrics.registry.gauge(
+    "n8n_jobs_pending", "Async n8n jobs waiting for their callback",
+    callback=lambda: {(): job_hub.get_stats()["pending"]}
+)
+metrics.registry.gauge(
+    "admission_queue_depth", "n8n calls waiting for a slot, by webhook host",
+    ("host",),
+    callback=lambda: {(host,): stats["queued"] for host, stats in admission.get_stats()["hosts"].items()}
+)
+metrics.registry.gauge(
+    "circuit_breaker_open", "Whether the breaker for an n8n host is open (1), half-open (0.5) or closed (0)",
+    ("host",),
+    callback=lambda: {
+        (host,): {"open": 1, "half_open": 0.5}.get(stats["state"], 0)
+        for host, stats in n8n_breakers.get_stats().items()
     }
+)
+
+# Prometheus metrics endpoint
+@app.get("/api/metrics")
+async def get_metrics():
+    """
+    Expose latency histograms and counters in Prometheus text format.
+    """
+    return PlainTextResponse(metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
 
 # Health check endpoint
 @app.get("/api/health")
@@ -188,10 +887,99 @@ async def health_check():
     """
     Health check endpoint to verify the API is running.
     """
-    return {"status": "ok"}
+    return {
+        "status": "ok",
+        "http_pool": get_pool_stats(),
+        "session_pool": session_pool.get_stats(),
+        "sessions": active_sessions.get_stats(),
+        "response_cache": response_cache.get_stats(),
+        "coalescing": transcription_flight.get_stats(),
+        "turn_merging": turn_merger.get_stats(),
+        "circuit_breakers": n8n_breakers.get_stats(),
+        "compression": get_compression_stats(),
+        "admission": admission.get_stats(),
+        "relay": get_relay_stats(),
+        "jobs": job_hub.get_stats(),
+        "tracing": get_tracing_stats(),
+        "event_loop": loop_monitor.get_stats()
+    }
+
+# Guard for the admin endpoints
+def require_admin(request: Request) -> None:
+    """
+    Allow the request only with "Authorization: Bearer <ADMIN_TOKEN>".
+    Without a configured token the admin endpoints do not exist (404).
+    """
+    status = check_admin_token(request.headers.get("authorization"))
+    if status == 404:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if status is not None:
+        raise HTTPException(status_code=401, detail="Invalid admin token", headers={"WWW-Authenticate": "Bearer"})
+
+# Profile this worker on demand
+@app.get("/api/admin/profile")
+async def capture_profile(
+    request: Request,
+    seconds: float = 10,
+    mode: str = "sample",
+    interval: float = PROFILE_SAMPLE_INTERVAL,
+    format: Optional[str] = None
+):
+    """
+    Profile this worker for `seconds` while it keeps serving traffic.
+    
+    Modes:
+        sample    Sample the event loop's stack every `interval` seconds and
+                  return collapsed stacks ("a;b;c 42" per line) for
+                  flamegraph.pl, speedscope or inferno
+        cprofile  Run cProfile on the event loop and return a pstats file
+                  (or, with format=text, the top functions by cumulative time)
+    
+    Only one profile runs at a time (409 otherwise). Requires the admin token.
+    """
+    require_admin(request)
+    if mode not in PROFILE_MODES:
+        raise HTTPException(status_code=400, detail=f"Unsupported mode: {mode} (expected one of {', '.join(PROFILE_MODES)})")
+    if not 0 < seconds <= PROFILE_MAX_SECONDS:
+        raise HTTPException(status_code=400, detail=f"seconds must be in (0, {PROFILE_MAX_SECONDS:g}]")
+    if interval < 0.001:
+        raise HTTPException(status_code=400, detail="interval must be at least 0.001")
+    
+    stamp = time.strftime("%Y%m%dT%H%M%S")
+    try:
+        if mode == "sample":
+            stacks = await profiler.sample(seconds, interval)
+            return PlainTextResponse(render_collapsed(stacks), headers={
+                "Content-Disposition": f'attachment; filename="profile-{os.getpid()}-{stamp}.collapsed"',
+                "X-Profile-Samples": str(sum(stacks.values()))
+            })
+        stats = await profiler.cprofile(seconds)
+    except ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if format == "text":
+        return PlainTextResponse(render_pstats(stats))
+    return Response(pstats_bytes(stats), media_type="application/octet-stream", headers={
+        "Content-Disposition": f'attachment; filename="profile-{os.getpid()}-{stamp}.pstats"'
+    })
+
+# Event-loop health of this worker
+@app.get("/api/admin/loop")
+async def get_loop_report(request: Request):
+    """
+    Report recent event-loop lag and the callbacks that blocked the loop,
+    newest first, each with blocked_ms and the loop thread's stack
+    (outermost frame first) at the time. Requires the admin token.
+    """
+    require_admin(request)
+    return {
+        "pid": os.getpid(),
+        **loop_monitor.get_stats(),
+        "profiler": profiler.get_stats(),
+        "slow_callbacks": loop_monitor.slow_callbacks()
+    }
 
 # Mount static files for the frontend
-app.mount("/", StaticFiles(directory="frontend", html=True), name="frontend")
+app.mount("/", create_static_app("frontend"), name="frontend")
 
 # Run the application
 if __name__ == "__main__":
@@ -0,0 +1,408 @@
+import os
+import math
+import logging
+from collections import deque
+from typing import Dict, Any, List, Optional, Tuple
+
+# numpy is optional; without it only the native 24 kHz PCM16 format is accepted
+try:
+    import numpy as np
+    from numpy.lib.stride_tricks import as_strided
+except ImportError:  # pragma: no cover - depends on the environment
+    np = None
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Audio per upstream append (ms); converted frames are regrouped to this size
+AUDIO_PACKET_MS = int(os.getenv("AUDIO_PACKET_MS", "100"))
+# Frame size (input samples) the buffers are preallocated for; larger frames grow them once
+AUDIO_MAX_FRAME = int(os.getenv("AUDIO_MAX_FRAME", "8192"))
+# Drop long silences before they are sent upstream (needs numpy)
+AUDIO_SILENCE_GATE = os.getenv("AUDIO_SILENCE_GATE", "true").lower() not in ("0", "false", "no")
+# Level below which audio counts as silence (dBFS, RMS over 10 ms)
+AUDIO_SILENCE_THRESHOLD_DB = float(os.getenv("AUDIO_SILENCE_THRESHOLD_DB", "-45"))
+# Silence still sent after speech (ms); keep it above the turn detection's silence duration
+AUDIO_SILENCE_HANGOVER_MS = int(os.getenv("AUDIO_SILENCE_HANGOVER_MS", "1000"))
+# Silence sent ahead of resumed speech so word onsets are not clipped (ms)
+AUDIO_SILENCE_PREROLL_MS = int(os.getenv("AUDIO_SILENCE_PREROLL_MS", "300"))
+
+# The Realtime API takes 24 kHz mono PCM16 little-endian
+TARGET_RATE = 24000
+TARGET_FORMAT = "pcm16"
+
+# Accepted input formats: name -> (numpy dtype, sample rate)
+INPUT_FORMATS: Dict[str, Tuple[str, int]] = {
+    "pcm16": ("<i2", 24000),
+    "pcm16_48k": ("<i2", 48000),
+    "float32": ("<f4", 24000),
+    "float32_48k": ("<f4", 48000),
+}
+
+# Low-pass FIR applied before dropping every other 48 kHz sample: a
+# Blackman-windowed half-band filter (cutoff 12 kHz), so every second tap
+# is zero and the rest are skipped
+_HALF_BAND_TAPS = 31
+
+def _half_band_filter() -> "np.ndarray":
+    n = np.arange(_HALF_BAND_TAPS) - (_HALF_BAND_TAPS - 1) / 2
+    taps = 0.5 * np.sinc(0.5 * n) * np.blackman(_HALF_BAND_TAPS)
+    taps /= taps.sum()
+    return taps.astype(np.float32)
+
+# Silence gate analysis window: 10 ms at 24 kHz
+_GATE_WINDOW = 240
+# Windows up to this far below the threshold still count as speech when at
+# least this fraction of their samples cross zero (quiet fricatives)
+_FRICATIVE_MARGIN_DB = 10
+_FRICATIVE_ZCR = 0.3
+
+def supported_formats() -> List[str]:
+    """
+    Return the input formats this process can convert.
+    """
+    if np is None:
+        return [TARGET_FORMAT]
+    return list(INPUT_FORMATS)
+
+class PcmConverter:
+    """
+    Convert one stream of mono PCM frames to 24 kHz PCM16 little-endian.
+
+    Float samples are scaled and clipped to int16; 48 kHz input is low-pass
+    filtered and decimated by two. All work happens in buffers allocated up
+    front (the filter keeps its history between frames), so steady-state
+    frames allocate nothing but the returned memoryview. The view points
+    into those buffers and is only valid until the next call.
+    """
+
+    def __init__(self, input_format: str = TARGET_FORMAT, max_frame: int = AUDIO_MAX_FRAME):
+        if input_format not in INPUT_FORMATS:
+            raise ValueError(f"Unsupported audio format: {input_format}")
+        dtype, rate = INPUT_FORMATS[input_format]
+        self.input_format = input_format
+        self.sample_size = 2 if dtype == "<i2" else 4
+        self.decimation = rate // TARGET_RATE
+        self.passthrough = input_format == TARGET_FORMAT
+        # Trailing bytes of a sample split across frames
+        self._partial = b""
+        if self.passthrough:
+            return
+        if np is None:
+            raise ValueError(f"Audio format {input_format} needs numpy")
+
+        self._dtype = np.dtype(dtype)
+        # Samples are scaled to the int16 range on the way in (or by the
+        # filter taps when decimating), saving a pass over the output
+        self._taps = _half_band_filter() * np.float32(32767) if self.decimation == 2 else None
+        full_scale = 1.0 if self.decimation == 2 else 32767.0
+        self._input_scale = np.float32(full_scale / 32768 if dtype == "<i2" else full_scale)
+        self._history = _HALF_BAND_TAPS - 1 if self.decimation == 2 else 0
+        self._filled = self._history
+        self._allocate(max_frame)
+
+    def _allocate(self, max_frame: int) -> None:
+        self.max_frame = max_frame
+        max_out = max_frame // self.decimation + 1
+        work = np.zeros(self._history + max_frame, np.float32)
+        if getattr(self, "_work", None) is not None:
+            work[:self._filled] = self._work[:self._filled]
+        self._work = work
+        self._out = np.empty(max_out, np.float32)
+        self._out16 = np.empty(max_out, "<i2")
+        if self.decimation == 2:
+            # Row k of the window view is input[2k:2k + taps]; rows are copied
+            # into a contiguous matrix so the filter is a single BLAS call
+            rows = (len(work) - _HALF_BAND_TAPS) // 2 + 1
+            self._windows = as_strided(work, shape=(rows, _HALF_BAND_TAPS), strides=(8, 4), writeable=False)
+            self._matrix = np.empty((max_out, _HALF_BAND_TAPS), np.float32)
+
+    def _split(self, data: bytes) -> memoryview:
+        view = memoryview(data).cast("B")
+        if self._partial:
+            view = memoryview(self._partial + bytes(view))
+        usable = len(view) - len(view) % self.sample_size
+        self._partial = bytes(view[usable:]) if usable < len(view) else b""
+        return view[:usable]
+
+    def convert(self, data: bytes) -> memoryview:
+        """
+        Convert a frame.
+
+        Args:
+            data: Raw little-endian samples in the input format
+
+        Returns:
+            PCM16 bytes (possibly empty while the filter fills up)
+        """
+        view = self._split(data)
+        if self.passthrough or not len(view):
+            return view
+
+        samples = np.frombuffer(view, dtype=self._dtype)
+        if len(samples) > self.max_frame:
+            logger.info(f"Growing audio buffers for {len(samples)}-sample frames")
+            self._allocate(len(samples))
+
+        if self.decimation == 1:
+            count = len(samples)
+            out = self._out[:count]
+            np.multiply(samples, self._input_scale, out=out)
+        else:
+            start, end = self._filled, self._filled + len(samples)
+            np.multiply(samples, self._input_scale, out=self._work[start:end])
+            count = max(0, (end - _HALF_BAND_TAPS) // 2 + 1)
+            out = self._out[:count]
+            if count:
+                matrix = self._matrix[:count]
+                np.copyto(matrix, self._windows[:count])
+                np.dot(matrix, self._taps, out=out)
+            # Keep the unconsumed tail as history for the next frame
+            consumed = 2 * count
+            self._filled = end - consumed
+            self._work[:self._filled] = self._work[consumed:end]
+
+        np.rint(out, out=out)
+        # minimum/maximum are several times faster than np.clip on short frames
+        np.minimum(out, 32767, out=out)
+        np.maximum(out, -32768, out=out)
+        out16 = self._out16[:count]
+        np.copyto(out16, out, casting="unsafe")
+        return out16.data.cast("B")
+
+    def reset(self) -> None:
+        """
+        Drop filter history and partial samples (e.g. after the input buffer is cleared).
+        """
+        self._partial = b""
+        if not self.passthrough:
+            self._work[:self._history] = 0
+            self._filled = self._history
+
+class PacketRing:
+    """
+    Regroup PCM16 bytes into fixed-size packets through a preallocated ring.
+
+    Packets never straddle the end of the ring (its size is a multiple of
+    the packet size), so each is returned as a memoryview without copying.
+    A packet stays valid until the ring wraps around to it again; a write
+    that would complete more packets than the ring holds grows it first,
+    so every packet returned by one write stays valid until the next.
+    """
+
+    def __init__(self, packet_bytes: int, packets: int = 8):
+        self.packet_bytes = max(2, packet_bytes - packet_bytes % 2)
+        self._ring = bytearray(self.packet_bytes * packets)
+        self._view = memoryview(self._ring)
+        # Start of the pending packet and bytes written to it
+        self._start = 0
+        self._length = 0
+
+    def _reserve(self, size: int) -> None:
+        """
+        Grow the ring so `size` more bytes fit without reusing a slot.
+        """
+        slots = (self._length + size) // self.packet_bytes + 1
+        if slots * self.packet_bytes <= len(self._ring):
+            return
+        logger.info(f"Growing audio packet ring to {slots} packets")
+        ring = bytearray(self.packet_bytes * slots)
+        # Earlier packets keep the old buffer alive through their views
+        ring[:self._length] = self._view[self._start:self._start + self._length]
+        self._ring = ring
+        self._view = memoryview(ring)
+        self._start = 0
+
+    def write(self, data: memoryview) -> List[memoryview]:
+        """
+        Append bytes and return the packets completed by them.
+        """
+        self._reserve(len(data))
+        packets = []
+        offset = 0
+        while offset < len(data):
+            take = min(self.packet_bytes - self._length, len(data) - offset)
+            position = self._start + self._length
+            self._view[position:position + take] = data[offset:offset + take]
+            self._length += take
+            offset += take
+            if self._length == self.packet_bytes:
+                packets.append(self._view[self._start:self._start + self.packet_bytes])
+                self._start = (self._start + self.packet_bytes) % len(self._ring)
+                self._length = 0
+        return packets
+
+    def flush(self) -> Optional[memoryview]:
+        """
+        Return the pending partial packet, if any.
+        """
+        if not self._length:
+            return None
+        packet = self._view[self._start:self._start + self._length]
+        self._start = (self._start + self.packet_bytes) % len(self._ring)
+        self._length = 0
+        return packet
+
+    def clear(self) -> None:
+        self._length = 0
+
+class SilenceGate:
+    """
+    Voice-activity gate over 24 kHz PCM16 packets.
+
+    Each packet is split into 10 ms windows and scored in one pass: a
+    window is speech when its RMS level reaches the threshold, or comes
+    close with a high zero-crossing rate. Speech packets pass, followed by
+    `hangover_ms` of silence so upstream turn detection still sees the
+    pause; after that silence is held back. The last `preroll_ms` of it is
+    sent ahead of the next speech packet, the rest is dropped.
+    """
+
+    def __init__(
+        self,
+        packet_ms: int = AUDIO_PACKET_MS,
+        threshold_db: float = AUDIO_SILENCE_THRESHOLD_DB,
+        hangover_ms: int = AUDIO_SILENCE_HANGOVER_MS,
+        preroll_ms: int = AUDIO_SILENCE_PREROLL_MS
+    ):
+        if np is None:
+            raise ValueError("The silence gate needs numpy")
+        # Compared against the sum of squares of a window
+        full_scale = 32768.0 ** 2 * _GATE_WINDOW
+        self._loud = np.float32(full_scale * 10 ** (threshold_db / 10))
+        self._quiet = np.float32(full_scale * 10 ** ((threshold_db - _FRICATIVE_MARGIN_DB) / 10))
+        self._min_crossings = int(_FRICATIVE_ZCR * _GATE_WINDOW)
+        self.hangover_packets = math.ceil(hangover_ms / packet_ms)
+        self.preroll_packets = math.ceil(preroll_ms / packet_ms)
+        self._held: deque = deque()
+        # Start closed: nothing is sent until the first speech
+        self._silent_run = self.hangover_packets
+
+        windows = TARGET_RATE * packet_ms // 1000 // _GATE_WINDOW + 1
+        self._samples = np.empty((windows, _GATE_WINDOW), np.float32)
+        self._energy = np.empty(windows, np.float32)
+        self._signs = np.empty((windows, _GATE_WINDOW), bool)
+        self._crossings = np.empty((windows, _GATE_WINDOW - 1), bool)
+        self._crossing_counts = np.empty(windows, np.intp)
+
+        self.bytes_in = 0
+        self.bytes_sent = 0
+        self.silent_packets = 0
+
+    def is_speech(self, packet: memoryview) -> bool:
+        """
+        Whether any 10 ms window of the packet holds speech.
+        """
+        pcm = np.frombuffer(packet, "<i2")
+        count = min(len(pcm) // _GATE_WINDOW, len(self._energy))
+        if not count:
+            # Too short to judge; it belongs to whatever came before
+            return self._silent_run == 0
+        samples = self._samples[:count]
+        np.copyto(samples, pcm[:count * _GATE_WINDOW].reshape(count, _GATE_WINDOW))
+        energy = self._energy[:count]
+        np.einsum("ij,ij->i", samples, samples, out=energy)
+        if energy.max() >= self._loud:
+            return True
+
+        signs = self._signs[:count]
+        crossings = self._crossings[:count]
+        np.signbit(samples, out=signs)
+        np.not_equal(signs[:, 1:], signs[:, :-1], out=crossings)
+        counts = self._crossing_counts[:count]
+        np.sum(crossings, axis=1, out=counts)
+        return bool(np.any((energy >= self._quiet) & (counts >= self._min_crossings)))
+
+    def process(self, packet: memoryview) -> List[memoryview]:
+        """
+        Gate one packet.
+
+        Returns:
+            The packets to send now (held preroll first), possibly none
+        """
+        self.bytes_in += len(packet)
+        if self.is_speech(packet):
+            packets = list(self._held)
+            packets.append(packet)
+            self._held.clear()
+            self._silent_run = 0
+        elif self._silent_run < self.hangover_packets:
+            self._silent_run += 1
+            packets = [packet]
+        else:
+            self.silent_packets += 1
+            if self.preroll_packets:
+                if len(self._held) == self.preroll_packets:
+                    self._held.popleft()
+                # Copied: the packet's ring slot is reused while it is held
+                self._held.append(memoryview(bytes(packet)))
+            return []
+        self.bytes_sent += sum(len(p) for p in packets)
+        return packets
+
+    def reset(self) -> None:
+        self._held.clear()
+        self._silent_run = self.hangover_packets
+
+    @property
+    def bytes_saved(self) -> int:
+        return self.bytes_in - self.bytes_sent - sum(len(p) for p in self._held)
+
+class AudioIngest:
+    """
+    Per-stream ingest pipeline: format conversion, packetising and the
+    optional silence gate.
+    """
+
+    def __init__(
+        self,
+        input_format: str = TARGET_FORMAT,
+        packet_ms: int = AUDIO_PACKET_MS,
+        silence_gate: bool = AUDIO_SILENCE_GATE
+    ):
+        self.converter = PcmConverter(input_format)
+        self.gate = SilenceGate(packet_ms) if silence_gate and np is not None else None
+        self.ring = PacketRing(TARGET_RATE * 2 * packet_ms // 1000)
+        self.frames = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def _gate(self, packets: List[memoryview]) -> List[memoryview]:
+        if self.gate is not None:
+            packets = [sent for packet in packets for sent in self.gate.process(packet)]
+        self.bytes_out += sum(len(packet) for packet in packets)
+        return packets
+
+    def feed(self, data: bytes) -> List[memoryview]:
+        """
+        Take one browser frame and return the upstream packets it completes.
+        """
+        self.frames += 1
+        self.bytes_in += len(data)
+        return self._gate(self.ring.write(self.converter.convert(data)))
+
+    def flush(self) -> List[memoryview]:
+        """
+        Return buffered audio that has not made a full packet yet.
+        """
+        packet = self.ring.flush()
+        return self._gate([packet]) if packet is not None else []
+
+    def clear(self) -> None:
+        self.converter.reset()
+        self.ring.clear()
+        if self.gate is not None:
+            self.gate.reset()
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = {
+            "format": self.converter.input_format,
+            "frames": self.frames,
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "silence_gate": self.gate is not None,
+        }
+        if self.gate is not None:
+            stats["bytes_saved"] = self.gate.bytes_saved
+            stats["silent_packets"] = self.gate.silent_packets
+        return stats
@@ -0,0 +1,65 @@
+import os
+import asyncio
+import logging
+from typing import Dict, Any, List, Sequence, Tuple, TypeVar, AsyncIterator, Callable, Awaitable
+
+from backend.log import log_event
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Items of one batch in flight at once (a request may ask for fewer)
+N8N_BATCH_CONCURRENCY = int(os.getenv("N8N_BATCH_CONCURRENCY", "8"))
+# Largest batch accepted in one request
+N8N_BATCH_MAX_ITEMS = int(os.getenv("N8N_BATCH_MAX_ITEMS", "1000"))
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+async def fan_out(
+    items: Sequence[T],
+    handle: Callable[[int, T], Awaitable[R]],
+    concurrency: int = N8N_BATCH_CONCURRENCY
+) -> AsyncIterator[Tuple[int, R]]:
+    """
+    Run `handle` over items with at most `concurrency` in flight, yielding
+    (index, result) in completion order.
+
+    A fixed set of workers pulls items in order, so a large batch never
+    holds more than `concurrency` tasks. `handle` is expected to turn its
+    own failures into results; an exception it lets through ends the
+    batch. Closing the iterator early cancels the remaining work.
+    """
+    if not items:
+        return
+    pending = iter(enumerate(items))
+    done: asyncio.Queue = asyncio.Queue()
+
+    async def worker() -> None:
+        for index, item in pending:
+            try:
+                await done.put((index, await handle(index, item), None))
+            except Exception as e:
+                await done.put((index, None, e))
+                return
+
+    workers = [asyncio.create_task(worker()) for _ in range(max(1, min(concurrency, len(items))))]
+    try:
+        for _ in range(len(items)):
+            index, result, error = await done.get()
+            if error is not None:
+                raise error
+            yield index, result
+    finally:
+        for task in workers:
+            task.cancel()
+
+def summarize(results: List[Dict[str, Any]]) -> Dict[str, int]:
+    """
+    Count succeeded and failed item results.
+    """
+    succeeded = sum(1 for result in results if result.get("ok"))
+    return {"items": len(results), "succeeded": succeeded, "failed": len(results) - succeeded}
+
+def log_batch(summary: Dict[str, int], concurrency: int, elapsed: float) -> None:
+    log_event(logger, logging.INFO, "batch.completed", elapsed=round(elapsed, 3), concurrency=concurrency, **summary)
@@ -0,0 +1,157 @@
+import os
+import time
+import logging
+from urllib.parse import urlsplit
+from typing import Dict, Any, Callable
+
+from backend.log import log_event
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Consecutive failures that open a host's breaker
+N8N_BREAKER_FAILURE_THRESHOLD = int(os.getenv("N8N_BREAKER_FAILURE_THRESHOLD", "5"))
+# Seconds an open breaker fails fast before letting a probe through
+N8N_BREAKER_RECOVERY_TIMEOUT = float(os.getenv("N8N_BREAKER_RECOVERY_TIMEOUT", "30"))
+# Probe requests allowed at once while half-open
+N8N_BREAKER_HALF_OPEN_MAX_CALLS = int(os.getenv("N8N_BREAKER_HALF_OPEN_MAX_CALLS", "1"))
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+class CircuitOpenError(Exception):
+    """Raised when a call is refused because the host's breaker is open."""
+
+    def __init__(self, host: str, retry_after: float):
+        super().__init__(f"n8n host {host} is unavailable, retry in {retry_after:.0f}s")
+        self.host = host
+        self.retry_after = retry_after
+
+class CircuitBreaker:
+    """
+    Circuit breaker for one upstream host.
+
+    Closed: calls go through; `failure_threshold` consecutive failures open it.
+    Open: calls fail fast until `recovery_timeout` has passed.
+    Half-open: up to `half_open_max_calls` probes go through; a success
+    closes the breaker, a failure opens it again.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        failure_threshold: int = N8N_BREAKER_FAILURE_THRESHOLD,
+        recovery_timeout: float = N8N_BREAKER_RECOVERY_TIMEOUT,
+        half_open_max_calls: int = N8N_BREAKER_HALF_OPEN_MAX_CALLS,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.host = host
+        self.failure_threshold = max(1, failure_threshold)
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = max(1, half_open_max_calls)
+        self._clock = clock
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probes = 0
+        self.rejected = 0
+        self.opened = 0
+
+    @property
+    def state(self) -> str:
+        if self._state == OPEN and self._clock() - self._opened_at >= self.recovery_timeout:
+            self._set_state(HALF_OPEN)
+            self._probes = 0
+        return self._state
+
+    def _set_state(self, state: str) -> None:
+        if state != self._state:
+            log_event(logger, logging.WARNING if state == OPEN else logging.INFO, "breaker.state", host=self.host, state=state, failures=self._failures)
+            self._state = state
+
+    def retry_after(self) -> float:
+        """
+        Seconds until an open breaker lets a probe through.
+        """
+        if self.state != OPEN:
+            return 0.0
+        return max(0.0, self.recovery_timeout - (self._clock() - self._opened_at))
+
+    def before_call(self) -> None:
+        """
+        Admit a call or raise CircuitOpenError.
+
+        Every admitted call must be followed by record_success(),
+        record_failure() or release().
+        """
+        state = self.state
+        if state == OPEN or (state == HALF_OPEN and self._probes >= self.half_open_max_calls):
+            self.rejected += 1
+            raise CircuitOpenError(self.host, max(1.0, self.retry_after()))
+        if state == HALF_OPEN:
+            self._probes += 1
+
+    def record_success(self) -> None:
+        self._failures = 0
+        if self._state == HALF_OPEN:
+            self._probes = max(0, self._probes - 1)
+            self._set_state(CLOSED)
+
+    def record_failure(self) -> None:
+        self._failures += 1
+        if self._state == HALF_OPEN or (self._state == CLOSED and self._failures >= self.failure_threshold):
+            self._probes = 0
+            self._opened_at = self._clock()
+            self.opened += 1
+            self._set_state(OPEN)
+
+    def release(self) -> None:
+        """
+        Give back an admitted call that ended without an outcome (e.g. it was cancelled).
+        """
+        if self._state == HALF_OPEN:
+            self._probes = max(0, self._probes - 1)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self._failures,
+            "retry_after": round(self.retry_after(), 1),
+            "opened": self.opened,
+            "rejected": self.rejected,
+        }
+
+class BreakerRegistry:
+    """
+    One circuit breaker per upstream host, created on first use.
+    """
+
+    def __init__(self, **options: Any):
+        self._options = options
+        self._breakers: Dict[str, CircuitBreaker] = {}
+
+    def get(self, url: str) -> CircuitBreaker:
+        """
+        Return the breaker for the host of `url`.
+        """
+        host = urlsplit(url).netloc or url
+        breaker = self._breakers.get(host)
+        if breaker is None:
+            breaker = self._breakers[host] = CircuitBreaker(host, **self._options)
+        return breaker
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Return the state of every known host's breaker.
+        """
+        return {host: breaker.get_stats() for host, breaker in self._breakers.items()}
+
+# Breakers for n8n webhook hosts
+n8n_breakers = BreakerRegistry()
+
+def is_failure_status(status: int) -> bool:
+    """
+    Whether a response status means the host is unhealthy (as opposed to a bad request).
+    """
+    return status >= 500 or status == 429
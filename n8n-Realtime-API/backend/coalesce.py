@@ -0,0 +1,64 @@
+import asyncio
+import logging
+from typing import Dict, Any, Hashable, Callable, Awaitable, TypeVar
+
+from backend.log import log_event
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+class SingleFlight:
+    """
+    Coalesce identical in-flight calls into one.
+
+    The first caller for a key starts the call; callers arriving with the
+    same key while it is running await the same task and get the same
+    result (or exception). The task is shielded, so a caller that goes away
+    does not cancel the call for the others.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        """
+        Run `fn` once per key at a time.
+
+        Args:
+            key: Identifies duplicate calls
+            fn: Zero-argument coroutine function performing the call
+
+        Returns:
+            The shared result of the call
+        """
+        call = self._calls.get(key)
+        if call is None:
+            self.calls += 1
+            call = asyncio.ensure_future(fn())
+            self._calls[key] = call
+            call.add_done_callback(lambda done: self._forget(key, done))
+        else:
+            self.coalesced += 1
+            log_event(logger, logging.INFO, "turn.coalesced", sampled=True, session_id=key[0] if isinstance(key, tuple) else key)
+        return await asyncio.shield(call)
+
+    def _forget(self, key: Hashable, call: asyncio.Future) -> None:
+        if self._calls.get(key) is call:
+            del self._calls[key]
+        if not call.cancelled():
+            # Mark the exception as retrieved when every caller went away
+            call.exception()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Return call and coalescing counters.
+        """
+        return {
+            "in_flight": len(self._calls),
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+        }
@@ -0,0 +1,167 @@
+import os
+import gzip
+import json
+import zlib
+import logging
+import aiohttp
+from typing import Dict, Any, Mapping
+
+# Brotli is optional; aiohttp decodes "br" responses only when it is installed
+try:
+    import brotli
+except ImportError:  # pragma: no cover - depends on the environment
+    brotli = None
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Encoding for request bodies sent to n8n: none, gzip or deflate
+N8N_REQUEST_COMPRESSION = os.getenv("N8N_REQUEST_COMPRESSION", "none").lower()
+# Bodies smaller than this are sent as they are
+N8N_COMPRESSION_MIN_BYTES = int(os.getenv("N8N_COMPRESSION_MIN_BYTES", "1024"))
+# zlib compression level (1 fastest .. 9 smallest)
+N8N_COMPRESSION_LEVEL = int(os.getenv("N8N_COMPRESSION_LEVEL", "6"))
+# Per-webhook overrides as JSON, e.g.
+# {"https://n8n.example.com/webhook/agent": {"request": "gzip", "min_bytes": 512, "accept": "gzip"}}
+N8N_COMPRESSION_RULES = os.getenv("N8N_COMPRESSION_RULES", "")
+
+REQUEST_ENCODINGS = ("none", "gzip", "deflate")
+
+# Response encodings offered to n8n; aiohttp decodes all of them
+DEFAULT_ACCEPT_ENCODING = "gzip, deflate, br" if brotli is not None else "gzip, deflate"
+
+class Policy:
+    """
+    Compression settings for one webhook.
+    """
+
+    __slots__ = ("request", "min_bytes", "accept")
+
+    def __init__(self, request: str, min_bytes: int, accept: str):
+        if request not in REQUEST_ENCODINGS:
+            raise ValueError(f"Unsupported request encoding: {request}")
+        self.request = request
+        self.min_bytes = min_bytes
+        self.accept = accept
+
+def _policy(rule: Mapping[str, Any]) -> Policy:
+    return Policy(
+        str(rule.get("request", N8N_REQUEST_COMPRESSION)).lower(),
+        int(rule.get("min_bytes", N8N_COMPRESSION_MIN_BYTES)),
+        str(rule.get("accept", DEFAULT_ACCEPT_ENCODING))
+    )
+
+def _load_rules(raw: str) -> Dict[str, Policy]:
+    if not raw:
+        return {}
+    try:
+        return {url: _policy(rule) for url, rule in json.loads(raw).items()}
+    except (ValueError, AttributeError, TypeError) as e:
+        logger.error(f"Invalid N8N_COMPRESSION_RULES, ignoring: {str(e)}")
+        return {}
+
+def _default_policy() -> Policy:
+    try:
+        return _policy({})
+    except ValueError as e:
+        logger.error(f"Invalid N8N_REQUEST_COMPRESSION, sending bodies uncompressed: {str(e)}")
+        return Policy("none", N8N_COMPRESSION_MIN_BYTES, DEFAULT_ACCEPT_ENCODING)
+
+# Policy for webhooks without a rule, and webhook URL -> policy
+_default: Policy = _default_policy()
+_rules: Dict[str, Policy] = _load_rules(N8N_COMPRESSION_RULES)
+
+# Byte counters for health and metrics
+_stats = {
+    "requests_compressed": 0,
+    "request_bytes": 0,
+    "request_bytes_sent": 0,
+    "responses_compressed": 0,
+    "response_bytes": 0,
+    "response_bytes_received": 0,
+}
+
+def set_rules(rules: Mapping[str, Mapping[str, Any]]) -> None:
+    """
+    Replace the per-webhook compression rules.
+    """
+    global _rules
+    _rules = {url: _policy(rule) for url, rule in rules.items()}
+
+def policy_for(webhook_url: str) -> Policy:
+    return _rules.get(webhook_url, _default)
+
+def _compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "gzip":
+        # mtime=0 keeps the output deterministic for equal bodies
+        return gzip.compress(body, compresslevel=N8N_COMPRESSION_LEVEL, mtime=0)
+    return zlib.compress(body, N8N_COMPRESSION_LEVEL)
+
+def prepare_request(webhook_url: str, body: bytes, headers: Dict[str, str]) -> bytes:
+    """
+    Apply the webhook's compression policy to an outgoing request.
+
+    Sets Accept-Encoding on `headers` and, when the body is large enough
+    and compression makes it smaller, compresses it and sets
+    Content-Encoding.
+
+    Args:
+        webhook_url: The n8n webhook URL the request goes to
+        body: The encoded JSON body
+        headers: The request headers, updated in place
+
+    Returns:
+        The body to send
+    """
+    policy = policy_for(webhook_url)
+    if policy.accept:
+        headers["Accept-Encoding"] = policy.accept
+    if policy.request == "none" or len(body) < policy.min_bytes:
+        return body
+
+    compressed = _compress(body, policy.request)
+    if len(compressed) >= len(body):
+        return body
+    headers["Content-Encoding"] = policy.request
+    _stats["requests_compressed"] += 1
+    _stats["request_bytes"] += len(body)
+    _stats["request_bytes_sent"] += len(compressed)
+    return compressed
+
+def record_response(response: aiohttp.ClientResponse, decoded_bytes: int) -> None:
+    """
+    Count a fully read response that arrived compressed.
+
+    Only responses with a Content-Length are counted; for chunked bodies
+    the size on the wire is not known after decoding.
+    """
+    encoding = response.headers.get("Content-Encoding", "").lower()
+    if not encoding or encoding == "identity" or response.content_length is None:
+        return
+    _stats["responses_compressed"] += 1
+    _stats["response_bytes"] += decoded_bytes
+    _stats["response_bytes_received"] += response.content_length
+
+def bytes_saved() -> Dict[str, int]:
+    """
+    Return the bytes compression kept off the wire, by direction.
+    """
+    return {
+        "request": _stats["request_bytes"] - _stats["request_bytes_sent"],
+        "response": max(0, _stats["response_bytes"] - _stats["response_bytes_received"]),
+    }
+
+def get_compression_stats() -> Dict[str, Any]:
+    """
+    Get compression settings and byte counters.
+    """
+    saved = bytes_saved()
+    return {
+        "request_encoding": _default.request,
+        "min_bytes": _default.min_bytes,
+        "accept_encoding": _default.accept,
+        "rules": len(_rules),
+        **_stats,
+        "request_bytes_saved": saved["request"],
+        "response_bytes_saved": saved["response"],
+    }
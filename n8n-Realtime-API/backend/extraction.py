@@ -0,0 +1,156 @@
+import os
+import re
+import json
+import logging
+from functools import lru_cache
+from typing import Dict, Any, Optional, Tuple, Union, Mapping
+
+from backend.log import log_event
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Per-webhook extraction rules as JSON, e.g.
+# {"https://n8n.example.com/webhook/agent": "/0/output", "https://n8n.example.com/webhook/x": "$.data.reply"}
+N8N_EXTRACT_RULES = os.getenv("N8N_EXTRACT_RULES", "")
+
+# Fields probed (in order) when no rule matches
+TEXT_FIELDS = ("message", "response", "content", "result", "output")
+
+_PATH_TOKEN = re.compile(r"\[(\d+)\]|\[[\"']([^\"']*)[\"']\]|([^.\[\]]+)")
+
+Path = Tuple[Union[str, int], ...]
+
+@lru_cache(maxsize=256)
+def compile_rule(expression: str) -> Path:
+    """
+    Compile an extraction rule into a tuple of keys and list indexes.
+
+    Accepts a JSON Pointer ("/0/output") or a dotted path with optional
+    brackets ("$[0].output", "data.items[0].text", "0.output").
+
+    Args:
+        expression: The rule expression
+
+    Returns:
+        The path as a tuple; numeric segments are list indexes
+    """
+    expression = expression.strip()
+    if expression.startswith("/"):
+        tokens = [
+            token.replace("~1", "/").replace("~0", "~")
+            for token in expression[1:].split("/")
+        ]
+        return tuple(int(token) if token.isdigit() else token for token in tokens)
+
+    if expression.startswith("$"):
+        expression = expression[1:]
+    path = []
+    for index, quoted, name in _PATH_TOKEN.findall(expression):
+        if index:
+            path.append(int(index))
+        elif quoted:
+            path.append(quoted)
+        else:
+            path.append(int(name) if name.isdigit() else name)
+    return tuple(path)
+
+def resolve(path: Path, value: Any) -> Any:
+    """
+    Follow a compiled path through decoded JSON.
+
+    Returns:
+        The value at the path, or None if any segment is missing
+    """
+    for segment in path:
+        if isinstance(segment, int) and isinstance(value, list):
+            if segment >= len(value):
+                return None
+            value = value[segment]
+        elif isinstance(value, dict):
+            value = value.get(str(segment))
+            if value is None:
+                return None
+        else:
+            return None
+    return value
+
+def _load_rules(raw: str) -> Dict[str, Path]:
+    if not raw:
+        return {}
+    try:
+        return {url: compile_rule(expression) for url, expression in json.loads(raw).items()}
+    except (ValueError, AttributeError, TypeError) as e:
+        logger.error(f"Invalid N8N_EXTRACT_RULES, ignoring: {str(e)}")
+        return {}
+
+# webhook URL -> compiled path, compiled once at import
+_rules: Dict[str, Path] = _load_rules(N8N_EXTRACT_RULES)
+
+def set_rules(rules: Mapping[str, str]) -> None:
+    """
+    Replace the per-webhook extraction rules.
+    """
+    global _rules
+    _rules = {url: compile_rule(expression) for url, expression in rules.items()}
+
+def _extract_default(response_json: Any) -> Optional[Dict[str, Any]]:
+    # Check if the response has a text field
+    if isinstance(response_json, dict):
+        if "text" in response_json:
+            return response_json
+        # Try common formats
+        for key in TEXT_FIELDS:
+            value = response_json.get(key)
+            if isinstance(value, str):
+                log_event(logger, logging.DEBUG, "n8n.text_field", field=key)
+                return {"text": value}
+        return None
+
+    # If response is just a string, wrap it
+    if isinstance(response_json, str):
+        return {"text": response_json}
+
+    # n8n returns all items as a list; a single item is unwrapped
+    if isinstance(response_json, list) and len(response_json) == 1:
+        return _extract_default(response_json[0])
+    return None
+
+def extract_text(
+    response_json: Any,
+    response_text: Optional[str] = None,
+    webhook_url: Optional[str] = None
+) -> Optional[Dict[str, Any]]:
+    """
+    Extract the reply text from a decoded n8n response.
+
+    A rule configured for the webhook is tried first, then the default
+    fields (text, message, response, content, result, output).
+
+    Args:
+        response_json: The decoded JSON value
+        response_text: The raw body, used as the reply when no text field is found
+        webhook_url: The webhook the response came from, used to pick a rule
+
+    Returns:
+        A dict with a "text" field, or None if nothing was found and no raw body was given
+    """
+    path = _rules.get(webhook_url) if webhook_url is not None else None
+    if path is not None:
+        value = resolve(path, response_json)
+        if isinstance(value, str):
+            return {"text": value}
+        if value is not None:
+            extracted = _extract_default(value)
+            if extracted is not None:
+                return extracted
+
+    extracted = _extract_default(response_json)
+    if extracted is not None:
+        return extracted
+
+    # If we can't find a text field, use the whole response as text
+    if response_text is not None:
+        log_event(logger, logging.DEBUG, "n8n.text_field", field=None)
+        return {"text": response_text}
+    return None
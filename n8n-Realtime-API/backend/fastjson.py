@@ -0,0 +1,39 @@
+import json
+from typing import Any, Union
+
+# orjson is optional; fall back to the standard library when it is not installed
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depends on the environment
+    orjson = None
+
+# Raised by loads() for malformed input (orjson's error subclasses json.JSONDecodeError)
+JSONDecodeError = json.JSONDecodeError
+
+HAS_ORJSON = orjson is not None
+
+def loads(data: Union[bytes, bytearray, memoryview, str]) -> Any:
+    """
+    Decode JSON from bytes or str without an intermediate decode step when orjson is available.
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        data = bytes(data).decode("utf-8")
+    return json.loads(data)
+
+def dumps(obj: Any) -> bytes:
+    """
+    Encode an object as compact UTF-8 JSON bytes.
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, default=str)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8")
+
+def dumps_str(obj: Any) -> str:
+    """
+    Encode an object as a compact JSON string.
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, default=str).decode("utf-8")
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), default=str)
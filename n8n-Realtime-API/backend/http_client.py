@@ -0,0 +1,125 @@
+import os
+import logging
+import aiohttp
+from typing import Dict, Any, Optional
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Pool configuration (override through environment variables)
+HTTP_POOL_LIMIT = int(os.getenv("HTTP_POOL_LIMIT", "100"))
+HTTP_POOL_LIMIT_PER_HOST = int(os.getenv("HTTP_POOL_LIMIT_PER_HOST", "20"))
+HTTP_DNS_CACHE_TTL = int(os.getenv("HTTP_DNS_CACHE_TTL", "300"))
+HTTP_KEEPALIVE_TIMEOUT = float(os.getenv("HTTP_KEEPALIVE_TIMEOUT", "30"))
+
+# Shared client session, created on application startup
+_session: Optional[aiohttp.ClientSession] = None
+
+# Request counters for pool statistics
+_stats = {
+    "requests": 0,
+    "sessions_created": 0,
+}
+
+def _create_session() -> aiohttp.ClientSession:
+    """
+    Create the pooled client session with keep-alive and DNS caching.
+    """
+    connector = aiohttp.TCPConnector(
+        limit=HTTP_POOL_LIMIT,
+        limit_per_host=HTTP_POOL_LIMIT_PER_HOST,
+        use_dns_cache=True,
+        ttl_dns_cache=HTTP_DNS_CACHE_TTL,
+        keepalive_timeout=HTTP_KEEPALIVE_TIMEOUT,
+    )
+    _stats["sessions_created"] += 1
+    return aiohttp.ClientSession(
+        connector=connector,
+        trace_configs=[_create_trace_config()],
+    )
+
+def _create_trace_config() -> aiohttp.TraceConfig:
+    """
+    Count outgoing requests so pool statistics show how many calls were made.
+    """
+    async def on_request_start(session, context, params):
+        _stats["requests"] += 1
+
+    trace_config = aiohttp.TraceConfig()
+    trace_config.on_request_start.append(on_request_start)
+    return trace_config
+
+async def start_http_client() -> aiohttp.ClientSession:
+    """
+    Create the shared HTTP client. Called from the application lifespan.
+
+    Returns:
+        The process-wide aiohttp.ClientSession
+    """
+    global _session
+    if _session is None or _session.closed:
+        _session = _create_session()
+        logger.info(
+            f"HTTP client pool started (limit={HTTP_POOL_LIMIT}, "
+            f"limit_per_host={HTTP_POOL_LIMIT_PER_HOST}, dns_ttl={HTTP_DNS_CACHE_TTL}s)"
+        )
+    return _session
+
+async def close_http_client() -> None:
+    """
+    Close the shared HTTP client and release pooled connections.
+    """
+    global _session
+    if _session is not None and not _session.closed:
+        await _session.close()
+        logger.info("HTTP client pool closed")
+    _session = None
+
+def get_http_client() -> aiohttp.ClientSession:
+    """
+    Return the shared HTTP client, creating it lazily if the lifespan
+    has not started it (e.g. when a module is used outside the app).
+
+    Returns:
+        The process-wide aiohttp.ClientSession
+    """
+    global _session
+    if _session is None or _session.closed:
+        _session = _create_session()
+    return _session
+
+def get_pool_stats() -> Dict[str, Any]:
+    """
+    Return statistics for the shared connection pool.
+
+    Returns:
+        A dictionary with pool limits, open/idle connection counts and request counters
+    """
+    stats: Dict[str, Any] = {
+        "active": _session is not None and not _session.closed,
+        "limit": HTTP_POOL_LIMIT,
+        "limit_per_host": HTTP_POOL_LIMIT_PER_HOST,
+        "dns_cache_ttl": HTTP_DNS_CACHE_TTL,
+        "keepalive_timeout": HTTP_KEEPALIVE_TIMEOUT,
+        "requests": _stats["requests"],
+        "sessions_created": _stats["sessions_created"],
+        "in_use": 0,
+        "idle": 0,
+        "idle_per_host": {},
+    }
+    if not stats["active"]:
+        return stats
+
+    connector = _session.connector
+    # aiohttp does not expose these counters publicly; read them defensively
+    acquired = getattr(connector, "_acquired", None)
+    idle = getattr(connector, "_conns", None)
+    if acquired is not None:
+        stats["in_use"] = len(acquired)
+    if idle:
+        idle_per_host = {
+            f"{key.host}:{key.port}": len(conns) for key, conns in idle.items()
+        }
+        stats["idle_per_host"] = idle_per_host
+        stats["idle"] = sum(idle_per_host.values())
+    return stats
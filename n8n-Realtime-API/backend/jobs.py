@@ -0,0 +1,272 @@
+import os
+import hmac
+import time
+import uuid
+import asyncio
+import logging
+from collections import deque
+from urllib.parse import quote
+from typing import Dict, Any, Optional, AsyncIterator, Tuple
+
+from backend.log import log_event
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Seconds an async job waits for its n8n callback before it fails
+N8N_JOB_TTL = float(os.getenv("N8N_JOB_TTL", "600"))
+# Jobs allowed to wait for a callback at once (per process)
+N8N_JOB_MAX_PENDING = int(os.getenv("N8N_JOB_MAX_PENDING", "10000"))
+# Recent events kept per session for clients that (re)connect late
+N8N_JOB_EVENT_BUFFER = int(os.getenv("N8N_JOB_EVENT_BUFFER", "50"))
+# Seconds between keepalives on idle event streams
+N8N_JOB_EVENTS_HEARTBEAT = float(os.getenv("N8N_JOB_EVENTS_HEARTBEAT", "15"))
+# Let the frontend forward turns as async jobs
+N8N_JOB_MODE = os.getenv("N8N_JOB_MODE", "false").lower() in ("1", "true", "yes")
+# Public base URL n8n uses to reach /api/webhook (defaults to the URL of the forwarding request)
+N8N_CALLBACK_BASE_URL = os.getenv("N8N_CALLBACK_BASE_URL", "").rstrip("/")
+# Shared secret n8n sends in X-N8N-Callback-Secret to push replies that answer no job (unset: only job callbacks are pushed)
+N8N_CALLBACK_SECRET = os.getenv("N8N_CALLBACK_SECRET", "")
+
+CALLBACK_SECRET_HEADER = "X-N8N-Callback-Secret"
+
+class _Job:
+    def __init__(self, job_id: str, session_id: str, expiry: asyncio.TimerHandle):
+        self.job_id = job_id
+        self.session_id = session_id
+        self.created = time.time()
+        self.expiry = expiry
+
+class _Channel:
+    """
+    Event log of one session: a bounded buffer of numbered events and a
+    condition listeners wait on.
+    """
+
+    def __init__(self, size: int):
+        self.events: deque = deque(maxlen=size)
+        self.sequence = 0
+        self.listeners = 0
+        self.changed = asyncio.Condition()
+        self.touched = time.monotonic()
+
+class JobHub:
+    """
+    Track async n8n jobs and push their results to the waiting session.
+
+    A job is created when a turn is forwarded in job mode; n8n answers
+    right away and later posts the result to /api/webhook/{session_id}
+    with the job id. The result is published on the session's channel,
+    which clients read over SSE (/api/events/{session_id}) or the turn
+    WebSocket. Jobs that get no callback within `ttl` fail with 504.
+
+    Jobs live in this process only: with several workers the callback
+    must reach the worker that created the job (one worker, or sticky
+    routing by session).
+    """
+
+    def __init__(
+        self,
+        ttl: float = N8N_JOB_TTL,
+        max_pending: int = N8N_JOB_MAX_PENDING,
+        buffer_size: int = N8N_JOB_EVENT_BUFFER
+    ):
+        self.ttl = ttl
+        self.max_pending = max_pending
+        self.buffer_size = buffer_size
+        self._jobs: Dict[str, _Job] = {}
+        self._channels: Dict[str, _Channel] = {}
+        self._tasks = set()
+        self.created = 0
+        self.completed = 0
+        self.failed = 0
+        self.expired = 0
+
+    def _channel(self, session_id: str) -> _Channel:
+        channel = self._channels.get(session_id)
+        if channel is None:
+            self._sweep()
+            channel = self._channels[session_id] = _Channel(self.buffer_size)
+        channel.touched = time.monotonic()
+        return channel
+
+    def _sweep(self) -> None:
+        # Forget idle channels of sessions that have no pending jobs
+        cutoff = time.monotonic() - self.ttl
+        busy = {job.session_id for job in self._jobs.values()}
+        for session_id in [
+            session_id for session_id, channel in self._channels.items()
+            if not channel.listeners and channel.touched < cutoff and session_id not in busy
+        ]:
+            del self._channels[session_id]
+
+    def create(self, session_id: str) -> str:
+        """
+        Register a new job for a session.
+
+        Returns:
+            The job id
+
+        Raises:
+            RuntimeError: if too many jobs are already pending
+        """
+        if len(self._jobs) >= self.max_pending:
+            raise RuntimeError("Too many pending n8n jobs")
+        job_id = uuid.uuid4().hex
+        expiry = asyncio.get_running_loop().call_later(self.ttl, self._expire, job_id)
+        self._jobs[job_id] = _Job(job_id, session_id, expiry)
+        self._channel(session_id)
+        self.created += 1
+        log_event(logger, logging.INFO, "job.created", sampled=True, session_id=session_id, job_id=job_id)
+        return job_id
+
+    def run(self, coroutine) -> None:
+        """
+        Run a job's background work (the call that starts the workflow).
+        """
+        task = asyncio.create_task(coroutine)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def last_sequence(self, session_id: str) -> int:
+        """
+        Return the sequence number of the session's latest event (0 if none).
+        """
+        channel = self._channels.get(session_id)
+        return channel.sequence if channel is not None else 0
+
+    def _finish(self, session_id: str, job_id: str) -> bool:
+        job = self._jobs.get(job_id)
+        if job is None or job.session_id != session_id:
+            return False
+        job.expiry.cancel()
+        del self._jobs[job_id]
+        return True
+
+    async def complete(self, session_id: str, job_id: str, event: Dict[str, Any], data: Dict[str, Any]) -> bool:
+        """
+        Publish a job's result.
+
+        Args:
+            session_id: Session the callback was posted for
+            job_id: The job being answered
+            event: The conversation.item.create event for the Realtime API
+            data: The body n8n posted
+
+        Returns:
+            False if no such job is pending for the session
+        """
+        if not self._finish(session_id, job_id):
+            return False
+        self.completed += 1
+        await self.publish(session_id, {"type": "job.completed", "job_id": job_id, "event": event, "data": data})
+        return True
+
+    async def fail(self, session_id: str, job_id: str, status: int, detail: str) -> bool:
+        """
+        Fail a pending job and tell the session.
+        """
+        if not self._finish(session_id, job_id):
+            return False
+        self.failed += 1
+        log_event(logger, logging.WARNING, "job.failed", session_id=session_id, job_id=job_id, status=status, reason=detail)
+        await self.publish(session_id, {"type": "job.failed", "job_id": job_id, "status": status, "detail": detail})
+        return True
+
+    def _expire(self, job_id: str) -> None:
+        job = self._jobs.get(job_id)
+        if job is None:
+            return
+        self.expired += 1
+        self.run(self.fail(job.session_id, job_id, 504, "n8n did not call back in time"))
+
+    async def publish(self, session_id: str, event: Dict[str, Any]) -> int:
+        """
+        Append an event to a session's channel and wake its listeners.
+
+        Returns:
+            The event's sequence number within the session
+        """
+        channel = self._channel(session_id)
+        channel.sequence += 1
+        channel.events.append((channel.sequence, event))
+        async with channel.changed:
+            channel.changed.notify_all()
+        return channel.sequence
+
+    async def listen(
+        self,
+        session_id: str,
+        after: int = 0,
+        heartbeat: Optional[float] = None
+    ) -> AsyncIterator[Tuple[int, Optional[Dict[str, Any]]]]:
+        """
+        Yield (sequence, event) for a session's events after `after`, waiting for new ones.
+
+        Buffered events are replayed first, so a client reconnecting with the
+        last sequence it saw does not miss results published in between.
+
+        Args:
+            heartbeat: If set, yield (sequence, None) after this many idle seconds
+        """
+        channel = self._channel(session_id)
+        channel.listeners += 1
+        try:
+            while True:
+                for sequence, event in list(channel.events):
+                    if sequence > after:
+                        after = sequence
+                        yield sequence, event
+                async with channel.changed:
+                    if channel.sequence > after:
+                        continue
+                    try:
+                        await asyncio.wait_for(channel.changed.wait(), heartbeat)
+                    except asyncio.TimeoutError:
+                        pass
+                if channel.sequence <= after:
+                    yield after, None
+        finally:
+            channel.listeners -= 1
+            channel.touched = time.monotonic()
+
+    async def close(self) -> None:
+        """
+        Cancel background work and pending expiry timers.
+        """
+        for job in self._jobs.values():
+            job.expiry.cancel()
+        self._jobs.clear()
+        for task in list(self._tasks):
+            task.cancel()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "pending": len(self._jobs),
+            "created": self.created,
+            "completed": self.completed,
+            "failed": self.failed,
+            "expired": self.expired,
+            "listeners": sum(channel.listeners for channel in self._channels.values()),
+        }
+
+def callback_url(base_url: str, session_id: str, job_id: str) -> str:
+    """
+    Build the URL n8n posts a job's result to.
+
+    Args:
+        base_url: Base URL of the forwarding request, used unless N8N_CALLBACK_BASE_URL is set
+    """
+    base = N8N_CALLBACK_BASE_URL or base_url.rstrip("/")
+    return f"{base}/api/webhook/{quote(session_id, safe='')}?job_id={job_id}"
+
+def check_callback_secret(secret: Optional[str]) -> bool:
+    """
+    Whether a callback without a job id may be pushed to the session's clients.
+
+    Returns:
+        True only if N8N_CALLBACK_SECRET is set and `secret` matches it
+    """
+    if not N8N_CALLBACK_SECRET or not secret:
+        return False
+    return hmac.compare_digest(secret.strip().encode(), N8N_CALLBACK_SECRET.encode())
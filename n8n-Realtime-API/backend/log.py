@@ -0,0 +1,158 @@
+import os
+import json
+import time
+import queue
+import random
+import logging
+import logging.handlers
+from typing import Dict, Any, Optional
+
+# Log level for the application
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# Fraction of high-volume events that are logged (errors and warnings are never sampled)
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "0.1"))
+# Per-event overrides as JSON, e.g. {"n8n.response": 1.0}
+LOG_SAMPLE_RATES = os.getenv("LOG_SAMPLE_RATES", "")
+# Replace transcripts and reply texts with their length
+LOG_REDACT_TRANSCRIPTS = os.getenv("LOG_REDACT_TRANSCRIPTS", "true").lower() not in ("0", "false", "no")
+
+# Field names whose values are never written to the log
+SECRET_FIELDS = frozenset({"client_secret", "authorization", "api_key", "token", "password", "secret"})
+# Field names holding user speech or n8n replies; every string inside them is redacted
+TRANSCRIPT_FIELDS = frozenset({
+    "transcription", "transcript", "text", "body", "response", "response_text",
+    "delta", "message", "output", "content"
+})
+
+def _load_sample_rates(raw: str) -> Dict[str, float]:
+    if not raw:
+        return {}
+    try:
+        return {event: float(rate) for event, rate in json.loads(raw).items()}
+    except (ValueError, AttributeError, TypeError):
+        return {}
+
+_sample_rates = _load_sample_rates(LOG_SAMPLE_RATES)
+_listener: Optional[logging.handlers.QueueListener] = None
+_output: Optional[logging.Handler] = None
+
+def redact(key: str, value: Any, free_text: bool = False) -> Any:
+    """
+    Redact secrets and transcripts from a field value (recursing into dicts and lists).
+
+    A transcript field is free text all the way down: a decoded n8n body
+    logged as `body` has every string redacted, whatever its key.
+    """
+    lowered = key.lower()
+    if lowered in SECRET_FIELDS:
+        return "<redacted>"
+    free_text = free_text or (LOG_REDACT_TRANSCRIPTS and lowered in TRANSCRIPT_FIELDS)
+    if free_text and isinstance(value, str):
+        return f"<redacted len={len(value)}>"
+    if isinstance(value, dict):
+        return {k: redact(str(k), v, free_text) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [redact(key, v, free_text) for v in value]
+    return value
+
+def _format_value(value: Any) -> str:
+    if isinstance(value, str):
+        text = value
+    else:
+        try:
+            text = json.dumps(value, default=str, ensure_ascii=False, separators=(",", ":"))
+        except (TypeError, ValueError):
+            text = repr(value)
+    if not text or any(c in text for c in ' "=\n'):
+        return json.dumps(text, ensure_ascii=False)
+    return text
+
+class KeyValueFormatter(logging.Formatter):
+    """
+    Render records as `ts level logger event key=value ...`.
+
+    Structured records carry their fields in `record.kv`; everything else is
+    rendered with its message under `msg=`. Runs in the queue listener
+    thread, so request handlers never pay for formatting.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        timestamp = time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(record.created))
+        parts = [f"{timestamp}.{int(record.msecs):03d}", f"level={record.levelname}", f"logger={record.name}"]
+        fields = getattr(record, "kv", None)
+        if fields is not None:
+            parts.append(f"event={record.msg}")
+            parts.extend(f"{key}={_format_value(redact(key, value))}" for key, value in fields.items())
+        else:
+            parts.append(f"msg={_format_value(record.getMessage())}")
+        line = " ".join(parts)
+        if record.exc_info:
+            line += "\n" + self.formatException(record.exc_info)
+        return line
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that hands records over unformatted; the stock handler
+    formats the message in the caller's thread.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+def _route_root(handler: logging.Handler) -> None:
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+
+def setup_logging(level: str = LOG_LEVEL) -> None:
+    """
+    Route all logging through a background queue handler.
+
+    Idempotent, and restarts the listener after shutdown_logging, so the
+    application lifespan can call it on every startup.
+    """
+    global _listener, _output
+    if _listener is not None:
+        return
+    if _output is None:
+        _output = logging.StreamHandler()
+        _output.setFormatter(KeyValueFormatter())
+    log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    _listener = logging.handlers.QueueListener(log_queue, _output, respect_handler_level=True)
+    _route_root(_DeferredQueueHandler(log_queue))
+    logging.getLogger().setLevel(level)
+    _listener.start()
+
+def shutdown_logging() -> None:
+    """
+    Flush queued records and stop the background listener.
+
+    Records logged afterwards are written directly, in the caller's thread,
+    until setup_logging starts a new listener.
+    """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+        _route_root(_output)
+
+def log_event(logger: logging.Logger, level: int, event: str, sampled: bool = False, **fields: Any) -> None:
+    """
+    Log a structured event. Nothing is built or formatted unless the level
+    is enabled (and, for sampled events, the event is picked by the sampler).
+
+    Args:
+        logger: Logger to write to
+        level: logging level
+        event: Dotted event name, e.g. "n8n.response"
+        sampled: Apply LOG_SAMPLE_RATE / LOG_SAMPLE_RATES to this event
+        **fields: Key-value fields; secrets and transcripts are redacted on output
+    """
+    if not logger.isEnabledFor(level):
+        return
+    if sampled and level < logging.WARNING:
+        rate = _sample_rates.get(event, LOG_SAMPLE_RATE)
+        if rate < 1.0 and random.random() >= rate:
+            return
+    logger.log(level, event, extra={"kv": fields})
@@ -0,0 +1,242 @@
+import time
+import bisect
+import logging
+from contextlib import contextmanager
+from typing import Dict, Any, List, Tuple, Sequence, Callable, Iterator, Optional
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Latency buckets (seconds) covering in-process stages up to slow n8n workflows
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+class Counter:
+    """
+    Monotonic counter with optional labels. With a callback, values are read
+    at scrape time instead (for counters kept by other components).
+    """
+
+    type = "counter"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        callback: Optional[Callable[[], Dict[Tuple[Any, ...], float]]] = None
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._callback = callback
+
+    def inc(self, *labelvalues: Any, amount: float = 1) -> None:
+        key = tuple(str(value) for value in labelvalues)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def collect(self) -> Iterator[str]:
+        if self._callback is not None:
+            try:
+                self._values = {tuple(str(v) for v in key): value for key, value in self._callback().items()}
+            except Exception as e:
+                logger.error(f"Error collecting metric {self.name}: {str(e)}")
+        for key, value in self._values.items():
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+class Gauge(Counter):
+    """
+    Gauge that can go up and down, or be read from a callback at scrape time.
+    """
+
+    type = "gauge"
+
+    def set(self, *labelvalues: Any, value: float) -> None:
+        self._values[tuple(str(label) for label in labelvalues)] = value
+
+    def dec(self, *labelvalues: Any, amount: float = 1) -> None:
+        self.inc(*labelvalues, amount=-amount)
+
+    @contextmanager
+    def track(self, *labelvalues: Any) -> Iterator[None]:
+        """
+        Count the wrapped block as in progress.
+        """
+        self.inc(*labelvalues)
+        try:
+            yield
+        finally:
+            self.dec(*labelvalues)
+
+class Histogram:
+    """
+    Fixed-bucket latency histogram with optional labels.
+    """
+
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [bucket counts..., +Inf count, sum]
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, *labelvalues: Any) -> None:
+        key = tuple(str(label) for label in labelvalues)
+        series = self._values.get(key)
+        if series is None:
+            series = self._values[key] = [0] * (len(self.buckets) + 2)
+        series[bisect.bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    @contextmanager
+    def time(self, *labelvalues: Any) -> Iterator[None]:
+        """
+        Observe the wall time of the wrapped block.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *labelvalues)
+
+    def collect(self) -> Iterator[str]:
+        for key, series in self._values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series[:-1]):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, f'le="{_format_value(bound)}"')
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = _format_labels(self.labelnames, key)
+            yield f"{self.name}_sum{labels} {_format_value(series[-1])}"
+            yield f"{self.name}_count{labels} {cumulative}"
+
+class Registry:
+    """
+    Collection of metrics rendered in the Prometheus text exposition format.
+    """
+
+    def __init__(self):
+        self._metrics: List[Any] = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = (), callback=None) -> Counter:
+        return self.register(Counter(name, documentation, labelnames, callback))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = (), callback=None) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames, callback))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.collect())
+        return "\n".join(lines) + "\n"
+
+# Process-wide registry exposed on /api/metrics
+registry = Registry()
+
+http_request_duration = registry.histogram(
+    "http_request_duration_seconds",
+    "Time spent handling HTTP requests, by endpoint",
+    ("method", "route", "status")
+)
+http_requests_in_flight = registry.gauge(
+    "http_requests_in_flight",
+    "HTTP requests currently being handled"
+)
+stage_duration = registry.histogram(
+    "voice_turn_stage_duration_seconds",
+    "Time spent in each stage of a voice turn",
+    ("stage",)
+)
+upstream_responses = registry.counter(
+    "upstream_responses_total",
+    "Responses from upstream services, by status (or error class)",
+    ("upstream", "status")
+)
+upstream_in_flight = registry.gauge(
+    "upstream_requests_in_flight",
+    "Requests to upstream services currently in flight",
+    ("upstream",)
+)
+
+# Content type of the Prometheus text format
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording per-endpoint latency and in-flight requests.
+
+    Requests are labelled with the route template (e.g. /api/webhook/{session_id})
+    so the number of series stays bounded; anything that is not an API route
+    is labelled "other".
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._routes: Optional[Dict[Any, str]] = None
+
+    def _route_for(self, scope) -> str:
+        if self._routes is None:
+            application = scope.get("app")
+            self._routes = {
+                route.endpoint: route.path
+                for route in getattr(application, "routes", [])
+                if hasattr(route, "endpoint")
+            }
+        return self._routes.get(scope.get("endpoint"), "other")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        http_requests_in_flight.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            http_requests_in_flight.dec()
+            http_request_duration.observe(
+                time.perf_counter() - start,
+                scope["method"],
+                self._route_for(scope),
+                status[0]
+            )
@@ -0,0 +1,299 @@
+import io
+import os
+import sys
+import time
+import hmac
+import math
+import marshal
+import pstats
+import asyncio
+import cProfile
+import logging
+import threading
+from collections import Counter, deque
+from typing import Dict, Any, List, Optional
+
+from backend.log import log_event
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Bearer token for the /api/admin endpoints (unset disables them)
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+# Longest profile one request may capture (seconds)
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "60"))
+# Default interval between stack samples (seconds)
+PROFILE_SAMPLE_INTERVAL = float(os.getenv("PROFILE_SAMPLE_INTERVAL", "0.005"))
+
+# Watch the event loop for lag and blocking calls
+LOOP_MONITOR = os.getenv("LOOP_MONITOR", "true").lower() in ("1", "true", "yes")
+# Seconds between loop heartbeats
+LOOP_MONITOR_INTERVAL = float(os.getenv("LOOP_MONITOR_INTERVAL", "0.1"))
+# A heartbeat this late (seconds) counts as a blocked loop and its stack is captured
+LOOP_BLOCK_THRESHOLD = float(os.getenv("LOOP_BLOCK_THRESHOLD", "0.1"))
+# Lag samples kept for the summary, and blocked-loop reports kept
+LOOP_LAG_WINDOW = int(os.getenv("LOOP_LAG_WINDOW", "600"))
+LOOP_SLOW_REPORTS = int(os.getenv("LOOP_SLOW_REPORTS", "50"))
+
+PROFILE_MODES = ("sample", "cprofile")
+
+class ProfilerBusy(Exception):
+    """Raised when a profile is requested while another one is running."""
+
+def check_admin_token(authorization: Optional[str]) -> Optional[int]:
+    """
+    Check an Authorization header against ADMIN_TOKEN.
+
+    Returns:
+        None if the caller is allowed, else the HTTP status to refuse with
+        (404 while no token is configured, 401 for a wrong token)
+    """
+    if not ADMIN_TOKEN:
+        return 404
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not hmac.compare_digest(token.strip().encode(), ADMIN_TOKEN.encode()):
+        return 401
+    return None
+
+def _label(code) -> str:
+    filename = code.co_filename.replace("\\", "/")
+    parts = filename.rsplit("/", 2)
+    return f"{code.co_name} ({'/'.join(parts[-2:])}:{code.co_firstlineno})"
+
+def collapse(frame) -> str:
+    """
+    Render a frame's stack root-first as one collapsed-stack line
+    ("outer;inner;leaf"), the input format of flamegraph.pl and speedscope.
+    """
+    labels = []
+    while frame is not None:
+        labels.append(_label(frame.f_code).replace(";", ":"))
+        frame = frame.f_back
+    return ";".join(reversed(labels))
+
+def sample_stacks(thread_id: int, seconds: float, interval: float) -> Counter:
+    """
+    Sample one thread's stack every `interval` seconds for `seconds`.
+
+    Runs in a worker thread; the sampled thread keeps running.
+
+    Returns:
+        Collapsed stack -> number of samples
+    """
+    stacks: Counter = Counter()
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        frame = sys._current_frames().get(thread_id)
+        if frame is not None:
+            stacks[collapse(frame)] += 1
+        del frame
+        time.sleep(interval)
+    return stacks
+
+def render_collapsed(stacks: Counter) -> str:
+    return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+def pstats_bytes(stats: pstats.Stats) -> bytes:
+    """
+    Serialize profile statistics in the format Stats.dump_stats writes
+    (loadable with pstats.Stats(path), snakeviz or gprof2dot).
+    """
+    return marshal.dumps(stats.stats)
+
+def render_pstats(stats: pstats.Stats, limit: int = 50) -> str:
+    """
+    Render the top `limit` functions by cumulative time as text.
+    """
+    output = io.StringIO()
+    stats.stream = output
+    stats.sort_stats("cumulative").print_stats(limit)
+    return output.getvalue()
+
+class Profiler:
+    """
+    Capture profiles of the running event loop on demand, one at a time.
+
+    "sample" samples the loop thread's stack from a worker thread and
+    returns collapsed stacks; time spent waiting for I/O shows up under
+    the selector's select call. "cprofile" runs cProfile on the loop
+    thread, which covers every callback and coroutine step, and returns
+    a pstats file.
+    """
+
+    def __init__(self):
+        self._lock = asyncio.Lock()
+        self.captured = 0
+
+    async def _locked(self):
+        if self._lock.locked():
+            raise ProfilerBusy("A profile is already being captured")
+        await self._lock.acquire()
+
+    async def sample(self, seconds: float, interval: float = PROFILE_SAMPLE_INTERVAL) -> Counter:
+        """
+        Sample the event loop thread for `seconds`.
+
+        Returns:
+            Collapsed stack -> number of samples
+
+        Raises:
+            ProfilerBusy: if another profile is running
+        """
+        await self._locked()
+        try:
+            log_event(logger, logging.INFO, "profile.started", mode="sample", seconds=seconds)
+            stacks = await asyncio.to_thread(sample_stacks, threading.get_ident(), seconds, interval)
+            self.captured += 1
+            return stacks
+        finally:
+            self._lock.release()
+
+    async def cprofile(self, seconds: float) -> pstats.Stats:
+        """
+        Run cProfile on the event loop thread for `seconds`.
+
+        Raises:
+            ProfilerBusy: if another profile is running
+        """
+        await self._locked()
+        try:
+            log_event(logger, logging.INFO, "profile.started", mode="cprofile", seconds=seconds)
+            profile = cProfile.Profile()
+            profile.enable()
+            try:
+                await asyncio.sleep(seconds)
+            finally:
+                profile.disable()
+            self.captured += 1
+            return pstats.Stats(profile)
+        finally:
+            self._lock.release()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"running": self._lock.locked(), "captured": self.captured}
+
+def _percentile(ordered: List[float], fraction: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[max(0, min(len(ordered) - 1, math.ceil(fraction * len(ordered)) - 1))]
+
+class LoopMonitor:
+    """
+    Measure event-loop lag and catch callbacks that block the loop.
+
+    A heartbeat task sleeps `interval` seconds and records how late each
+    wake-up is. A watchdog thread checks the heartbeat; when it is more
+    than `threshold` seconds overdue, the loop thread is stuck in one
+    callback, so the watchdog captures that thread's stack. The report
+    is kept and logged once the loop recovers, so a blocking call such as
+    a synchronous HTTP request or file read shows up with its call site.
+    Its blocked_ms counts from when the heartbeat was due, a lower bound
+    of the callback's run time.
+    """
+
+    def __init__(
+        self,
+        interval: float = LOOP_MONITOR_INTERVAL,
+        threshold: float = LOOP_BLOCK_THRESHOLD,
+        window: int = LOOP_LAG_WINDOW,
+        reports: int = LOOP_SLOW_REPORTS
+    ):
+        self.interval = interval
+        self.threshold = threshold
+        self._lags: deque = deque(maxlen=window)
+        self._reports: deque = deque(maxlen=reports)
+        self._beat = 0.0
+        self._thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+        self.blocked = 0
+        self.blocked_seconds = 0.0
+
+    def start(self) -> None:
+        if self._task is not None:
+            return
+        self._thread_id = threading.get_ident()
+        self._beat = time.monotonic()
+        self._stopping.clear()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+
+    async def stop(self) -> None:
+        self._stopping.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._watchdog is not None:
+            self._watchdog.join(timeout=1)
+            self._watchdog = None
+
+    async def _run(self) -> None:
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            self._lags.append(max(0.0, now - expected))
+            self._beat = now
+
+    def _watch(self) -> None:
+        stall: Optional[Dict[str, Any]] = None
+        check = min(self.interval, self.threshold) / 2
+        while not self._stopping.wait(check):
+            beat = self._beat
+            overdue = time.monotonic() - beat - self.interval
+            if stall is not None and beat != stall["beat"]:
+                # The loop is running again
+                self._finish(stall, beat - stall["beat"] - self.interval)
+                stall = None
+            if stall is None and overdue > self.threshold:
+                frame = sys._current_frames().get(self._thread_id)
+                stack = collapse(frame) if frame is not None else ""
+                del frame
+                stall = {"beat": beat, "at": time.time() - overdue, "stack": stack}
+
+    def _finish(self, stall: Dict[str, Any], duration: float) -> None:
+        self.blocked += 1
+        self.blocked_seconds += duration
+        stack = stall["stack"]
+        self._reports.append({
+            "at": round(stall["at"], 3),
+            "blocked_ms": round(duration * 1000, 1),
+            "stack": stack.split(";") if stack else [],
+        })
+        log_event(
+            logger, logging.WARNING, "loop.blocked",
+            blocked_ms=round(duration * 1000, 1),
+            frame=stack.rsplit(";", 1)[-1] if stack else None
+        )
+
+    def lag_summary(self) -> Dict[str, float]:
+        """
+        Summarize recent heartbeat lag in milliseconds.
+        """
+        ordered = sorted(self._lags)
+        return {
+            "samples": len(ordered),
+            "p50": round(_percentile(ordered, 0.50) * 1000, 3),
+            "p99": round(_percentile(ordered, 0.99) * 1000, 3),
+            "max": round(ordered[-1] * 1000, 3) if ordered else 0.0,
+        }
+
+    def slow_callbacks(self) -> List[Dict[str, Any]]:
+        """
+        Return the recent blocked-loop reports, newest first.
+        """
+        return list(reversed(self._reports))
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self._task is not None,
+            "lag_ms": self.lag_summary(),
+            "blocked": self.blocked,
+            "blocked_seconds": round(self.blocked_seconds, 3),
+        }
@@ -1,15 +1,27 @@
 import os
+import time
+import asyncio
 import logging
-import requests
+import aiohttp
 from typing import Dict, Any, Optional
 
+from backend.http_client import get_http_client
+from backend.metrics import stage_duration, upstream_responses, upstream_in_flight
+from backend.log import log_event
+from backend.tracing import span, inject, CLIENT
+from backend.fastjson import loads, dumps
+
 # Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Constants
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-API_URL = "https://api.openai.com/v1/realtime/sessions"
+API_URL = os.getenv("OPENAI_REALTIME_SESSIONS_URL", "https://api.openai.com/v1/realtime/sessions")
+
+# Timeouts for the session request (seconds)
+OPENAI_CONNECT_TIMEOUT = float(os.getenv("OPENAI_CONNECT_TIMEOUT", "5"))
+OPENAI_READ_TIMEOUT = float(os.getenv("OPENAI_READ_TIMEOUT", "15"))
+OPENAI_TOTAL_TIMEOUT = float(os.getenv("OPENAI_TOTAL_TIMEOUT", "20"))
 
 # Dostępne modele
 MODELS = {
@@ -48,21 +60,34 @@ async def create_realtime_session(model_type="standard") -> Dict[str, Any]:
             "voice": "alloy",  # Użyj głosu alloy
         }
         
-        logger.info(f"Creating Realtime session with payload: {payload}")
-        
-        # Make the API request
-        response = requests.post(API_URL, headers=headers, json=payload)
-        
-        # Check for errors
-        if response.status_code != 200:
-            logger.error(f"OpenAI API error: {response.status_code} - {response.text}")
-            raise Exception(f"Failed to create Realtime session: {response.text}")
-        
-        # Return session data including ephemeral token
-        session_data = response.json()
-        logger.info(f"Created Realtime session with ID: {session_data.get('id')}")
-        logger.info(f"Using model: {model}")
-        logger.info(f"Session data: {session_data}")
+        # Make the API request over the shared connection pool
+        timeout = aiohttp.ClientTimeout(
+            total=OPENAI_TOTAL_TIMEOUT,
+            sock_connect=OPENAI_CONNECT_TIMEOUT,
+            sock_read=OPENAI_READ_TIMEOUT
+        )
+        session = get_http_client()
+        start = time.perf_counter()
+        with upstream_in_flight.track("openai"), span("openai.session", CLIENT, **{"http.url": API_URL, "model": model}) as call:
+            inject(headers)
+            try:
+                async with session.post(API_URL, headers=headers, data=dumps(payload), timeout=timeout) as response:
+                    upstream_responses.inc("openai", response.status)
+                    call.set_attribute("http.status_code", response.status)
+                    # Check for errors
+                    if response.status != 200:
+                        error_text = await response.text()
+                        log_event(logger, logging.ERROR, "openai.session_failed", status=response.status, body=error_text)
+                        raise Exception(f"Failed to create Realtime session: {error_text}")
+                    
+                    # Return session data including ephemeral token
+                    session_data = loads(await response.read())
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                upstream_responses.inc("openai", type(e).__name__)
+                raise
+            finally:
+                stage_duration.observe(time.perf_counter() - start, "session_create")
+        log_event(logger, logging.INFO, "openai.session_created", session_id=session_data.get("id"), model=model)
         
         return session_data
         
@@ -81,19 +106,23 @@ async def format_n8n_response_for_realtime(text: str, session_id: str) -> Dict[s
     Returns:
         A dictionary formatted for the Realtime API
     """
-    logger.info(f"Formatting n8n response for Realtime API: {text}")
+    start = time.perf_counter()
+    log_event(logger, logging.DEBUG, "realtime.format", session_id=session_id, text=text)
     
     # Create a conversation.item.create event for the assistant's message
-    return {
-        "type": "conversation.item.create",
-        "item": {
-            "type": "message",
-            "role": "assistant",
-            "content": [
-                {
-                    "type": "input_text",
-                    "text": text
-                }
-            ]
+    with span("realtime.format", session_id=session_id, length=len(text)):
+        event = {
+            "type": "conversation.item.create",
+            "item": {
+                "type": "message",
+                "role": "assistant",
+                "content": [
+                    {
+                        "type": "input_text",
+                        "text": text
+                    }
+                ]
+            }
         }
-    }
+    stage_duration.observe(time.perf_counter() - start, "format_realtime")
+    return event
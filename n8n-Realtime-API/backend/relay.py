@@ -0,0 +1,279 @@
+import os
+import time
+import base64
+import asyncio
+import logging
+import aiohttp
+from typing import Dict, Any, Optional, Set, Callable, Awaitable
+
+from backend.audio import AudioIngest, TARGET_FORMAT
+from backend.http_client import get_http_client
+from backend.realtime import OPENAI_API_KEY, MODELS, format_n8n_response_for_realtime
+from backend.metrics import stage_duration, upstream_responses
+from backend.fastjson import loads, dumps_str, JSONDecodeError
+from backend.log import log_event
+from backend.tracing import span, inject, CLIENT
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Realtime WebSocket endpoint (point at a fake server for testing)
+OPENAI_REALTIME_URL = os.getenv("OPENAI_REALTIME_URL", "wss://api.openai.com/v1/realtime")
+# Conversation model used by relayed sessions
+REALTIME_RELAY_MODEL = os.getenv("REALTIME_RELAY_MODEL", "gpt-4o-realtime-preview-2024-12-17")
+# Offer relay mode to the frontend by default
+REALTIME_RELAY_MODE = os.getenv("REALTIME_RELAY_MODE", "false").lower() in ("1", "true", "yes")
+# Ask the model to voice each injected n8n reply
+REALTIME_RELAY_CREATE_RESPONSE = os.getenv("REALTIME_RELAY_CREATE_RESPONSE", "true").lower() not in ("0", "false", "no")
+# Seconds to wait for the upstream WebSocket handshake
+REALTIME_RELAY_CONNECT_TIMEOUT = float(os.getenv("REALTIME_RELAY_CONNECT_TIMEOUT", "10"))
+
+# Audio format sent upstream: 24 kHz mono PCM16 little-endian
+RELAY_SAMPLE_RATE = 24000
+
+# Client events the browser may send upstream; everything else is owned by the relay
+CLIENT_EVENTS = frozenset({"session.update", "input_audio_buffer.commit", "input_audio_buffer.clear", "response.cancel"})
+
+TRANSCRIPTION_COMPLETED = "conversation.item.input_audio_transcription.completed"
+
+# Counters for /api/health
+_stats = {
+    "active": 0,
+    "connections": 0,
+    "turns": 0,
+    "audio_frames": 0,
+    "audio_bytes_in": 0,
+    "audio_bytes": 0,
+    "audio_bytes_saved": 0,
+}
+
+# Connected relays by session, for live per-session audio counters
+_active: Dict[str, "RealtimeRelay"] = {}
+
+class RealtimeRelay:
+    """
+    Server-side leg of a relayed Realtime conversation.
+
+    The relay holds the Realtime WebSocket for one session. Browser audio is
+    appended to the input buffer, upstream events are passed on to the
+    browser, and each completed transcription is answered here: the turn is
+    sent to n8n and the reply injected back as a conversation item, so
+    transcripts never travel back through the client.
+
+    Browser frames may use any format from backend.audio.INPUT_FORMATS;
+    they are converted to 24 kHz PCM16, regrouped into fixed-size appends
+    and passed through the silence gate before going upstream.
+    """
+
+    def __init__(
+        self,
+        session_id: str,
+        handle_turn: Callable[[str, str, Optional[str]], Awaitable[Dict[str, Any]]],
+        send_to_client: Callable[[Dict[str, Any]], Awaitable[None]],
+        model_type: str = "standard",
+        audio_format: str = TARGET_FORMAT,
+        url: str = OPENAI_REALTIME_URL,
+        model: str = REALTIME_RELAY_MODEL,
+        api_key: Optional[str] = OPENAI_API_KEY
+    ):
+        self.session_id = session_id
+        self._handle_turn = handle_turn
+        self._send_to_client = send_to_client
+        self.model_type = model_type
+        self._ingest = AudioIngest(audio_format)
+        self.url = url
+        self.model = model
+        self.api_key = api_key
+        self._upstream: Optional[aiohttp.ClientWebSocketResponse] = None
+        self._send_lock = asyncio.Lock()
+        self._turns: Set[asyncio.Task] = set()
+
+    async def connect(self) -> None:
+        """
+        Open the upstream Realtime WebSocket and configure the session.
+
+        Turn detection runs upstream but never answers on its own; replies
+        come from n8n.
+        """
+        if not self.api_key:
+            raise Exception("OPENAI_API_KEY environment variable not set")
+
+        headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "OpenAI-Beta": "realtime=v1"
+        }
+        start = time.perf_counter()
+        with span("openai.realtime.connect", CLIENT, **{"http.url": self.url, "session_id": self.session_id, "model": self.model}):
+            inject(headers)
+            try:
+                self._upstream = await asyncio.wait_for(
+                    get_http_client().ws_connect(
+                        self.url,
+                        params={"model": self.model},
+                        headers=headers,
+                        heartbeat=20
+                    ),
+                    REALTIME_RELAY_CONNECT_TIMEOUT
+                )
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                upstream_responses.inc("openai_realtime", type(e).__name__)
+                raise
+            finally:
+                stage_duration.observe(time.perf_counter() - start, "relay_connect")
+        upstream_responses.inc("openai_realtime", 101)
+        _stats["active"] += 1
+        _stats["connections"] += 1
+        _active[self.session_id] = self
+        log_event(logger, logging.INFO, "relay.connected", session_id=self.session_id, model=self.model)
+
+        await self._send_upstream({
+            "type": "session.update",
+            "session": {
+                "input_audio_format": "pcm16",
+                "output_audio_format": "pcm16",
+                "input_audio_transcription": {"model": MODELS.get(self.model_type, MODELS["standard"])},
+                "turn_detection": {"type": "server_vad", "create_response": False}
+            }
+        })
+
+    async def _send_upstream(self, event: Dict[str, Any]) -> None:
+        """
+        Send an event upstream. Once the connection has closed the event is
+        dropped; pump() returns and the session ends.
+        """
+        async with self._send_lock:
+            if self._upstream is None or self._upstream.closed:
+                return
+            try:
+                await self._upstream.send_str(dumps_str(event))
+            except ConnectionResetError:
+                # The transport closed under us; the close frame is still on its way to pump()
+                log_event(logger, logging.DEBUG, "relay.upstream_send_dropped", session_id=self.session_id, event=event.get("type"))
+
+    async def _append(self, pcm16: memoryview) -> None:
+        _stats["audio_bytes"] += len(pcm16)
+        await self._send_upstream({
+            "type": "input_audio_buffer.append",
+            "audio": base64.b64encode(pcm16).decode("ascii")
+        })
+
+    async def send_audio(self, frame: bytes) -> None:
+        """
+        Convert a browser audio frame and append the completed packets to the
+        upstream input buffer.
+        """
+        if not frame:
+            return
+        _stats["audio_frames"] += 1
+        _stats["audio_bytes_in"] += len(frame)
+        for packet in self._ingest.feed(frame):
+            await self._append(packet)
+
+    async def send_client_event(self, event: Dict[str, Any]) -> bool:
+        """
+        Pass a browser event upstream if the browser may send it.
+
+        Returns:
+            False if the event type is not allowed
+        """
+        if event.get("type") not in CLIENT_EVENTS:
+            return False
+        if event["type"] == "input_audio_buffer.commit":
+            # Audio still waiting for a full packet belongs to this turn
+            for packet in self._ingest.flush():
+                await self._append(packet)
+        elif event["type"] == "input_audio_buffer.clear":
+            self._ingest.clear()
+        elif event["type"] == "session.update":
+            # n8n answers the turns; the model must not respond on its own
+            session = event.get("session")
+            if isinstance(session, dict) and isinstance(session.get("turn_detection"), dict):
+                session["turn_detection"]["create_response"] = False
+        await self._send_upstream(event)
+        return True
+
+    async def pump(self) -> None:
+        """
+        Read upstream events until the connection closes, passing them on to
+        the browser and answering completed transcriptions.
+        """
+        async for message in self._upstream:
+            if message.type != aiohttp.WSMsgType.TEXT:
+                if message.type == aiohttp.WSMsgType.ERROR:
+                    logger.error(f"Realtime relay connection error: {self._upstream.exception()}")
+                    break
+                continue
+            try:
+                event = loads(message.data)
+            except JSONDecodeError:
+                continue
+            if event.get("type") == TRANSCRIPTION_COMPLETED:
+                task = asyncio.create_task(self._answer(event))
+                self._turns.add(task)
+                task.add_done_callback(self._turns.discard)
+            elif event.get("type") == "error":
+                log_event(logger, logging.WARNING, "relay.upstream_error", session_id=self.session_id, error=event.get("error"))
+            await self._send_to_client(event)
+        log_event(logger, logging.INFO, "relay.upstream_closed", session_id=self.session_id, code=self._upstream.close_code)
+
+    async def _answer(self, event: Dict[str, Any]) -> None:
+        transcript = event.get("transcript") or ""
+        item_id = event.get("item_id")
+        if not transcript.strip():
+            return
+        # Each turn is its own trace, tied to the session by attribute
+        with span("relay.turn", session_id=self.session_id, item_id=item_id) as turn:
+            _stats["turns"] += 1
+            try:
+                reply = await self._handle_turn(self.session_id, transcript, item_id)
+            except Exception as e:
+                status = getattr(e, "status_code", 500)
+                detail = getattr(e, "detail", str(e))
+                log_event(logger, logging.WARNING, "relay.turn_failed", session_id=self.session_id, status=status, reason=detail)
+                turn.set_error(f"{status} {detail}")
+                await self._send_to_client({"type": "error", "item_id": item_id, "status": status, "detail": detail})
+                return
+
+            await self._send_to_client({"type": "n8n.response", "item_id": item_id, "data": reply})
+            text = reply.get("text") if isinstance(reply, dict) else None
+            if not isinstance(text, str) or not text:
+                return
+            await self._send_upstream(await format_n8n_response_for_realtime(text, self.session_id))
+            if REALTIME_RELAY_CREATE_RESPONSE:
+                await self._send_upstream({"type": "response.create"})
+
+    def get_audio_stats(self) -> Dict[str, Any]:
+        """
+        Return this session's audio counters (bytes received, sent and saved by the silence gate).
+        """
+        return self._ingest.get_stats()
+
+    async def close(self) -> None:
+        """
+        Cancel pending turns and close the upstream connection.
+        """
+        for task in list(self._turns):
+            task.cancel()
+        if self._upstream is not None and not self._upstream.closed:
+            await self._upstream.close()
+        if self._upstream is not None:
+            _stats["active"] -= 1
+            _stats["audio_bytes_saved"] += self._ingest.get_stats().get("bytes_saved", 0)
+            if _active.get(self.session_id) is self:
+                del _active[self.session_id]
+            self._upstream = None
+        log_event(logger, logging.INFO, "relay.closed", session_id=self.session_id)
+
+def get_relay_stats() -> Dict[str, Any]:
+    """
+    Return relay connection and traffic counters.
+    """
+    saved = _stats["audio_bytes_saved"] + sum(relay.get_audio_stats().get("bytes_saved", 0) for relay in _active.values())
+    return dict(_stats, audio_bytes_saved=saved, enabled_by_default=REALTIME_RELAY_MODE)
+
+def get_session_audio_stats(session_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Return the audio counters of a connected relay session, or None.
+    """
+    relay = _active.get(session_id)
+    return relay.get_audio_stats() if relay is not None else None
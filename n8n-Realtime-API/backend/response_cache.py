@@ -0,0 +1,178 @@
+import os
+import re
+import json
+import time
+import logging
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Mapping, Callable
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Default TTL (seconds) for cached n8n responses; 0 keeps the cache off
+N8N_RESPONSE_CACHE_TTL = float(os.getenv("N8N_RESPONSE_CACHE_TTL", "0"))
+# Per-webhook TTL overrides as JSON, e.g. {"https://n8n.example.com/webhook/status": 30}
+N8N_RESPONSE_CACHE_TTLS = os.getenv("N8N_RESPONSE_CACHE_TTLS", "")
+# Maximum number of cached responses across all webhooks
+N8N_RESPONSE_CACHE_MAX_SIZE = int(os.getenv("N8N_RESPONSE_CACHE_MAX_SIZE", "1000"))
+
+# Header n8n can set to keep a response out of the cache
+CACHE_CONTROL_HEADER = "X-N8N-Cache"
+# Response fields n8n can set to false to keep a response out of the cache
+CACHE_FIELDS = ("cache", "cacheable")
+
+_WHITESPACE = re.compile(r"\s+")
+_EDGE_PUNCTUATION = " \t\n.,!?;:…\"'„”«»"
+
+def normalize_transcription(transcription: str) -> str:
+    """
+    Normalize a transcription so trivially different utterances share a key:
+    case-folded, whitespace collapsed, leading/trailing punctuation removed.
+    """
+    return _WHITESPACE.sub(" ", transcription.casefold()).strip(_EDGE_PUNCTUATION)
+
+def _load_ttls(raw: str) -> Dict[str, float]:
+    if not raw:
+        return {}
+    try:
+        return {url: float(ttl) for url, ttl in json.loads(raw).items()}
+    except (ValueError, AttributeError, TypeError) as e:
+        logger.error(f"Invalid N8N_RESPONSE_CACHE_TTLS, ignoring: {str(e)}")
+        return {}
+
+class ResponseCache:
+    """
+    Opt-in LRU cache of n8n replies keyed by webhook URL and normalized transcription.
+
+    A webhook is cached only when its TTL (per-webhook override or the
+    default) is positive. n8n can keep an individual reply out of the cache
+    with a `Cache-Control: no-store`/`X-N8N-Cache: no-store` header or a
+    `"cache": false` field in the JSON body.
+    """
+
+    def __init__(
+        self,
+        default_ttl: float = N8N_RESPONSE_CACHE_TTL,
+        ttls: Optional[Mapping[str, float]] = None,
+        max_size: int = N8N_RESPONSE_CACHE_MAX_SIZE,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.default_ttl = default_ttl
+        self.ttls = dict(ttls) if ttls is not None else _load_ttls(N8N_RESPONSE_CACHE_TTLS)
+        self.max_size = max_size
+        self._clock = clock
+        # (webhook_url, normalized transcription) -> (expires_at, response)
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.opt_outs = 0
+        self.evictions = 0
+
+    def ttl_for(self, webhook_url: str) -> float:
+        return self.ttls.get(webhook_url, self.default_ttl)
+
+    def enabled_for(self, webhook_url: str) -> bool:
+        return self.max_size > 0 and self.ttl_for(webhook_url) > 0
+
+    def get(self, webhook_url: str, transcription: str) -> Optional[Dict[str, Any]]:
+        """
+        Return a cached reply, or None on a miss.
+        """
+        if not self.enabled_for(webhook_url):
+            return None
+        key = (webhook_url, normalize_transcription(transcription))
+        entry = self._entries.get(key)
+        if entry is None or entry[0] <= self._clock():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return dict(entry[1])
+
+    def is_cacheable(
+        self,
+        response: Dict[str, Any],
+        headers: Optional[Mapping[str, str]] = None,
+        body: Any = None
+    ) -> bool:
+        """
+        Check whether n8n opted this reply out of caching.
+
+        Args:
+            response: The extracted reply
+            headers: The n8n response headers
+            body: The decoded n8n response body; the opt-out field may be
+                there rather than in the extracted reply. A list is checked
+                item by item.
+        """
+        if headers is not None:
+            directives = f"{headers.get('Cache-Control', '')},{headers.get(CACHE_CONTROL_HEADER, '')}".lower()
+            if "no-store" in directives or "no-cache" in directives or "private" in directives:
+                return False
+        sources = [response]
+        if isinstance(body, dict):
+            sources.append(body)
+        elif isinstance(body, list):
+            sources.extend(item for item in body if isinstance(item, dict))
+        return not any(source.get(field) is False for source in sources for field in CACHE_FIELDS)
+
+    def set(
+        self,
+        webhook_url: str,
+        transcription: str,
+        response: Dict[str, Any],
+        headers: Optional[Mapping[str, str]] = None,
+        body: Any = None
+    ) -> bool:
+        """
+        Cache a successful reply unless caching is off for the webhook or n8n opted out.
+
+        Args:
+            webhook_url: The n8n webhook URL
+            transcription: The transcription the reply answers
+            response: The extracted reply
+            headers: The n8n response headers
+            body: The decoded n8n response body, checked for the opt-out field
+
+        Returns:
+            True if the reply was stored
+        """
+        if not self.enabled_for(webhook_url):
+            return False
+        if not self.is_cacheable(response, headers, body):
+            self.opt_outs += 1
+            return False
+        key = (webhook_url, normalize_transcription(transcription))
+        self._entries[key] = (self._clock() + self.ttl_for(webhook_url), dict(response))
+        self._entries.move_to_end(key)
+        self.stores += 1
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+        return True
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Return hit/miss counters and cache size.
+        """
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.default_ttl > 0 or any(ttl > 0 for ttl in self.ttls.values()),
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "stores": self.stores,
+            "opt_outs": self.opt_outs,
+            "evictions": self.evictions,
+        }
+
+# Process-wide cache used by send_to_n8n
+response_cache = ResponseCache()
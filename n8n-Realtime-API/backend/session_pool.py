@@ -0,0 +1,202 @@
+import os
+import time
+import asyncio
+import logging
+from collections import deque
+from typing import Dict, Any, Optional, Tuple, Callable, Awaitable, Iterable
+
+from backend.realtime import create_realtime_session, MODELS
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Number of ready sessions kept per model type (0 disables the pool)
+REALTIME_SESSION_POOL_SIZE = int(os.getenv("REALTIME_SESSION_POOL_SIZE", "1"))
+# Minimum remaining client_secret lifetime (seconds) for a pooled session to be handed out
+REALTIME_SESSION_POOL_MIN_TTL = float(os.getenv("REALTIME_SESSION_POOL_MIN_TTL", "15"))
+# How far ahead of that point (seconds) a replacement session is minted
+REALTIME_SESSION_POOL_REFILL_LEAD = float(os.getenv("REALTIME_SESSION_POOL_REFILL_LEAD", "5"))
+# Delay before retrying after a failed refill (seconds)
+REALTIME_SESSION_POOL_RETRY_DELAY = float(os.getenv("REALTIME_SESSION_POOL_RETRY_DELAY", "5"))
+
+# Lifetime assumed when OpenAI does not return client_secret.expires_at
+DEFAULT_SESSION_LIFETIME = 60.0
+
+class RealtimeSessionPool:
+    """
+    Background pool of pre-minted ephemeral Realtime sessions.
+
+    Keeps `size` ready sessions per model type so /api/realtime/session can
+    hand one out without waiting for OpenAI. Entries are replaced ahead of
+    their client_secret expiry and stale ones are discarded.
+    """
+
+    def __init__(
+        self,
+        size: int = REALTIME_SESSION_POOL_SIZE,
+        model_types: Iterable[str] = MODELS.keys(),
+        min_ttl: float = REALTIME_SESSION_POOL_MIN_TTL,
+        refill_lead: float = REALTIME_SESSION_POOL_REFILL_LEAD,
+        retry_delay: float = REALTIME_SESSION_POOL_RETRY_DELAY,
+        create_session: Callable[..., Awaitable[Dict[str, Any]]] = create_realtime_session
+    ):
+        self.size = size
+        self.model_types = list(model_types)
+        self.min_ttl = min_ttl
+        self.refill_lead = refill_lead
+        self.retry_delay = retry_delay
+        self._create_session = create_session
+        # model type -> deque of (usable_until, session_data), oldest first
+        self._entries: Dict[str, deque] = {model_type: deque() for model_type in self.model_types}
+        self._wakeups: Dict[str, asyncio.Event] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self.hits = 0
+        self.misses = 0
+        self.minted = 0
+        self.discarded = 0
+        self.errors = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.size > 0
+
+    async def start(self) -> None:
+        """
+        Start one refill task per model type.
+        """
+        if not self.enabled:
+            logger.info("Realtime session pool disabled")
+            return
+        for model_type in self.model_types:
+            if model_type in self._tasks:
+                continue
+            self._wakeups[model_type] = asyncio.Event()
+            self._tasks[model_type] = asyncio.create_task(self._refill_loop(model_type))
+        logger.info(f"Realtime session pool started (size={self.size}, models={self.model_types})")
+
+    async def stop(self) -> None:
+        """
+        Cancel refill tasks and drop pooled sessions.
+        """
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks.clear()
+        self._wakeups.clear()
+        for entries in self._entries.values():
+            entries.clear()
+
+    def _normalize(self, model_type: Optional[str]) -> str:
+        return model_type if model_type in self._entries else "standard"
+
+    def _usable_until(self, session_data: Dict[str, Any]) -> float:
+        """
+        Convert client_secret.expires_at (epoch seconds) into a monotonic
+        deadline after which the session is too close to expiry to hand out.
+        """
+        lifetime = DEFAULT_SESSION_LIFETIME
+        expires_at = (session_data.get("client_secret") or {}).get("expires_at")
+        if isinstance(expires_at, (int, float)):
+            lifetime = expires_at - time.time()
+        return time.monotonic() + lifetime - self.min_ttl
+
+    def _prune(self, model_type: str) -> None:
+        entries = self._entries[model_type]
+        now = time.monotonic()
+        while entries and entries[0][0] <= now:
+            entries.popleft()
+            self.discarded += 1
+
+    def take(self, model_type: Optional[str] = "standard") -> Optional[Dict[str, Any]]:
+        """
+        Take a ready session from the pool without waiting.
+
+        Args:
+            model_type: Model type ("standard" or "mini")
+
+        Returns:
+            Session data, or None if no fresh session is pooled
+        """
+        model_type = self._normalize(model_type)
+        self._prune(model_type)
+        entries = self._entries[model_type]
+        session_data = entries.popleft()[1] if entries else None
+        wakeup = self._wakeups.get(model_type)
+        if wakeup is not None:
+            wakeup.set()
+        return session_data
+
+    async def acquire(self, model_type: Optional[str] = "standard") -> Tuple[Dict[str, Any], bool]:
+        """
+        Return a pooled session, or create one directly on a pool miss.
+
+        Args:
+            model_type: Model type ("standard" or "mini")
+
+        Returns:
+            A tuple of (session data, True if served from the pool)
+        """
+        session_data = self.take(model_type) if self.enabled else None
+        if session_data is not None:
+            self.hits += 1
+            return session_data, True
+        self.misses += 1
+        return await self._create_session(model_type=model_type), False
+
+    async def _refill_loop(self, model_type: str) -> None:
+        entries = self._entries[model_type]
+        wakeup = self._wakeups[model_type]
+        while True:
+            self._prune(model_type)
+            # Entries that enter the refill lead window no longer count towards
+            # the target, so their replacement is minted before they go stale
+            horizon = time.monotonic() + self.refill_lead
+            ready = sum(1 for usable_until, _ in entries if usable_until > horizon)
+            if ready < self.size:
+                try:
+                    session_data = await self._create_session(model_type=model_type)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    self.errors += 1
+                    logger.warning(f"Session pool refill failed for '{model_type}': {str(e)}")
+                    await asyncio.sleep(self.retry_delay)
+                    continue
+                usable_until = self._usable_until(session_data)
+                entries.append((usable_until, session_data))
+                self.minted += 1
+                if usable_until <= horizon:
+                    # Sessions live shorter than min_ttl + refill_lead; avoid a tight mint loop
+                    logger.warning(f"Pooled '{model_type}' session expires too soon to keep ahead of expiry")
+                    await asyncio.sleep(self.retry_delay)
+                continue
+
+            # Sleep until a ready entry enters its refill lead window, an entry
+            # already replaced goes stale, or a session is taken. Replaced entries
+            # are past their lead point, so waiting for it would spin.
+            wakeup.clear()
+            deadlines = [
+                usable_until - self.refill_lead if usable_until > horizon else usable_until
+                for usable_until, _ in entries
+            ]
+            timeout = max(min(deadlines) - time.monotonic(), 0) if deadlines else None
+            try:
+                await asyncio.wait_for(wakeup.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Return pool hit/miss counters and ready sessions per model type.
+        """
+        return {
+            "enabled": self.enabled,
+            "size": self.size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "minted": self.minted,
+            "discarded": self.discarded,
+            "errors": self.errors,
+            "ready": {model_type: len(entries) for model_type, entries in self._entries.items()},
+        }
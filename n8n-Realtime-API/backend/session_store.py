@@ -0,0 +1,371 @@
+import os
+import json
+import time
+import asyncio
+import sqlite3
+import logging
+import tempfile
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Optional, Callable, Protocol
+
+from backend.log import log_event
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Idle time (seconds) after which a session is dropped
+SESSION_TTL = float(os.getenv("SESSION_TTL", "3600"))
+# Maximum number of sessions kept; the least recently used is evicted first
+SESSION_MAX_SIZE = int(os.getenv("SESSION_MAX_SIZE", "10000"))
+# Session backend: "memory" (per process) or "sqlite" (shared by workers on one host)
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "memory")
+# SQLite database shared by all workers when SESSION_BACKEND=sqlite
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", os.path.join(tempfile.gettempdir(), "n8n-voice-sessions.db"))
+# Lifetime (seconds) of the in-process read-through cache in front of the shared store
+SESSION_CACHE_TTL = float(os.getenv("SESSION_CACHE_TTL", "5"))
+
+class SessionBackend(Protocol):
+    """
+    Interface shared by session stores.
+
+    Lookups and writes are coroutines so stores backed by a database can do
+    their I/O off the event loop; size and stats never block.
+    """
+
+    async def get(self, session_id: str, touch: bool = True) -> Optional[Dict[str, Any]]: ...
+
+    async def set(self, session_id: str, data: Dict[str, Any]) -> None: ...
+
+    async def delete(self, session_id: str) -> bool: ...
+
+    def __len__(self) -> int: ...
+
+    def get_stats(self) -> Dict[str, Any]: ...
+
+class SessionStore:
+    """
+    In-memory session-to-webhook store with a sliding TTL and LRU eviction.
+
+    Entries are kept in least-recently-used order, so both expired and
+    over-capacity sessions are removed from the front of the OrderedDict.
+    Lookups, inserts and evictions are O(1) (amortised for expiry sweeps).
+    The *_nowait methods are the synchronous versions of get, set and delete.
+    """
+
+    def __init__(
+        self,
+        ttl: float = SESSION_TTL,
+        max_size: int = SESSION_MAX_SIZE,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._clock = clock
+        # session_id -> (expires_at, session data), least recently used first
+        self._sessions: "OrderedDict[str, tuple]" = OrderedDict()
+        self.evictions = 0
+        self.expirations = 0
+        self.ended = 0
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def __contains__(self, session_id: str) -> bool:
+        return self.get_nowait(session_id, touch=False) is not None
+
+    def __repr__(self) -> str:
+        return f"SessionStore(size={len(self._sessions)}, max_size={self.max_size}, ttl={self.ttl})"
+
+    def _sweep(self, now: float) -> None:
+        """
+        Drop expired sessions from the least recently used end.
+        """
+        sessions = self._sessions
+        while sessions:
+            session_id, (expires_at, _) = next(iter(sessions.items()))
+            if expires_at > now:
+                break
+            sessions.popitem(last=False)
+            self.expirations += 1
+
+    def get_nowait(self, session_id: str, touch: bool = True) -> Optional[Dict[str, Any]]:
+        """
+        Look up a session.
+
+        Args:
+            session_id: The Realtime session ID
+            touch: Refresh the session's TTL and LRU position
+
+        Returns:
+            The session data, or None if unknown or expired
+        """
+        entry = self._sessions.get(session_id)
+        if entry is None:
+            return None
+        now = self._clock()
+        expires_at, data = entry
+        if expires_at <= now:
+            del self._sessions[session_id]
+            self.expirations += 1
+            return None
+        if touch:
+            self._sessions[session_id] = (now + self.ttl, data)
+            self._sessions.move_to_end(session_id)
+        return data
+
+    def set_nowait(self, session_id: str, data: Dict[str, Any]) -> None:
+        """
+        Store a session, evicting expired and least recently used ones as needed.
+        """
+        now = self._clock()
+        self._sweep(now)
+        self._sessions[session_id] = (now + self.ttl, data)
+        self._sessions.move_to_end(session_id)
+        while len(self._sessions) > self.max_size:
+            evicted_id, _ = self._sessions.popitem(last=False)
+            self.evictions += 1
+            log_event(logger, logging.INFO, "session.evicted", sampled=True, session_id=evicted_id)
+
+    def delete_nowait(self, session_id: str) -> bool:
+        """
+        Remove a session explicitly.
+
+        Returns:
+            True if the session existed
+        """
+        if self._sessions.pop(session_id, None) is None:
+            return False
+        self.ended += 1
+        return True
+
+    async def get(self, session_id: str, touch: bool = True) -> Optional[Dict[str, Any]]:
+        return self.get_nowait(session_id, touch)
+
+    async def set(self, session_id: str, data: Dict[str, Any]) -> None:
+        self.set_nowait(session_id, data)
+
+    async def delete(self, session_id: str) -> bool:
+        return self.delete_nowait(session_id)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Return size and eviction counters.
+        """
+        self._sweep(self._clock())
+        return {
+            "backend": "memory",
+            "size": len(self._sessions),
+            "max_size": self.max_size,
+            "ttl": self.ttl,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "ended": self.ended,
+        }
+
+class SQLiteSessionStore:
+    """
+    Session store shared by all workers on a host through SQLite in WAL mode.
+
+    A short-lived in-process SessionStore sits in front of the database, so
+    repeated lookups of a live session do not touch SQLite. Sessions ended on
+    another worker stay visible here for at most `cache_ttl` seconds.
+    Expiry is tracked in wall-clock time so every process agrees on it; TTL
+    refreshes are written back at most once per `touch_interval`.
+
+    Database calls run on a dedicated single-thread executor, which also
+    serializes use of the connection, so a locked database never stalls the
+    event loop. The session count is a counter kept by this worker's writes
+    and recounted from the table on every sweep.
+    """
+
+    def __init__(
+        self,
+        path: str = SESSION_DB_PATH,
+        ttl: float = SESSION_TTL,
+        max_size: int = SESSION_MAX_SIZE,
+        cache_ttl: float = SESSION_CACHE_TTL,
+        cache_size: int = 1024,
+        touch_interval: Optional[float] = None,
+        sweep_interval: float = 30.0
+    ):
+        self.path = path
+        self.ttl = ttl
+        self.max_size = max_size
+        self.touch_interval = touch_interval if touch_interval is not None else min(ttl / 10, 60.0)
+        self.sweep_interval = sweep_interval
+        # session_id -> {"data": ..., "written_at": epoch seconds}
+        self._cache = SessionStore(ttl=cache_ttl, max_size=cache_size)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="session-db")
+        self._last_sweep = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.ended = 0
+
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=5.0)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "session_id TEXT PRIMARY KEY, data TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS sessions_expires_at ON sessions (expires_at)")
+        self._size = self._db.execute(
+            "SELECT COUNT(*) FROM sessions WHERE expires_at > ?", (time.time(),)
+        ).fetchone()[0]
+        logger.info(f"Using SQLite session store at {path}")
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __repr__(self) -> str:
+        return f"SQLiteSessionStore(path={self.path!r}, max_size={self.max_size}, ttl={self.ttl})"
+
+    async def _run(self, func: Callable[..., Any], *args: Any) -> Any:
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    # The methods below run on the executor thread
+
+    def _touch(self, session_id: str, now: float) -> None:
+        self._db.execute(
+            "UPDATE sessions SET expires_at = ? WHERE session_id = ?",
+            (now + self.ttl, session_id)
+        )
+
+    def _load(self, session_id: str, now: float, touch: bool) -> Optional[str]:
+        row = self._db.execute(
+            "SELECT data FROM sessions WHERE session_id = ? AND expires_at > ?",
+            (session_id, now)
+        ).fetchone()
+        if row is not None and touch:
+            self._touch(session_id, now)
+        return row[0] if row is not None else None
+
+    def _store(self, session_id: str, data: str, expires_at: float) -> bool:
+        """
+        Insert or replace a row.
+
+        Returns:
+            True if the session was not stored before
+        """
+        existed = self._db.execute(
+            "SELECT 1 FROM sessions WHERE session_id = ?", (session_id,)
+        ).fetchone() is not None
+        self._db.execute(
+            "INSERT OR REPLACE INTO sessions (session_id, data, expires_at) VALUES (?, ?, ?)",
+            (session_id, data, expires_at)
+        )
+        return not existed
+
+    def _remove(self, session_id: str) -> int:
+        return self._db.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,)).rowcount
+
+    def _sweep(self, now: float) -> None:
+        """
+        Drop expired rows, trim the table to max_size, oldest expiry first,
+        and recount the sessions of all workers.
+        """
+        expired = self._db.execute("DELETE FROM sessions WHERE expires_at <= ?", (now,)).rowcount
+        size = self._db.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+        excess = size - self.max_size
+        if excess > 0:
+            self._db.execute(
+                "DELETE FROM sessions WHERE session_id IN "
+                "(SELECT session_id FROM sessions ORDER BY expires_at LIMIT ?)",
+                (excess,)
+            )
+            size = self.max_size
+        self._size = size
+        self.expirations += max(expired, 0)
+        self.evictions += max(excess, 0)
+
+    async def get(self, session_id: str, touch: bool = True) -> Optional[Dict[str, Any]]:
+        """
+        Look up a session, reading through the in-process cache.
+
+        Args:
+            session_id: The Realtime session ID
+            touch: Refresh the session's TTL
+
+        Returns:
+            The session data, or None if unknown or expired
+        """
+        now = time.time()
+        cached = self._cache.get_nowait(session_id, touch=False)
+        if cached is not None:
+            self.cache_hits += 1
+            if touch and now - cached["written_at"] >= self.touch_interval:
+                cached["written_at"] = now
+                await self._run(self._touch, session_id, now)
+            return cached["data"]
+
+        self.cache_misses += 1
+        row = await self._run(self._load, session_id, now, touch)
+        if row is None:
+            return None
+        data = json.loads(row)
+        self._cache.set_nowait(session_id, {"data": data, "written_at": now})
+        return data
+
+    async def set(self, session_id: str, data: Dict[str, Any]) -> None:
+        """
+        Store a session for all workers.
+
+        Expired and excess rows are swept at most once per sweep_interval.
+        """
+        now = time.time()
+        if await self._run(self._store, session_id, json.dumps(data), now + self.ttl):
+            self._size += 1
+        self._cache.set_nowait(session_id, {"data": data, "written_at": now})
+        if now - self._last_sweep >= self.sweep_interval:
+            self._last_sweep = now
+            await self._run(self._sweep, now)
+
+    async def delete(self, session_id: str) -> bool:
+        """
+        Remove a session for all workers.
+
+        Returns:
+            True if the session existed
+        """
+        self._cache.delete_nowait(session_id)
+        deleted = await self._run(self._remove, session_id)
+        if deleted:
+            self.ended += 1
+            self._size = max(self._size - 1, 0)
+        return bool(deleted)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Return size, eviction and cache counters without querying the database.
+        """
+        return {
+            "backend": "sqlite",
+            "size": self._size,
+            "max_size": self.max_size,
+            "ttl": self.ttl,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "ended": self.ended,
+            "cache_size": len(self._cache),
+            "cache_hits": self.cache_hits,
+            "cache_misses": self.cache_misses,
+        }
+
+def create_session_store(backend: str = SESSION_BACKEND) -> SessionBackend:
+    """
+    Create the session store selected by SESSION_BACKEND.
+
+    Args:
+        backend: "memory" for a per-process store, "sqlite" for one shared by workers
+
+    Returns:
+        A session store
+    """
+    if backend == "sqlite":
+        return SQLiteSessionStore()
+    if backend != "memory":
+        logger.warning(f"Unknown SESSION_BACKEND '{backend}', using in-memory sessions")
+    return SessionStore()
@@ -0,0 +1,216 @@
+import os
+import re
+import gzip
+import hashlib
+import logging
+import mimetypes
+import posixpath
+from typing import Dict, Any, List, Optional, Tuple
+
+from starlette.staticfiles import StaticFiles
+
+from backend.log import log_event
+
+# brotli is optional; without it assets are served gzip-compressed only
+try:
+    import brotli
+except ImportError:  # pragma: no cover - depends on the environment
+    brotli = None
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Serve the frontend precompressed from memory (false falls back to plain StaticFiles)
+STATIC_PRECOMPRESS = os.getenv("STATIC_PRECOMPRESS", "true").lower() not in ("0", "false", "no")
+# Smallest asset worth compressing (bytes)
+STATIC_MIN_COMPRESS_BYTES = int(os.getenv("STATIC_MIN_COMPRESS_BYTES", "256"))
+
+# Cache policies: revalidate entry points, keep fingerprinted URLs forever
+REVALIDATE = "no-cache"
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+COMPRESSIBLE_TYPES = ("text/", "application/javascript", "application/json", "image/svg+xml", "application/xml")
+
+# src/href attributes pointing at local assets, rewritten to fingerprinted URLs
+_ASSET_REFERENCE = re.compile(r'((?:src|href)=["\'])([^"\':?#]+)(["\'])')
+
+class _Asset:
+    def __init__(self, path: str, body: bytes, media_type: str):
+        self.path = path
+        self.media_type = media_type
+        self.digest = hashlib.sha256(body).hexdigest()[:16]
+        # encoding -> (body, etag)
+        self.representations: Dict[str, Tuple[bytes, str]] = {"identity": (body, f'"{self.digest}"')}
+        if len(body) >= STATIC_MIN_COMPRESS_BYTES and media_type.startswith(COMPRESSIBLE_TYPES):
+            compressed = gzip.compress(body, compresslevel=9, mtime=0)
+            if len(compressed) < len(body):
+                self.representations["gzip"] = (compressed, f'"{self.digest}-gz"')
+            if brotli is not None:
+                compressed = brotli.compress(body, quality=11)
+                if len(compressed) < len(body):
+                    self.representations["br"] = (compressed, f'"{self.digest}-br"')
+
+    @property
+    def fingerprinted_path(self) -> str:
+        root, ext = posixpath.splitext(self.path)
+        return f"{root}.{self.digest[:10]}{ext}"
+
+def _accepted_encodings(header: str) -> Dict[str, float]:
+    accepted = {}
+    for part in header.split(","):
+        coding, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if coding:
+            accepted[coding.strip().lower()] = quality
+    return accepted
+
+def _etag_matches(header: str, etag: str) -> bool:
+    # If-None-Match uses the weak comparison
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+class PrecompressedStaticFiles:
+    """
+    ASGI app serving a directory from memory.
+
+    Files are read and compressed (gzip, and brotli when installed) once at
+    startup. Responses carry a strong ETag per encoding and conditional
+    requests are answered with 304. Every asset is also served under a
+    fingerprinted URL (app.js -> app.<hash>.js) with immutable caching; HTML
+    pages reference those URLs, while the pages themselves and the plain
+    URLs are revalidated on each load.
+    """
+
+    def __init__(self, directory: str, html: bool = True):
+        self.directory = directory
+        self.html = html
+        self._assets: Dict[str, Tuple[_Asset, str]] = {}
+        self._load()
+
+    def _load(self) -> None:
+        assets: List[_Asset] = []
+        for root, _, files in os.walk(self.directory):
+            for name in sorted(files):
+                full_path = os.path.join(root, name)
+                path = "/" + os.path.relpath(full_path, self.directory).replace(os.sep, "/")
+                media_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+                with open(full_path, "rb") as f:
+                    assets.append(_Asset(path, f.read(), media_type))
+
+        # Point pages at fingerprinted URLs before hashing them
+        fingerprints = {asset.path: asset.fingerprinted_path for asset in assets if not asset.media_type == "text/html"}
+        for index, asset in enumerate(assets):
+            if asset.media_type == "text/html":
+                assets[index] = _Asset(asset.path, self._rewrite(asset, fingerprints), asset.media_type)
+
+        for asset in assets:
+            self._assets[asset.path] = (asset, REVALIDATE)
+            if asset.media_type != "text/html":
+                self._assets[asset.fingerprinted_path] = (asset, IMMUTABLE)
+
+        log_event(
+            logger, logging.INFO, "static.loaded",
+            directory=self.directory,
+            assets=len(assets),
+            bytes=sum(len(a.representations["identity"][0]) for a in assets),
+            brotli=brotli is not None
+        )
+
+    @staticmethod
+    def _rewrite(asset: _Asset, fingerprints: Dict[str, str]) -> bytes:
+        base = posixpath.dirname(asset.path)
+        text = asset.representations["identity"][0].decode("utf-8")
+
+        def replace(match: "re.Match[str]") -> str:
+            reference = match.group(2)
+            target = posixpath.normpath(posixpath.join(base, reference)) if not reference.startswith("/") else reference
+            fingerprinted = fingerprints.get(target)
+            if fingerprinted is None:
+                return match.group(0)
+            if not reference.startswith("/"):
+                fingerprinted = posixpath.relpath(fingerprinted, base)
+            return match.group(1) + fingerprinted + match.group(3)
+
+        return _ASSET_REFERENCE.sub(replace, text).encode("utf-8")
+
+    def url_for(self, path: str) -> str:
+        """
+        Return the fingerprinted URL of an asset (or the path itself if unknown).
+        """
+        entry = self._assets.get(path)
+        return entry[0].fingerprinted_path if entry is not None and entry[1] == REVALIDATE else path
+
+    def _lookup(self, path: str) -> Optional[Tuple[_Asset, str]]:
+        entry = self._assets.get(path)
+        if entry is None and self.html:
+            entry = self._assets.get(path.rstrip("/") + "/index.html")
+        return entry
+
+    async def __call__(self, scope, receive, send) -> None:
+        assert scope["type"] == "http"
+        if scope["method"] not in ("GET", "HEAD"):
+            await self._send(send, 405, [(b"allow", b"GET, HEAD")], b"Method Not Allowed", scope)
+            return
+
+        entry = self._lookup(scope["path"])
+        if entry is None:
+            await self._send(send, 404, [], b"Not Found", scope)
+            return
+        asset, cache_control = entry
+
+        request_headers = {key.decode("latin-1").lower(): value.decode("latin-1") for key, value in scope["headers"]}
+        encoding = "identity"
+        if len(asset.representations) > 1:
+            accepted = _accepted_encodings(request_headers.get("accept-encoding", ""))
+            for candidate in ("br", "gzip"):
+                if candidate in asset.representations and accepted.get(candidate, 0) > 0:
+                    encoding = candidate
+                    break
+        body, etag = asset.representations[encoding]
+
+        headers = [
+            (b"etag", etag.encode()),
+            (b"cache-control", cache_control.encode()),
+        ]
+        if len(asset.representations) > 1:
+            headers.append((b"vary", b"Accept-Encoding"))
+
+        if _etag_matches(request_headers.get("if-none-match", ""), etag):
+            await self._send(send, 304, headers, b"", scope)
+            return
+
+        media_type = asset.media_type
+        if media_type.startswith("text/") or media_type == "application/javascript":
+            media_type += "; charset=utf-8"
+        headers.append((b"content-type", media_type.encode()))
+        if encoding != "identity":
+            headers.append((b"content-encoding", encoding.encode()))
+        await self._send(send, 200, headers, body, scope)
+
+    @staticmethod
+    async def _send(send, status: int, headers: List[Tuple[bytes, bytes]], body: bytes, scope) -> None:
+        if status != 304:
+            headers = headers + [(b"content-length", str(len(body)).encode())]
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+        await send({"type": "http.response.body", "body": b"" if scope["method"] == "HEAD" or status == 304 else body})
+
+def create_static_app(directory: str) -> Any:
+    """
+    Build the ASGI app serving the frontend directory.
+
+    Returns:
+        PrecompressedStaticFiles, or plain StaticFiles when STATIC_PRECOMPRESS is off
+        (e.g. while editing the frontend, since precompressed assets are only read at startup)
+    """
+    if STATIC_PRECOMPRESS:
+        return PrecompressedStaticFiles(directory, html=True)
+    return StaticFiles(directory=directory, html=True)
@@ -0,0 +1,410 @@
+import os
+import re
+import time
+import random
+import asyncio
+import logging
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Any, Optional, Iterator, List
+
+from backend.http_client import get_http_client
+from backend.fastjson import dumps
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Record spans and propagate W3C trace context
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "false").lower() in ("1", "true", "yes")
+# Fraction of new traces that are recorded; a traceparent from the caller decides for its trace
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0.1"))
+# Where finished spans go: "file" (OTLP/JSON lines) or "otlp" (OTLP/HTTP JSON to a collector)
+TRACE_EXPORTER = os.getenv("TRACE_EXPORTER", "file").lower()
+# File the file exporter appends to
+TRACE_FILE = os.getenv("TRACE_FILE", "traces.jsonl")
+# Collector endpoint for the otlp exporter
+TRACE_OTLP_ENDPOINT = os.getenv("TRACE_OTLP_ENDPOINT", "http://localhost:4318/v1/traces")
+# Seconds between exports
+TRACE_EXPORT_INTERVAL = float(os.getenv("TRACE_EXPORT_INTERVAL", "2"))
+# Finished spans kept for export; more are dropped
+TRACE_MAX_QUEUE = int(os.getenv("TRACE_MAX_QUEUE", "2048"))
+# service.name of the exported resource
+TRACE_SERVICE_NAME = os.getenv("TRACE_SERVICE_NAME", "n8n-voice-interface")
+
+# Requests that never get a server span (scrapes and probes)
+UNTRACED_PATHS = frozenset({"/api/health", "/api/metrics"})
+
+# OTLP span kinds
+INTERNAL, SERVER, CLIENT = 1, 2, 3
+# OTLP status codes
+STATUS_OK, STATUS_ERROR = 1, 2
+
+_TRACEPARENT = re.compile(r"^([0-9a-f]{2})-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})(-.*)?$")
+
+class SpanContext:
+    """
+    Identity of a span as carried in a W3C traceparent header.
+    """
+
+    __slots__ = ("trace_id", "span_id", "sampled", "tracestate")
+
+    def __init__(self, trace_id: str, span_id: str, sampled: bool, tracestate: Optional[str] = None):
+        self.trace_id = trace_id
+        self.span_id = span_id
+        self.sampled = sampled
+        self.tracestate = tracestate
+
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+class Span:
+    """
+    A timed operation. Spans that are not sampled still carry a context
+    (so the decision propagates downstream) but record nothing.
+    """
+
+    __slots__ = ("context", "parent_id", "name", "kind", "start_ns", "end_ns", "attributes", "status", "status_message")
+
+    def __init__(self, context: SpanContext, parent_id: Optional[str], name: str, kind: int, attributes: Dict[str, Any]):
+        self.context = context
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.start_ns = time.time_ns()
+        self.end_ns = 0
+        self.attributes = attributes
+        self.status = 0
+        self.status_message = ""
+
+    @property
+    def recording(self) -> bool:
+        return self.context.sampled and not self.end_ns
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        if self.recording and value is not None:
+            self.attributes[key] = value
+
+    def set_error(self, message: str) -> None:
+        if self.recording:
+            self.status = STATUS_ERROR
+            self.status_message = message
+
+    def end(self) -> None:
+        """
+        Finish the span and queue it for export. Ending twice is a no-op.
+        """
+        if self.end_ns:
+            return
+        self.end_ns = time.time_ns()
+        if self.context.sampled:
+            exporter.add(self)
+
+    def to_otlp(self) -> Dict[str, Any]:
+        span = {
+            "traceId": self.context.trace_id,
+            "spanId": self.context.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [_attribute(key, value) for key, value in self.attributes.items()],
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        if self.status:
+            span["status"] = {"code": self.status, "message": self.status_message}
+        return span
+
+def _attribute(key: str, value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+# Context of every span while tracing is disabled
+_UNSAMPLED = SpanContext("0" * 32, "0" * 16, False)
+
+# Span of the code currently running (per task)
+_current: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+def parse_traceparent(header: Optional[str], tracestate: Optional[str] = None) -> Optional[SpanContext]:
+    """
+    Parse a W3C traceparent header.
+
+    Returns:
+        The caller's span context, or None if the header is missing or invalid
+    """
+    if not header:
+        return None
+    match = _TRACEPARENT.match(header.strip().lower())
+    if match is None:
+        return None
+    version, trace_id, span_id, flags, rest = match.groups()
+    if version == "ff" or (version == "00" and rest) or trace_id == "0" * 32 or span_id == "0" * 16:
+        return None
+    return SpanContext(trace_id, span_id, bool(int(flags, 16) & 1), tracestate)
+
+def start_span(
+    name: str,
+    kind: int = INTERNAL,
+    parent: Optional[SpanContext] = None,
+    **attributes: Any
+) -> Span:
+    """
+    Start a span without making it current (for async generators and
+    other code that yields control while the span is open).
+
+    Args:
+        name: Span name, e.g. "n8n.webhook"
+        kind: INTERNAL, SERVER or CLIENT
+        parent: Remote parent; defaults to the current span
+        **attributes: Span attributes (None values are skipped)
+
+    Returns:
+        The span; call end() when the operation finishes
+    """
+    if not TRACING_ENABLED:
+        return Span(_UNSAMPLED, None, name, kind, {})
+    if parent is None:
+        current = _current.get()
+        parent = current.context if current is not None else None
+    if parent is not None:
+        trace_id, sampled, tracestate = parent.trace_id, parent.sampled, parent.tracestate
+    else:
+        trace_id = f"{random.getrandbits(128):032x}"
+        sampled = random.random() < TRACE_SAMPLE_RATE
+        tracestate = None
+    context = SpanContext(trace_id, f"{random.getrandbits(64):016x}", sampled, tracestate)
+    return Span(
+        context,
+        parent.span_id if parent is not None else None,
+        name,
+        kind,
+        {key: value for key, value in attributes.items() if value is not None} if sampled else {}
+    )
+
+@contextmanager
+def use_span(span: Span, end: bool = True) -> Iterator[Span]:
+    """
+    Make a span current for the wrapped block, marking it failed if the
+    block raises, and end it afterwards unless `end` is False.
+    """
+    token = _current.set(span)
+    try:
+        yield span
+    except BaseException as e:
+        if not isinstance(e, (GeneratorExit, asyncio.CancelledError)):
+            span.set_error(f"{type(e).__name__}: {e}")
+        raise
+    finally:
+        _current.reset(token)
+        if end:
+            span.end()
+
+@contextmanager
+def span(name: str, kind: int = INTERNAL, parent: Optional[SpanContext] = None, **attributes: Any) -> Iterator[Span]:
+    """
+    Run the wrapped block in a new current span.
+
+    With tracing disabled this yields a span that records nothing.
+    """
+    with use_span(start_span(name, kind, parent, **attributes)) as current:
+        yield current
+
+def current_span() -> Optional[Span]:
+    return _current.get()
+
+def inject(headers: Dict[str, str], span: Optional[Span] = None) -> None:
+    """
+    Add traceparent (and tracestate) for `span`, or the current span, to
+    outgoing request headers. Does nothing when tracing is disabled.
+    """
+    if not TRACING_ENABLED:
+        return
+    span = span or _current.get()
+    if span is None:
+        return
+    headers["traceparent"] = span.context.traceparent()
+    if span.context.tracestate:
+        headers["tracestate"] = span.context.tracestate
+
+class SpanExporter:
+    """
+    Batch finished spans and write them out in the background.
+
+    Spans are exported as OTLP/JSON ExportTraceServiceRequest objects: one
+    per line to TRACE_FILE (readable by the collector's otlpjsonfile
+    receiver), or posted to an OTLP/HTTP endpoint. When the queue is full,
+    new spans are dropped and counted.
+    """
+
+    def __init__(
+        self,
+        kind: str = TRACE_EXPORTER,
+        path: str = TRACE_FILE,
+        endpoint: str = TRACE_OTLP_ENDPOINT,
+        interval: float = TRACE_EXPORT_INTERVAL,
+        max_queue: int = TRACE_MAX_QUEUE
+    ):
+        self.kind = kind
+        self.path = path
+        self.endpoint = endpoint
+        self.interval = interval
+        self.max_queue = max_queue
+        self._queue: deque = deque()
+        self._task: Optional[asyncio.Task] = None
+        self.exported = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def add(self, span: Span) -> None:
+        if len(self._queue) >= self.max_queue:
+            self.dropped += 1
+            return
+        self._queue.append(span)
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """
+        Stop the export loop and flush what is queued.
+        """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.flush()
+
+    def _request(self, spans: List[Span]) -> bytes:
+        return dumps({
+            "resourceSpans": [{
+                "resource": {"attributes": [_attribute("service.name", TRACE_SERVICE_NAME)]},
+                "scopeSpans": [{
+                    "scope": {"name": "backend"},
+                    "spans": [span.to_otlp() for span in spans],
+                }],
+            }]
+        })
+
+    def _append(self, line: bytes) -> None:
+        with open(self.path, "ab") as f:
+            f.write(line + b"\n")
+
+    async def flush(self) -> None:
+        """
+        Export every queued span now.
+        """
+        if not self._queue:
+            return
+        spans = list(self._queue)
+        self._queue.clear()
+        try:
+            body = self._request(spans)
+            if self.kind == "otlp":
+                async with get_http_client().post(
+                    self.endpoint, data=body, headers={"Content-Type": "application/json"}
+                ) as response:
+                    if response.status >= 300:
+                        raise Exception(f"collector returned status {response.status}")
+            else:
+                await asyncio.to_thread(self._append, body)
+            self.exported += len(spans)
+        except Exception as e:
+            self.failed += len(spans)
+            logger.error(f"Error exporting {len(spans)} spans: {str(e)}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": TRACING_ENABLED,
+            "exporter": self.kind,
+            "sample_rate": TRACE_SAMPLE_RATE,
+            "queued": len(self._queue),
+            "exported": self.exported,
+            "dropped": self.dropped,
+            "failed": self.failed,
+        }
+
+# Process-wide exporter, started by the application lifespan when tracing is enabled
+exporter = SpanExporter()
+
+class TracingMiddleware:
+    """
+    ASGI middleware opening a server span per HTTP request, continuing the
+    trace of the caller's traceparent header when there is one.
+
+    Spans are named after the route template (e.g. POST /api/forward-to-n8n).
+    Only API routes are traced, except health checks and metric scrapes.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._routes: Optional[Dict[Any, str]] = None
+
+    def _route_for(self, scope) -> str:
+        if self._routes is None:
+            application = scope.get("app")
+            self._routes = {
+                route.endpoint: route.path
+                for route in getattr(application, "routes", [])
+                if hasattr(route, "endpoint")
+            }
+        return self._routes.get(scope.get("endpoint"), "other")
+
+    async def __call__(self, scope, receive, send):
+        path = scope.get("path", "")
+        if scope["type"] != "http" or not TRACING_ENABLED or not path.startswith("/api/") or path in UNTRACED_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        headers = {}
+        for key, value in scope.get("headers", ()):
+            if key in (b"traceparent", b"tracestate"):
+                headers[key.decode("latin-1")] = value.decode("latin-1")
+        parent = parse_traceparent(headers.get("traceparent"), headers.get("tracestate"))
+        server_span = start_span(f"{scope['method']} {path}", SERVER, parent, **{"http.method": scope["method"]})
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                server_span.set_attribute("http.status_code", message["status"])
+                if message["status"] >= 500:
+                    server_span.set_error(f"HTTP {message['status']}")
+            await send(message)
+
+        with use_span(server_span, end=False):
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                route = self._route_for(scope)
+                server_span.name = f"{scope['method']} {route}"
+                server_span.set_attribute("http.route", route)
+                server_span.end()
+
+async def start_tracing() -> None:
+    """
+    Start the span exporter. Called from the application lifespan.
+    """
+    if TRACING_ENABLED:
+        await exporter.start()
+
+async def stop_tracing() -> None:
+    """
+    Flush queued spans and stop the exporter.
+    """
+    await exporter.stop()
+
+def get_tracing_stats() -> Dict[str, Any]:
+    return exporter.get_stats()
@@ -0,0 +1,105 @@
+import os
+import asyncio
+import logging
+from typing import Dict, Any, List, Optional, Callable, Awaitable
+
+from backend.log import log_event
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Default window (ms) within which transcripts of one session are merged; 0 disables merging
+TURN_MERGE_WINDOW_MS = int(os.getenv("TURN_MERGE_WINDOW_MS", "0"))
+# Longest a turn is held back (as a multiple of the window) while fragments keep arriving
+TURN_MERGE_MAX_WAIT_FACTOR = float(os.getenv("TURN_MERGE_MAX_WAIT_FACTOR", "3"))
+
+class _PendingTurn:
+    def __init__(self, loop: asyncio.AbstractEventLoop, deadline: float):
+        self.parts: List[str] = []
+        self.future: asyncio.Future = loop.create_future()
+        self.deadline = deadline
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+class TurnMerger:
+    """
+    Debounce transcripts per session and merge fragments into one turn.
+
+    Each transcript restarts the session's window; when it elapses without
+    a new fragment (or the maximum wait is reached) the fragments are joined
+    and sent once. Every caller that contributed to the turn gets the same
+    result.
+    """
+
+    def __init__(
+        self,
+        send: Callable[[str, str], Awaitable[Dict[str, Any]]],
+        max_wait_factor: float = TURN_MERGE_MAX_WAIT_FACTOR
+    ):
+        self._send = send
+        self.max_wait_factor = max_wait_factor
+        self._pending: Dict[str, _PendingTurn] = {}
+        self.fragments = 0
+        self.turns = 0
+
+    async def submit(self, session_id: str, transcription: str, window_ms: int = TURN_MERGE_WINDOW_MS) -> Dict[str, Any]:
+        """
+        Add a transcript to the session's pending turn and wait for the merged result.
+
+        Args:
+            session_id: The Realtime session ID
+            transcription: The transcript fragment
+            window_ms: Debounce window; 0 sends the transcript immediately
+
+        Returns:
+            The result of sending the merged turn
+        """
+        self.fragments += 1
+        if window_ms <= 0:
+            self.turns += 1
+            return await self._send(session_id, transcription)
+
+        loop = asyncio.get_running_loop()
+        window = window_ms / 1000
+        pending = self._pending.get(session_id)
+        if pending is None:
+            pending = _PendingTurn(loop, loop.time() + window * self.max_wait_factor)
+            self._pending[session_id] = pending
+        pending.parts.append(transcription)
+
+        # Restart the window, but never past the turn's deadline
+        if pending.timer is not None:
+            pending.timer.cancel()
+        delay = max(min(window, pending.deadline - loop.time()), 0)
+        pending.timer = loop.call_later(delay, self._flush, session_id, pending)
+        return await asyncio.shield(pending.future)
+
+    def _flush(self, session_id: str, pending: _PendingTurn) -> None:
+        if self._pending.get(session_id) is pending:
+            del self._pending[session_id]
+        self.turns += 1
+        merged = " ".join(part.strip() for part in pending.parts if part.strip())
+        if len(pending.parts) > 1:
+            log_event(logger, logging.INFO, "turn.merged", sampled=True, session_id=session_id, fragments=len(pending.parts))
+        task = asyncio.ensure_future(self._send(session_id, merged))
+        task.add_done_callback(lambda done: self._resolve(pending.future, done))
+
+    @staticmethod
+    def _resolve(future: asyncio.Future, done: asyncio.Future) -> None:
+        if future.done():
+            return
+        if done.cancelled():
+            future.cancel()
+        elif done.exception() is not None:
+            future.set_exception(done.exception())
+        else:
+            future.set_result(done.result())
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Return fragment and merged-turn counters.
+        """
+        return {
+            "pending": len(self._pending),
+            "fragments": self.fragments,
+            "turns": self.turns,
+        }
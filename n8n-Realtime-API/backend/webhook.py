@@ -1,102 +1,434 @@
+import os
+import time
+import codecs
+import asyncio
 import logging
-import json
 import aiohttp
-from typing import Dict, Any, Optional, Union
+from typing import Dict, Any, Optional, Union, AsyncIterator
+
+from backend.http_client import get_http_client
+from backend.response_cache import response_cache
+from backend.metrics import stage_duration, upstream_responses, upstream_in_flight
+from backend.log import log_event
+from backend.fastjson import loads, dumps, JSONDecodeError
+from backend.extraction import extract_text
+from backend.compression import prepare_request, record_response
+from backend.tracing import start_span, span, inject, CLIENT
+from backend.circuit_breaker import n8n_breakers, CircuitBreaker, CircuitOpenError, is_failure_status
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# Upper bound for a whole (non-streamed) n8n response body
+N8N_MAX_BODY_BYTES = int(os.getenv("N8N_MAX_BODY_BYTES", str(8 * 1024 * 1024)))
+# Upper bound for a single NDJSON line or SSE event in a streamed response
+N8N_MAX_LINE_BYTES = int(os.getenv("N8N_MAX_LINE_BYTES", str(64 * 1024)))
+# Read size for streamed responses
+N8N_STREAM_CHUNK_BYTES = 4096
+
+# Timeouts for webhook calls (seconds, 0 disables): connecting, waiting
+# between reads, and the whole call including a streamed body
+N8N_CONNECT_TIMEOUT = float(os.getenv("N8N_CONNECT_TIMEOUT", "5"))
+N8N_READ_TIMEOUT = float(os.getenv("N8N_READ_TIMEOUT", "30"))
+N8N_TOTAL_TIMEOUT = float(os.getenv("N8N_TOTAL_TIMEOUT", "60"))
+N8N_TIMEOUT = aiohttp.ClientTimeout(
+    total=N8N_TOTAL_TIMEOUT or None,
+    sock_connect=N8N_CONNECT_TIMEOUT or None,
+    sock_read=N8N_READ_TIMEOUT or None
+)
+
+# Content types treated as newline-delimited JSON
+NDJSON_CONTENT_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl", "application/stream+json")
+SSE_CONTENT_TYPE = "text/event-stream"
+
+class ResponseTooLarge(Exception):
+    """Raised when an n8n response body exceeds N8N_MAX_BODY_BYTES."""
+
+class ErrorReply(dict):
+    """
+    Reply send_to_n8n and stream_from_n8n return for a failed call.
+
+    Serialized like any reply ({"text": "Error: ..."}), so clients see the
+    same shape; callers tell it from n8n output with is_error_reply, which
+    never looks at the text.
+    """
+
+def build_payload(data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Build the JSON payload sent to the n8n webhook.
+    """
+    payload = {
+        "transcription": data.get("transcription", ""),
+        "session_id": data.get("session_id", ""),
+        "timestamp": data.get("timestamp", ""),
+        "metadata": {
+            "source": "n8n-voice-interface",
+            "version": "1.0.0"
+        }
+    }
+    # Async jobs: n8n acknowledges at once and posts the result to callback_url
+    if data.get("job_id"):
+        payload["job_id"] = data["job_id"]
+        payload["callback_url"] = data.get("callback_url", "")
+    return payload
+
+# Marks parse_body calls that still have to decode the body
+_UNDECODED = object()
+
+def is_error_reply(result: Any) -> bool:
+    """
+    Whether a send_to_n8n result reports a failed call rather than n8n output.
+    """
+    return isinstance(result, ErrorReply)
+
+def decode_json(body: bytes) -> Any:
+    """
+    Decode a JSON body straight from bytes, or return None if it is not JSON.
+    """
+    try:
+        return loads(body)
+    except (JSONDecodeError, UnicodeDecodeError):
+        return None
+
+def parse_body(
+    body: bytes,
+    webhook_url: Optional[str] = None,
+    encoding: str = "utf-8",
+    response_json: Any = _UNDECODED
+) -> Dict[str, Any]:
+    """
+    Apply the text-extraction rules to a whole response body.
+
+    JSON is decoded straight from bytes (pass `response_json` when the
+    caller already decoded it); the body is only decoded to text when it
+    is used as the reply itself.
+    """
+    if response_json is _UNDECODED:
+        response_json = decode_json(body)
+    if response_json is None:
+        # If it's not JSON, use the raw text
+        log_event(logger, logging.DEBUG, "n8n.text_field", field="raw")
+        return {"text": body.decode(encoding, errors="replace")}
+    extracted = extract_text(response_json, webhook_url=webhook_url)
+    if extracted is None:
+        # If we can't find a text field, use the whole response as text
+        log_event(logger, logging.DEBUG, "n8n.text_field", field=None)
+        return {"text": body.decode(encoding, errors="replace")}
+    return extracted
+
+def body_encoding(response: aiohttp.ClientResponse) -> str:
+    """
+    Return the charset declared by a response, defaulting to UTF-8.
+    """
+    return response.get_encoding() if response.charset else "utf-8"
+
+async def read_body(response: aiohttp.ClientResponse, limit: int = N8N_MAX_BODY_BYTES) -> bytes:
+    """
+    Read a response body, refusing to buffer more than `limit` bytes.
+    """
+    if response.content_length is not None and response.content_length > limit:
+        raise ResponseTooLarge(f"Response body of {response.content_length} bytes exceeds {limit} bytes")
+    body = await response.content.read(limit + 1)
+    if len(body) > limit:
+        raise ResponseTooLarge(f"Response body exceeds {limit} bytes")
+    return body
+
+def circuit_open_reply(error: CircuitOpenError) -> Dict[str, Any]:
+    """
+    Build the reply for a call refused by an open circuit breaker.
+    """
+    upstream_responses.inc("n8n", "circuit_open")
+    log_event(logger, logging.INFO, "n8n.circuit_open", sampled=True, host=error.host, retry_after=round(error.retry_after, 1))
+    return ErrorReply(text=f"Error: {str(error)}", retry_after=round(error.retry_after))
+
+def record_outcome(breaker: CircuitBreaker, healthy: Optional[bool]) -> None:
+    """
+    Report a finished call to the host's breaker; None means the call ended
+    without telling anything about the host (e.g. it was cancelled).
+    """
+    if healthy is True:
+        breaker.record_success()
+    elif healthy is False:
+        breaker.record_failure()
+    else:
+        breaker.release()
+
 async def send_to_n8n(webhook_url: str, data: Dict[str, Any]) -> Union[Dict[str, Any], bool]:
     """
     Send data to n8n webhook and return the response if available.
-    
+
     Args:
         webhook_url: The n8n webhook URL to send data to
         data: The data to send (will be converted to JSON)
-    
+
     Returns:
         The n8n response as a dict if available, or True/False for success/failure
     """
     try:
-        logger.info(f"Sending data to n8n webhook: {webhook_url}")
-        logger.info(f"Payload: {data}")
-        
+        # Serve repeated queries from the opt-in response cache (job
+        # acknowledgements are not answers, so jobs bypass it)
+        transcription = data.get("transcription", "")
+        cacheable = not data.get("job_id")
+        cached = response_cache.get(webhook_url, transcription) if cacheable else None
+        if cached is not None:
+            log_event(logger, logging.INFO, "n8n.cache_hit", sampled=True, webhook_url=webhook_url)
+            return cached
+
         # Create a JSON payload
-        payload = {
-            "transcription": data.get("transcription", ""),
-            "session_id": data.get("session_id", ""),
-            "timestamp": data.get("timestamp", ""),
-            "metadata": {
-                "source": "n8n-voice-interface",
-                "version": "1.0.0"
-            }
-        }
-        
+        payload = build_payload(data)
+
         # Set up headers
         headers = {
             "Content-Type": "application/json",
             "Accept": "application/json"
         }
-        
-        # Send the request
-        async with aiohttp.ClientSession() as session:
-            logger.info(f"Sending POST request to n8n: {webhook_url}")
-            logger.info(f"Request headers: {headers}")
-            logger.info(f"Request payload: {json.dumps(payload)}")
-            
-            try:
+
+        # Fail fast while the webhook host is known to be unhealthy
+        breaker = n8n_breakers.get(webhook_url)
+        try:
+            breaker.before_call()
+        except CircuitOpenError as e:
+            return circuit_open_reply(e)
+
+        # Send the request over the shared connection pool
+        session = get_http_client()
+        log_event(logger, logging.INFO, "n8n.request", sampled=True, webhook_url=webhook_url, session_id=payload["session_id"])
+
+        start = time.perf_counter()
+        healthy = None
+        call = start_span("n8n.webhook", CLIENT, **{"http.url": webhook_url, "session_id": payload["session_id"], "job_id": payload.get("job_id")})
+        inject(headers, call)
+        try:
+            with upstream_in_flight.track("n8n"):
                 async with session.post(
-                    webhook_url, 
-                    data=json.dumps(payload),
-                    headers=headers
+                    webhook_url,
+                    data=prepare_request(webhook_url, dumps(payload), headers),
+                    headers=headers,
+                    timeout=N8N_TIMEOUT
                 ) as response:
                     # Check response
-                    logger.info(f"n8n webhook response status: {response.status}")
-                    
+                    upstream_responses.inc("n8n", response.status)
+                    healthy = not is_failure_status(response.status)
+                    call.set_attribute("http.status_code", response.status)
+
                     if response.status == 200:
                         try:
                             # Try to parse the response as JSON
-                            response_text = await response.text()
-                            logger.info(f"Webhook successful. Response: {response_text}")
-                            
-                            try:
-                                response_json = json.loads(response_text)
-                                logger.info(f"Parsed JSON response: {response_json}")
-                                
-                                # Check if the response has a text field
-                                if isinstance(response_json, dict) and "text" in response_json:
-                                    return response_json
-                                else:
-                                    # Try to extract text from different formats
-                                    if isinstance(response_json, dict):
-                                        # Try common formats
-                                        for key in ["message", "response", "content", "result"]:
-                                            if key in response_json and isinstance(response_json[key], str):
-                                                logger.info(f"Found text in field '{key}'")
-                                                return {"text": response_json[key]}
-                                    
-                                    # If response is just a string, wrap it
-                                    if isinstance(response_json, str):
-                                        return {"text": response_json}
-                                    
-                                    # If we can't find a text field, use the whole response as text
-                                    logger.info("No text field found, using whole response as text")
-                                    return {"text": response_text}
-                            except json.JSONDecodeError:
-                                # If it's not JSON, use the raw text
-                                logger.info("Response is not JSON, using raw text")
-                                return {"text": response_text}
+                            body = await read_body(response)
+                            record_response(response, len(body))
+                            stage_duration.observe(time.perf_counter() - start, "webhook_round_trip")
+                            log_event(logger, logging.INFO, "n8n.response", sampled=True, status=response.status, bytes=len(body))
+                            call.set_attribute("http.response_content_length", len(body))
+                            with stage_duration.time("response_normalize"), span("n8n.parse", parent=call.context):
+                                response_json = decode_json(body)
+                                result = parse_body(body, webhook_url, body_encoding(response), response_json)
+                            if cacheable:
+                                # The opt-out field may sit outside the extracted text
+                                response_cache.set(webhook_url, transcription, result, response.headers, response_json)
+                            return result
+                        except (asyncio.TimeoutError, aiohttp.ClientError):
+                            raise
                         except Exception as e:
                             logger.error(f"Error parsing webhook response: {str(e)}", exc_info=True)
-                            return {"text": f"Error processing response: {str(e)}"}
+                            call.set_error(f"Error processing response: {str(e)}")
+                            return ErrorReply(text=f"Error processing response: {str(e)}")
                     else:
-                        error_text = await response.text()
-                        logger.error(f"Webhook failed with status {response.status}: {error_text}")
-                        return {"text": f"Error: Webhook returned status {response.status}"}
-            except aiohttp.ClientError as e:
-                logger.error(f"HTTP request error: {str(e)}", exc_info=True)
-                return {"text": f"Connection error: {str(e)}"}
-    
+                        error_text = (await read_body(response)).decode(body_encoding(response), errors="replace")
+                        stage_duration.observe(time.perf_counter() - start, "webhook_round_trip")
+                        log_event(logger, logging.ERROR, "n8n.failed", status=response.status, body=error_text)
+                        call.set_error(f"HTTP {response.status}")
+                        return ErrorReply(text=f"Error: Webhook returned status {response.status}")
+        except asyncio.TimeoutError:
+            healthy = False
+            call.set_error("Timeout")
+            upstream_responses.inc("n8n", "Timeout")
+            log_event(logger, logging.ERROR, "n8n.timeout", webhook_url=webhook_url, elapsed=round(time.perf_counter() - start, 3))
+            return ErrorReply(text="Error: Webhook timed out")
+        except aiohttp.ClientError as e:
+            healthy = False
+            upstream_responses.inc("n8n", type(e).__name__)
+            logger.error(f"HTTP request error: {str(e)}", exc_info=True)
+            call.set_error(f"{type(e).__name__}: {str(e)}")
+            return ErrorReply(text=f"Connection error: {str(e)}")
+        finally:
+            record_outcome(breaker, healthy)
+            call.end()
+
     except Exception as e:
         logger.error(f"Error sending webhook: {str(e)}", exc_info=True)
-        return {"text": f"Error: {str(e)}"}
+        return ErrorReply(text=f"Error: {str(e)}")
+
+async def _iter_lines(response: aiohttp.ClientResponse, limit: int = N8N_MAX_LINE_BYTES) -> AsyncIterator[str]:
+    """
+    Yield decoded lines from a streamed body, dropping any line longer than `limit`.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    buffer = ""
+    overflow = False
+    async for chunk in response.content.iter_chunked(N8N_STREAM_CHUNK_BYTES):
+        buffer += decoder.decode(chunk)
+        while True:
+            newline = buffer.find("\n")
+            if newline < 0:
+                break
+            line, buffer = buffer[:newline], buffer[newline + 1:]
+            if overflow:
+                # Tail of an oversized line
+                overflow = False
+                continue
+            yield line.rstrip("\r")
+        if len(buffer) > limit:
+            logger.warning(f"Dropping streamed line longer than {limit} bytes")
+            buffer = ""
+            overflow = True
+    buffer += decoder.decode(b"", final=True)
+    if buffer and not overflow:
+        yield buffer.rstrip("\r")
+
+def _parse_chunk(raw: str, webhook_url: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """
+    Apply the text-extraction rules to one NDJSON line or SSE event.
+    Chunks without any text (e.g. begin/end markers) are skipped.
+    """
+    try:
+        chunk_json = loads(raw)
+    except JSONDecodeError:
+        return {"text": raw}
+    return extract_text(chunk_json, webhook_url=webhook_url)
+
+async def _iter_ndjson(response: aiohttp.ClientResponse, webhook_url: Optional[str] = None) -> AsyncIterator[Dict[str, Any]]:
+    async for line in _iter_lines(response):
+        if not line.strip():
+            continue
+        chunk = _parse_chunk(line, webhook_url)
+        if chunk is not None:
+            yield chunk
+
+async def _iter_sse(response: aiohttp.ClientResponse, webhook_url: Optional[str] = None) -> AsyncIterator[Dict[str, Any]]:
+    data_lines = []
+    size = 0
+    async for line in _iter_lines(response):
+        if not line:
+            # A blank line dispatches the event
+            if data_lines:
+                chunk = _parse_chunk("\n".join(data_lines), webhook_url)
+                data_lines = []
+                size = 0
+                if chunk is not None:
+                    yield chunk
+            continue
+        if line.startswith("data:"):
+            value = line[5:]
+            value = value[1:] if value.startswith(" ") else value
+            size += len(value)
+            if size > N8N_MAX_LINE_BYTES:
+                logger.warning(f"Dropping SSE event larger than {N8N_MAX_LINE_BYTES} bytes")
+                data_lines = []
+                size = 0
+                continue
+            data_lines.append(value)
+    if data_lines:
+        chunk = _parse_chunk("\n".join(data_lines), webhook_url)
+        if chunk is not None:
+            yield chunk
+
+async def _iter_text(response: aiohttp.ClientResponse) -> AsyncIterator[Dict[str, Any]]:
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    async for chunk in response.content.iter_chunked(N8N_STREAM_CHUNK_BYTES):
+        text = decoder.decode(chunk)
+        if text:
+            yield {"text": text}
+    text = decoder.decode(b"", final=True)
+    if text:
+        yield {"text": text}
+
+async def stream_from_n8n(webhook_url: str, data: Dict[str, Any]) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Send data to n8n webhook and yield the response incrementally.
+
+    NDJSON and SSE responses are split into events, other chunked bodies are
+    passed on as they arrive and plain JSON falls back to the whole-body rules.
+
+    Args:
+        webhook_url: The n8n webhook URL to send data to
+        data: The data to send (will be converted to JSON)
+
+    Yields:
+        Dicts with a "text" field, one per chunk
+    """
+    payload = build_payload(data)
+    headers = {
+        "Content-Type": "application/json",
+        "Accept": f"{NDJSON_CONTENT_TYPES[0]}, {SSE_CONTENT_TYPE}, application/json;q=0.9, */*;q=0.5"
+    }
+
+    breaker = n8n_breakers.get(webhook_url)
+    try:
+        breaker.before_call()
+    except CircuitOpenError as e:
+        yield circuit_open_reply(e)
+        return
+
+    upstream_in_flight.inc("n8n")
+    start = time.perf_counter()
+    healthy = None
+    # Not made current: the caller runs between chunks
+    call = start_span("n8n.webhook", CLIENT, **{"http.url": webhook_url, "session_id": payload["session_id"], "stream": True})
+    inject(headers, call)
+    try:
+        session = get_http_client()
+        log_event(logger, logging.INFO, "n8n.request", sampled=True, webhook_url=webhook_url, session_id=payload["session_id"], stream=True)
+        body = prepare_request(webhook_url, dumps(payload), headers)
+        async with session.post(webhook_url, data=body, headers=headers, timeout=N8N_TIMEOUT) as response:
+            upstream_responses.inc("n8n", response.status)
+            healthy = not is_failure_status(response.status)
+            call.set_attribute("http.status_code", response.status)
+            if response.status != 200:
+                error_text = (await read_body(response)).decode(body_encoding(response), errors="replace")
+                log_event(logger, logging.ERROR, "n8n.failed", status=response.status, body=error_text)
+                call.set_error(f"HTTP {response.status}")
+                yield ErrorReply(text=f"Error: Webhook returned status {response.status}")
+                return
+
+            content_type = response.content_type
+            if content_type in NDJSON_CONTENT_TYPES:
+                chunks = _iter_ndjson(response, webhook_url)
+            elif content_type == SSE_CONTENT_TYPE:
+                chunks = _iter_sse(response, webhook_url)
+            elif content_type == "application/json" or not response.headers.get("Transfer-Encoding") == "chunked":
+                # Whole-body fallback
+                body = await read_body(response)
+                record_response(response, len(body))
+                with span("n8n.parse", parent=call.context):
+                    result = parse_body(body, webhook_url, body_encoding(response))
+                yield result
+                return
+            else:
+                chunks = _iter_text(response)
+
+            count = 0
+            async for chunk in chunks:
+                count += 1
+                yield chunk
+            call.set_attribute("chunks", count)
+    except asyncio.TimeoutError:
+        healthy = False
+        call.set_error("Timeout")
+        upstream_responses.inc("n8n", "Timeout")
+        log_event(logger, logging.ERROR, "n8n.timeout", webhook_url=webhook_url, elapsed=round(time.perf_counter() - start, 3), stream=True)
+        yield ErrorReply(text="Error: Webhook timed out")
+    except aiohttp.ClientError as e:
+        healthy = False
+        upstream_responses.inc("n8n", type(e).__name__)
+        logger.error(f"HTTP request error: {str(e)}", exc_info=True)
+        call.set_error(f"{type(e).__name__}: {str(e)}")
+        yield ErrorReply(text=f"Connection error: {str(e)}")
+    except ResponseTooLarge as e:
+        logger.error(f"Error processing webhook response: {str(e)}")
+        call.set_error(str(e))
+        yield ErrorReply(text=f"Error processing response: {str(e)}")
+    finally:
+        record_outcome(breaker, healthy)
+        call.end()
+        upstream_in_flight.dec("n8n")
+        stage_duration.observe(time.perf_counter() - start, "webhook_stream")
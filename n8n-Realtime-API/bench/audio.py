@@ -0,0 +1,113 @@
+"""
+Micro-benchmark of the audio ingest pipeline (backend.audio).
+
+Feeds synthetic speech-band frames through one stream's pipeline on a
+single core and reports frames/s, how many real-time streams that core
+could carry, and the memory allocated per frame in steady state.
+
+Examples:
+    python -m bench.audio
+    python -m bench.audio --format float32_48k --frame-ms 10 --frames 50000
+    python -m bench.audio --stage convert --output audio.json
+
+Stages:
+    convert   PcmConverter.convert only
+    ingest    AudioIngest.feed (convert + packetise) plus the base64 encoding
+              each upstream packet gets in the relay
+"""
+import time
+import base64
+import argparse
+import platform
+import tracemalloc
+from typing import Dict, Any, Callable
+
+import numpy as np
+
+from backend.audio import AudioIngest, PcmConverter, INPUT_FORMATS
+from backend.fastjson import dumps_str
+
+STAGES = ("convert", "ingest")
+
+def _frame(input_format: str, frame_ms: int) -> bytes:
+    dtype, rate = INPUT_FORMATS[input_format]
+    count = rate * frame_ms // 1000
+    t = np.arange(count) / rate
+    signal = 0.4 * np.sin(2 * np.pi * 220 * t) + 0.1 * np.sin(2 * np.pi * 3100 * t)
+    if dtype == "<i2":
+        return (signal * 32767).astype("<i2").tobytes()
+    return signal.astype("<f4").tobytes()
+
+def _step(stage: str, input_format: str) -> Callable[[bytes], Any]:
+    if stage == "convert":
+        return PcmConverter(input_format).convert
+    ingest = AudioIngest(input_format)
+
+    def feed(frame: bytes) -> None:
+        for packet in ingest.feed(frame):
+            base64.b64encode(packet)
+    return feed
+
+def measure(stage: str, input_format: str, frame_ms: int, frames: int) -> Dict[str, Any]:
+    """
+    Run one stage over `frames` frames of one format.
+
+    Returns:
+        frames_per_sec (CPU time), streams_per_core, alloc_bytes_per_frame
+    """
+    frame = _frame(input_format, frame_ms)
+    step = _step(stage, input_format)
+    for _ in range(100):
+        step(frame)
+
+    start = time.process_time()
+    for _ in range(frames):
+        step(frame)
+    elapsed = time.process_time() - start
+
+    # Allocation is measured separately; tracemalloc slows every allocation down
+    sample = min(frames, 2000)
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    for _ in range(sample):
+        step(frame)
+    allocated = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+
+    frames_per_sec = frames / elapsed if elapsed else float("inf")
+    return {
+        "frames_per_sec": round(frames_per_sec, 1),
+        "us_per_frame": round(elapsed / frames * 1e6, 3),
+        "streams_per_core": int(frames_per_sec * frame_ms / 1000),
+        "alloc_bytes_per_frame": round(max(0, allocated) / sample, 1),
+    }
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark audio frame conversion")
+    parser.add_argument("--format", nargs="+", choices=list(INPUT_FORMATS), default=list(INPUT_FORMATS))
+    parser.add_argument("--stage", nargs="+", choices=STAGES, default=list(STAGES))
+    parser.add_argument("--frame-ms", type=int, default=20, help="Audio per browser frame (ms)")
+    parser.add_argument("--frames", type=int, default=20000, help="Measured frames per run")
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    args = parser.parse_args()
+
+    results = {}
+    print(f"frame={args.frame_ms}ms frames={args.frames} numpy={np.__version__} python={platform.python_version()}")
+    for stage in args.stage:
+        for input_format in args.format:
+            result = results[f"{stage}/{input_format}"] = measure(stage, input_format, args.frame_ms, args.frames)
+            print(f"  {stage:8} {input_format:12} {result['frames_per_sec']:>12,.0f} frames/s "
+                  f"{result['us_per_frame']:>8.2f} us/frame {result['streams_per_core']:>8,} streams/core "
+                  f"{result['alloc_bytes_per_frame']:>8.1f} B/frame")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(dumps_str({
+                "params": {"frame_ms": args.frame_ms, "frames": args.frames},
+                "numpy": np.__version__,
+                "python": platform.python_version(),
+                "results": results,
+            }) + "\n")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,318 @@
+"""
+Local fakes of the n8n webhook and the OpenAI Realtime endpoints.
+
+Run with:
+    python -m bench.fakes --port 8911 --n8n-latency 0.05 --openai-latency 0.3
+
+Both fakes are served from one process:
+    POST /webhook/{name}          fake n8n webhook
+    POST /v1/realtime/sessions    fake OpenAI sessions endpoint
+    GET  /v1/realtime             fake Realtime WebSocket (for relay mode)
+    GET  /stats                   request counters
+
+The fake Realtime server turns every `turn_bytes` of appended audio (or an
+explicit input_audio_buffer.commit) into a completed transcription after
+`transcribe_latency` seconds, and answers response.create with a short
+text and audio response.
+
+A webhook payload carrying callback_url (async job mode) is acknowledged
+at once; the reply is posted to the callback URL after the latency.
+
+Webhook behaviour can be overridden per URL with query parameters, so one
+fake can stand in for several workflows:
+    latency      seconds before the reply starts
+    jitter       extra random delay, 0..jitter seconds
+    size         length of the reply text in bytes
+    text         reply text to send instead of `size` bytes of filler
+    mode         json | ndjson | sse | text
+    chunks       number of chunks for streamed modes
+    chunk_delay  seconds between chunks
+    compress     1 to compress replies with an encoding the client accepts
+
+Compressed request bodies (Content-Encoding gzip, deflate or br) are
+accepted; /stats counts them, and requests carrying a traceparent header.
+"""
+import time
+import base64
+import itertools
+import random
+import asyncio
+import argparse
+from typing import Dict, Any
+
+import aiohttp
+from aiohttp import web
+
+from backend.fastjson import dumps, dumps_str, loads
+
+MODES = ("json", "ndjson", "sse", "text")
+
+def _reply_text(size: int) -> str:
+    sentence = "The quick brown fox jumps over the lazy dog. "
+    return (sentence * (size // len(sentence) + 1))[:size]
+
+def _split(text: str, chunks: int):
+    step = max(1, -(-len(text) // max(1, chunks)))
+    return [text[i:i + step] for i in range(0, len(text), step)] or [""]
+
+def create_app(
+    n8n_latency: float = 0.05,
+    n8n_jitter: float = 0.0,
+    body_size: int = 64,
+    mode: str = "json",
+    chunks: int = 4,
+    chunk_delay: float = 0.02,
+    compress: bool = False,
+    openai_latency: float = 0.3,
+    turn_bytes: int = 48000,
+    transcribe_latency: float = 0.1
+) -> web.Application:
+    """
+    Build the fake upstream application.
+
+    Args:
+        n8n_latency: Default webhook latency (seconds)
+        n8n_jitter: Default extra random webhook latency (seconds)
+        body_size: Default reply text size (bytes)
+        mode: Default reply mode (json, ndjson, sse or text)
+        chunks: Default number of chunks for streamed modes
+        chunk_delay: Default delay between chunks (seconds)
+        compress: Compress replies by default when the client accepts it
+        openai_latency: Latency of the sessions endpoint (seconds)
+        turn_bytes: Appended audio (bytes) that makes one Realtime turn
+        transcribe_latency: Delay before a Realtime transcription completes (seconds)
+
+    Returns:
+        The aiohttp application
+    """
+    counters: Dict[str, int] = {
+        "webhook": 0,
+        "webhook_compressed": 0,
+        "webhook_traced": 0,
+        "callbacks": 0,
+        "callback_errors": 0,
+        "sessions": 0,
+        "realtime_connections": 0,
+        "realtime_audio_bytes": 0,
+        "realtime_turns": 0,
+        "realtime_items_created": 0,
+        "realtime_responses": 0,
+    }
+    defaults: Dict[str, Any] = {
+        "latency": n8n_latency,
+        "jitter": n8n_jitter,
+        "size": body_size,
+        "mode": mode,
+        "chunks": chunks,
+        "chunk_delay": chunk_delay,
+        "compress": compress,
+    }
+
+    async def webhook(request: web.Request) -> web.StreamResponse:
+        counters["webhook"] += 1
+        query = request.query
+        latency = float(query.get("latency", defaults["latency"]))
+        jitter = float(query.get("jitter", defaults["jitter"]))
+        size = int(query.get("size", defaults["size"]))
+        reply_mode = query.get("mode", defaults["mode"])
+        chunk_count = int(query.get("chunks", defaults["chunks"]))
+        delay = float(query.get("chunk_delay", defaults["chunk_delay"]))
+        compress_reply = query.get("compress", "1" if defaults["compress"] else "0") in ("1", "true")
+        reply_text = query.get("text")
+        if reply_mode not in MODES:
+            return web.json_response({"message": f"Unknown mode {reply_mode}"}, status=400)
+
+        body = await request.read()
+        if "traceparent" in request.headers:
+            counters["webhook_traced"] += 1
+        if request.headers.get("Content-Encoding"):
+            # aiohttp's server has already decoded the body
+            counters["webhook_compressed"] += 1
+        delay_s = latency + (random.uniform(0, jitter) if jitter else 0)
+        payload = loads(body) if body else {}
+        if isinstance(payload, dict) and payload.get("callback_url"):
+            task = asyncio.create_task(call_back(payload["callback_url"], payload.get("job_id"), delay_s, reply_text or _reply_text(size)))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+            return web.json_response({"message": "Workflow was started"})
+
+        await asyncio.sleep(delay_s)
+        text = reply_text or _reply_text(size)
+        if reply_mode == "json":
+            response = web.Response(body=dumps({"text": text}), content_type="application/json")
+            if compress_reply:
+                response.enable_compression()
+            return response
+
+        content_type = {
+            "ndjson": "application/x-ndjson",
+            "sse": "text/event-stream",
+            "text": "text/plain",
+        }[reply_mode]
+        response = web.StreamResponse(headers={"Content-Type": content_type})
+        response.enable_chunked_encoding()
+        if compress_reply:
+            response.enable_compression()
+        await response.prepare(request)
+        if reply_mode == "ndjson":
+            await response.write(dumps({"type": "begin"}) + b"\n")
+        for index, part in enumerate(_split(text, chunk_count)):
+            if index and delay:
+                await asyncio.sleep(delay)
+            if reply_mode == "ndjson":
+                await response.write(dumps({"type": "item", "content": part}) + b"\n")
+            elif reply_mode == "sse":
+                await response.write(b"data: " + dumps({"text": part}) + b"\n\n")
+            else:
+                await response.write(part.encode("utf-8"))
+        if reply_mode == "ndjson":
+            await response.write(dumps({"type": "end"}) + b"\n")
+        await response.write_eof()
+        return response
+
+    pending = set()
+
+    async def call_back(url: str, job_id: Any, delay_s: float, text: str) -> None:
+        await asyncio.sleep(delay_s)
+        try:
+            async with app["client"].post(url, data=dumps({"text": text, "job_id": job_id}), headers={"Content-Type": "application/json"}) as response:
+                await response.read()
+                counters["callbacks" if response.status == 200 else "callback_errors"] += 1
+        except aiohttp.ClientError:
+            counters["callback_errors"] += 1
+
+    async def client_context(app: web.Application):
+        app["client"] = aiohttp.ClientSession()
+        yield
+        for task in list(pending):
+            task.cancel()
+        await app["client"].close()
+
+    async def sessions(request: web.Request) -> web.Response:
+        counters["sessions"] += 1
+        if not request.headers.get("Authorization", "").startswith("Bearer "):
+            return web.json_response({"error": {"message": "Missing bearer token"}}, status=401)
+        body = await request.json()
+        await asyncio.sleep(openai_latency)
+        now = int(time.time())
+        return web.json_response({
+            "id": f"sess_bench_{time.time_ns():x}{random.getrandbits(16):04x}",
+            "object": "realtime.session",
+            "model": body.get("model"),
+            "voice": body.get("voice"),
+            "expires_at": now + 60,
+            "client_secret": {"value": f"ek_bench_{now}", "expires_at": now + 60},
+        })
+
+    async def realtime(request: web.Request) -> web.StreamResponse:
+        if not request.headers.get("Authorization", "").startswith("Bearer "):
+            return web.json_response({"error": {"message": "Missing bearer token"}}, status=401)
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        counters["realtime_connections"] += 1
+        limit = int(request.query.get("turn_bytes", turn_bytes))
+        ids = (f"item_{n}" for n in itertools.count(1))
+        buffered = 0
+        pending = set()
+
+        async def send(event: Dict[str, Any]) -> None:
+            if not ws.closed:
+                await ws.send_str(dumps_str(event))
+
+        async def transcribe(item_id: str, audio_bytes: int) -> None:
+            await asyncio.sleep(transcribe_latency)
+            counters["realtime_turns"] += 1
+            await send({
+                "type": "conversation.item.input_audio_transcription.completed",
+                "item_id": item_id,
+                "content_index": 0,
+                "transcript": f"fake transcript of {audio_bytes} bytes",
+            })
+
+        async def commit() -> None:
+            nonlocal buffered
+            item_id = next(ids)
+            await send({"type": "input_audio_buffer.speech_started", "item_id": item_id})
+            await send({"type": "input_audio_buffer.speech_stopped", "item_id": item_id})
+            await send({"type": "input_audio_buffer.committed", "item_id": item_id})
+            await send({"type": "conversation.item.created", "item": {"id": item_id, "role": "user"}})
+            task = asyncio.create_task(transcribe(item_id, buffered))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+            buffered = 0
+
+        await send({"type": "session.created", "session": {"id": f"sess_fake_{time.time_ns():x}", "model": request.query.get("model")}})
+        async for message in ws:
+            if message.type != web.WSMsgType.TEXT:
+                continue
+            event = loads(message.data)
+            event_type = event.get("type")
+            if event_type == "session.update":
+                await send({"type": "session.updated", "session": event.get("session", {})})
+            elif event_type == "input_audio_buffer.append":
+                size = len(base64.b64decode(event.get("audio", "")))
+                counters["realtime_audio_bytes"] += size
+                buffered += size
+                if buffered >= limit:
+                    await commit()
+            elif event_type == "input_audio_buffer.commit" and buffered:
+                await commit()
+            elif event_type == "conversation.item.create":
+                counters["realtime_items_created"] += 1
+                await send({"type": "conversation.item.created", "item": dict(event.get("item", {}), id=next(ids))})
+            elif event_type == "response.create":
+                counters["realtime_responses"] += 1
+                response_id = f"resp_{time.time_ns():x}"
+                await send({"type": "response.created", "response": {"id": response_id}})
+                await send({"type": "response.text.delta", "response_id": response_id, "delta": "ok"})
+                await send({"type": "response.audio.delta", "response_id": response_id, "delta": base64.b64encode(bytes(960)).decode()})
+                await send({"type": "response.done", "response": {"id": response_id, "status": "completed"}})
+            else:
+                await send({"type": "error", "error": {"type": "invalid_request_error", "message": f"Unsupported event {event_type}"}})
+        for task in pending:
+            task.cancel()
+        return ws
+
+    async def stats(request: web.Request) -> web.Response:
+        return web.json_response(counters)
+
+    app = web.Application()
+    app.cleanup_ctx.append(client_context)
+    app.router.add_post("/webhook/{name}", webhook)
+    app.router.add_post("/v1/realtime/sessions", sessions)
+    app.router.add_get("/v1/realtime", realtime)
+    app.router.add_get("/stats", stats)
+    return app
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Fake n8n webhook and OpenAI sessions endpoint")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8911)
+    parser.add_argument("--n8n-latency", type=float, default=0.05)
+    parser.add_argument("--n8n-jitter", type=float, default=0.0)
+    parser.add_argument("--body-size", type=int, default=64)
+    parser.add_argument("--mode", choices=MODES, default="json")
+    parser.add_argument("--chunks", type=int, default=4)
+    parser.add_argument("--chunk-delay", type=float, default=0.02)
+    parser.add_argument("--compress", action="store_true", help="Compress webhook replies")
+    parser.add_argument("--openai-latency", type=float, default=0.3)
+    parser.add_argument("--turn-bytes", type=int, default=48000)
+    parser.add_argument("--transcribe-latency", type=float, default=0.1)
+    args = parser.parse_args()
+
+    app = create_app(
+        n8n_latency=args.n8n_latency,
+        n8n_jitter=args.n8n_jitter,
+        body_size=args.body_size,
+        mode=args.mode,
+        chunks=args.chunks,
+        chunk_delay=args.chunk_delay,
+        compress=args.compress,
+        openai_latency=args.openai_latency,
+        turn_bytes=args.turn_bytes,
+        transcribe_latency=args.transcribe_latency
+    )
+    web.run_app(app, host=args.host, port=args.port, print=None, access_log=None)
+
+if __name__ == "__main__":
+    main()
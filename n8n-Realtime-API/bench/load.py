@@ -0,0 +1,333 @@
+"""
+Load generator for the voice interface API.
+
+Starts the fakes and the target app (unless URLs of running ones are
+given), then drives each scenario at a fixed concurrency for a fixed time
+and reports req/s, latency percentiles and event-loop lag.
+
+Examples:
+    python -m bench.load --target backend.app:app --concurrency 50 --duration 10
+    python -m bench.load --target main:app --scenario forward --n8n-latency 0.2
+    python -m bench.load --scenario forward --stream --mode ndjson --output after.json --compare before.json
+
+Scenarios:
+    session   POST /api/realtime/session against the fake OpenAI endpoint
+    forward   POST /api/forward-to-n8n against the fake n8n webhook
+              (one session per worker, a distinct transcription per request)
+"""
+import os
+import sys
+import time
+import socket
+import asyncio
+import argparse
+import platform
+import subprocess
+from urllib.parse import urlencode
+from typing import Dict, Any, List, Optional, Callable, Awaitable
+
+import aiohttp
+
+from bench.stats import LoopLagMonitor, summarize
+from backend.fastjson import loads, dumps_str
+
+SCENARIOS = ("session", "forward")
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=PROJECT_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+async def _wait_ready(session: aiohttp.ClientSession, url: str, process: Optional[subprocess.Popen], timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"{url} exited with code {process.returncode} before becoming ready")
+        try:
+            async with session.get(url) as response:
+                if response.status < 500:
+                    return
+        except aiohttp.ClientError:
+            pass
+        await asyncio.sleep(0.1)
+    raise RuntimeError(f"Timed out waiting for {url}")
+
+def _spawn(args: List[str], env: Dict[str, str], verbose: bool) -> subprocess.Popen:
+    output = None if verbose else subprocess.DEVNULL
+    return subprocess.Popen([sys.executable, "-m", *args], cwd=PROJECT_ROOT, env=env, stdout=output, stderr=output)
+
+def _stop(process: Optional[subprocess.Popen]) -> None:
+    if process is None or process.poll() is not None:
+        return
+    process.terminate()
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+class Result:
+    """
+    Samples collected for one scenario.
+    """
+
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.first_byte: List[float] = []
+        self.errors = 0
+        self.upstream_errors = 0
+
+async def _run_workers(
+    concurrency: int,
+    duration: float,
+    warmup: float,
+    request: Callable[[int, int, Result], Awaitable[None]]
+) -> Dict[str, Any]:
+    result = Result()
+    discard = Result()
+    started = time.perf_counter()
+    measure_from = started + warmup
+    stop_at = measure_from + duration
+
+    async def worker(worker_id: int) -> None:
+        sequence = 0
+        while True:
+            now = time.perf_counter()
+            if now >= stop_at:
+                return
+            sequence += 1
+            await request(worker_id, sequence, result if now >= measure_from else discard)
+
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    elapsed = time.perf_counter() - measure_from
+    completed = len(result.latencies) + result.errors
+    report = {
+        "requests": completed,
+        "errors": result.errors,
+        "upstream_errors": result.upstream_errors,
+        "rps": round(completed / elapsed, 2) if elapsed > 0 else 0.0,
+        "latency_ms": summarize(result.latencies),
+    }
+    if result.first_byte:
+        report["first_byte_ms"] = summarize(result.first_byte)
+    return report
+
+async def _timed_post(session: aiohttp.ClientSession, url: str, body: Dict[str, Any], result: Result, stream: bool = False) -> Optional[Any]:
+    start = time.perf_counter()
+    try:
+        async with session.post(url, json=body) as response:
+            if stream:
+                chunks = []
+                async for line in response.content:
+                    if not chunks:
+                        result.first_byte.append(time.perf_counter() - start)
+                    chunks.append(line)
+                payload = b"".join(chunks)
+            else:
+                payload = await response.read()
+            elapsed = time.perf_counter() - start
+            if response.status >= 400:
+                result.errors += 1
+                return None
+    except (aiohttp.ClientError, asyncio.TimeoutError):
+        result.errors += 1
+        return None
+    result.latencies.append(elapsed)
+    try:
+        first = loads(payload.split(b"\n", 1)[0]) if stream else loads(payload)
+    except ValueError:
+        return None
+    if isinstance(first, dict) and str(first.get("text", "")).startswith(("Error", "Connection error")):
+        result.upstream_errors += 1
+    return first
+
+async def _scenario_session(session: aiohttp.ClientSession, base_url: str, webhook_url: str, args) -> Dict[str, Any]:
+    url = f"{base_url}/api/realtime/session"
+
+    async def request(worker_id: int, sequence: int, result: Result) -> None:
+        await _timed_post(session, url, {"webhook_url": webhook_url, "model_type": "standard"}, result)
+
+    return await _run_workers(args.concurrency, args.duration, args.warmup, request)
+
+async def _scenario_forward(session: aiohttp.ClientSession, base_url: str, webhook_url: str, args) -> Dict[str, Any]:
+    url = f"{base_url}/api/forward-to-n8n"
+    session_ids = []
+    for _ in range(args.concurrency):
+        async with session.post(f"{base_url}/api/realtime/session", json={"webhook_url": webhook_url, "model_type": "standard"}) as response:
+            response.raise_for_status()
+            session_ids.append(loads(await response.read())["id"])
+
+    async def request(worker_id: int, sequence: int, result: Result) -> None:
+        body = {
+            "transcription": f"benchmark turn {worker_id}-{sequence}",
+            "session_id": session_ids[worker_id],
+        }
+        if args.stream:
+            body["stream"] = True
+        await _timed_post(session, url, body, result, stream=args.stream)
+
+    return await _run_workers(args.concurrency, args.duration, args.warmup, request)
+
+async def _loop_lag(session: aiohttp.ClientSession, base_url: str, reset: bool = False) -> Optional[Dict[str, Any]]:
+    try:
+        async with session.get(f"{base_url}/__bench/loop-lag", params={"reset": "1"} if reset else None) as response:
+            if response.status != 200:
+                return None
+            return loads(await response.read())
+    except aiohttp.ClientError:
+        return None
+
+async def run(args) -> Dict[str, Any]:
+    """
+    Run the selected scenarios and return the report.
+    """
+    env = dict(os.environ)
+    env.setdefault("LOG_LEVEL", "WARNING")
+    env.setdefault("OPENAI_API_KEY", "bench")
+    fakes = server = None
+    fakes_url = args.fakes_url
+    base_url = args.url
+
+    try:
+        if fakes_url is None:
+            port = _free_port()
+            fakes_url = f"http://127.0.0.1:{port}"
+            fakes = _spawn([
+                "bench.fakes", "--port", str(port),
+                "--n8n-latency", str(args.n8n_latency),
+                "--n8n-jitter", str(args.n8n_jitter),
+                "--body-size", str(args.body_size),
+                "--mode", args.mode,
+                "--chunks", str(args.chunks),
+                "--chunk-delay", str(args.chunk_delay),
+                "--openai-latency", str(args.openai_latency),
+            ], env, args.verbose)
+        if base_url is None:
+            port = _free_port()
+            base_url = f"http://127.0.0.1:{port}"
+            env["OPENAI_REALTIME_SESSIONS_URL"] = f"{fakes_url}/v1/realtime/sessions"
+            server = _spawn(["bench.serve", args.target, "--port", str(port)], env, args.verbose)
+
+        webhook_url = f"{fakes_url}/webhook/bench"
+        if args.mode != "json" or args.stream:
+            webhook_url += "?" + urlencode({"mode": args.mode})
+
+        connector = aiohttp.TCPConnector(limit=args.concurrency + 4)
+        timeout = aiohttp.ClientTimeout(total=args.timeout)
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+            if fakes is not None:
+                await _wait_ready(session, f"{fakes_url}/stats", fakes)
+            await _wait_ready(session, f"{base_url}/api/health", server)
+
+            client_lag = LoopLagMonitor()
+            client_lag.start()
+            scenarios = {}
+            try:
+                for name in args.scenario:
+                    await _loop_lag(session, base_url, reset=True)
+                    client_lag.reset()
+                    runner = _scenario_session if name == "session" else _scenario_forward
+                    report = await runner(session, base_url, webhook_url, args)
+                    report["server_loop_lag_ms"] = await _loop_lag(session, base_url)
+                    report["client_loop_lag_ms"] = client_lag.summary()
+                    scenarios[name] = report
+            finally:
+                await client_lag.stop()
+    finally:
+        _stop(server)
+        _stop(fakes)
+
+    return {
+        "commit": _git_commit(),
+        "target": args.target if args.url is None else args.url,
+        "python": platform.python_version(),
+        "params": {
+            "concurrency": args.concurrency,
+            "duration": args.duration,
+            "warmup": args.warmup,
+            "stream": args.stream,
+            "mode": args.mode,
+            "n8n_latency": args.n8n_latency,
+            "n8n_jitter": args.n8n_jitter,
+            "body_size": args.body_size,
+            "openai_latency": args.openai_latency,
+        },
+        "scenarios": scenarios,
+    }
+
+def _format_latency(stats: Optional[Dict[str, Any]]) -> str:
+    if not stats:
+        return "n/a"
+    return f"p50={stats['p50']:.2f} p95={stats['p95']:.2f} p99={stats['p99']:.2f} max={stats['max']:.2f}"
+
+def print_report(report: Dict[str, Any], baseline: Optional[Dict[str, Any]] = None) -> None:
+    """
+    Print a human-readable summary, with changes against a baseline report if given.
+    """
+    print(f"target={report['target']} commit={report['commit']} concurrency={report['params']['concurrency']}")
+    for name, scenario in report["scenarios"].items():
+        print(f"\n[{name}] {scenario['requests']} requests, {scenario['errors']} errors, "
+              f"{scenario['upstream_errors']} upstream errors, {scenario['rps']:.1f} req/s")
+        print(f"  latency ms        {_format_latency(scenario['latency_ms'])}")
+        if "first_byte_ms" in scenario:
+            print(f"  first byte ms     {_format_latency(scenario['first_byte_ms'])}")
+        print(f"  server loop lag   {_format_latency(scenario['server_loop_lag_ms'])}")
+        print(f"  client loop lag   {_format_latency(scenario['client_loop_lag_ms'])}")
+
+        previous = (baseline or {}).get("scenarios", {}).get(name)
+        if previous:
+            changes = [("req/s", previous["rps"], scenario["rps"])]
+            changes += [
+                (key, previous["latency_ms"][key], scenario["latency_ms"][key])
+                for key in ("p50", "p95", "p99")
+            ]
+            formatted = " ".join(
+                f"{label} {((new - old) / old * 100) if old else 0.0:+.1f}%"
+                for label, old, new in changes
+            )
+            print(f"  vs {baseline.get('commit')}  {formatted}")
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the voice interface API against local fakes")
+    parser.add_argument("--target", default="backend.app:app", help="App to serve: backend.app:app or main:app")
+    parser.add_argument("--url", help="Benchmark an already running server instead of starting one")
+    parser.add_argument("--fakes-url", help="Use already running fakes (python -m bench.fakes)")
+    parser.add_argument("--scenario", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=10.0, help="Measured seconds per scenario")
+    parser.add_argument("--warmup", type=float, default=2.0, help="Unmeasured seconds before each scenario")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Per-request timeout (seconds)")
+    parser.add_argument("--stream", action="store_true", help="Request streamed n8n replies (backend.app only)")
+    parser.add_argument("--mode", choices=("json", "ndjson", "sse", "text"), default="json", help="Fake n8n reply mode")
+    parser.add_argument("--n8n-latency", type=float, default=0.05)
+    parser.add_argument("--n8n-jitter", type=float, default=0.0)
+    parser.add_argument("--body-size", type=int, default=64)
+    parser.add_argument("--chunks", type=int, default=4)
+    parser.add_argument("--chunk-delay", type=float, default=0.02)
+    parser.add_argument("--openai-latency", type=float, default=0.3)
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    parser.add_argument("--compare", help="Baseline JSON report to compare against")
+    parser.add_argument("--verbose", action="store_true", help="Show output of the spawned processes")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = loads(f.read())
+    print_report(report, baseline)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(dumps_str(report) + "\n")
+
+if __name__ == "__main__":
+    main()
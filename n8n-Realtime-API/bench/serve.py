@@ -0,0 +1,61 @@
+"""
+Serve an application under uvicorn with an event-loop lag probe.
+
+Run with:
+    python -m bench.serve backend.app:app --port 8000
+
+The lag probe is exposed next to the application:
+    GET /__bench/loop-lag           lag summary since the last reset (ms)
+    GET /__bench/loop-lag?reset=1   same, then start a new window
+"""
+import argparse
+from urllib.parse import parse_qs
+
+import uvicorn
+from uvicorn.importer import import_from_string
+
+from bench.stats import LoopLagMonitor
+from backend.fastjson import dumps
+
+LAG_PATH = "/__bench/loop-lag"
+
+class LagProbe:
+    """
+    ASGI wrapper serving the lag summary and passing everything else on.
+    """
+
+    def __init__(self, app, monitor: LoopLagMonitor):
+        self.app = app
+        self.monitor = monitor
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            self.monitor.start()
+        if scope["type"] != "http" or scope["path"] != LAG_PATH:
+            await self.app(scope, receive, send)
+            return
+
+        body = dumps(self.monitor.summary())
+        if parse_qs(scope.get("query_string", b"").decode()).get("reset"):
+            self.monitor.reset()
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve an app with an event-loop lag probe")
+    parser.add_argument("target", help="Application import path, e.g. backend.app:app or main:app")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--lag-interval", type=float, default=0.01, help="Probe interval (seconds)")
+    args = parser.parse_args()
+
+    app = import_from_string(args.target)
+    probe = LagProbe(app, LoopLagMonitor(args.lag_interval))
+    uvicorn.run(probe, host=args.host, port=args.port, log_level="warning", access_log=False, lifespan="on")
+
+if __name__ == "__main__":
+    main()
@@ -27,6 +27,20 @@ document.addEventListener('DOMContentLoaded', () => {
     const MAX_CONVERSATION_ENTRIES = 10;
     let isProcessingTranscription = false;
     let selectedModel = "standard"; // Domyślny model
+    let turnSocket = null;
+    let turnMessageCounter = 0;
+    const pendingTurns = new Map();
+    let relayMode = false; // Audio goes through the backend instead of WebRTC
+    let relaySampleRate = 24000;
+    let relayAudioFormats = ['pcm16'];
+    let jobMode = false; // n8n answers turns asynchronously through the callback endpoint
+    let eventSource = null; // Session events over SSE when the turn channel is not available
+    let lastEventSeq = 0; // Last session event handled, so a new stream resumes without gaps
+    let relaySocket = null;
+    let audioContext = null;
+    let audioProcessor = null;
+    let playbackTime = 0;
+    let traceSampleRate = 0; // Share of turns traced end to end (0 when the backend does not trace)
     
     // Load saved webhook URL from localStorage
     webhookUrlInput.value = localStorage.getItem('webhookUrl') || '';
@@ -37,6 +51,11 @@ document.addEventListener('DOMContentLoaded', () => {
             const configResponse = await fetch('/api/config');
             if (configResponse.ok) {
                 const config = await configResponse.json();
+                relayMode = Boolean(config.relay_mode);
+                relaySampleRate = config.relay_sample_rate || relaySampleRate;
+                relayAudioFormats = config.audio_formats || relayAudioFormats;
+                jobMode = Boolean(config.job_mode);
+                traceSampleRate = Number(config.trace_sample_rate) || 0;
                 
                 // Sprawdź, czy mamy elementy wyboru modelu w HTML
                 if (!modelSelector) {
@@ -140,12 +159,13 @@ document.addEventListener('DOMContentLoaded', () => {
             
             const tokenResponse = await fetch('/api/realtime/session', {
                 method: 'POST',
-                headers: {
+                headers: traceHeaders({
                     'Content-Type': 'application/json',
-                },
+                }, newTraceparent()),
                 body: JSON.stringify({
                     webhook_url: webhookUrl,
-                    model_type: selectedModel  // Przekazujemy wybrany model
+                    model_type: selectedModel,  // Przekazujemy wybrany model
+                    relay: relayMode
                 })
             });
             
@@ -158,13 +178,21 @@ document.addEventListener('DOMContentLoaded', () => {
             const data = await tokenResponse.json();
             console.log('Odpowiedź z API sesji:', data);
             
-            ephemeralToken = data.client_secret.value;
             sessionId = data.id;
             
-            console.log(`Uzyskano token sesji: ${sessionId}`);
-            
-            // Create WebRTC peer connection
-            await setupWebRTC();
+            if (data.relay) {
+                // The backend holds the Realtime connection and answers turns itself
+                await setupRelay();
+            } else {
+                ephemeralToken = data.client_secret.value;
+                console.log(`Uzyskano token sesji: ${sessionId}`);
+                
+                // Create WebRTC peer connection
+                await setupWebRTC();
+                
+                // Open the persistent turn channel to the backend
+                openTurnChannel();
+            }
             
             // Update UI
             statusMessage.textContent = 'Sesja Realtime zainicjalizowana';
@@ -190,6 +218,13 @@ document.addEventListener('DOMContentLoaded', () => {
     
     // Send Polish language configuration
     function sendPolishLanguageConfig() {
+        if (relaySocket) {
+            if (relaySocket.readyState === WebSocket.OPEN) {
+                sendPolishLanguageConfigInternal();
+            }
+            return;
+        }
+        
         if (!dataChannel) {
             console.error('Kanał danych nie istnieje');
             return;
@@ -231,7 +266,7 @@ document.addEventListener('DOMContentLoaded', () => {
             const configString = JSON.stringify(polishConfig);
             console.log('JSON konfiguracji:', configString);
             
-            dataChannel.send(configString);
+            (relaySocket || dataChannel).send(configString);
             console.log('Konfiguracja wysłana pomyślnie');
         } catch (error) {
             console.error('Błąd podczas wysyłania konfiguracji:', error);
@@ -364,9 +399,113 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     }
     
+    // Setup the backend relay: microphone PCM16 over a WebSocket, events back
+    async function setupRelay() {
+        try {
+            localStream = await navigator.mediaDevices.getUserMedia({
+                audio: {
+                    channelCount: 1,
+                    echoCancellation: true,
+                    noiseSuppression: true,
+                    autoGainControl: true
+                }
+            });
+        } catch (mediaError) {
+            console.error('Błąd dostępu do mikrofonu:', mediaError);
+            showMessage(`Błąd dostępu do mikrofonu: ${mediaError.message}`, 'error');
+            throw mediaError;
+        }
+        
+        // Send 48 kHz audio as captured when the backend can resample it;
+        // otherwise let the browser resample to the relay rate
+        audioContext = new AudioContext();
+        let audioFormat = 'pcm16';
+        if (audioContext.sampleRate === 48000 && relayAudioFormats.includes('pcm16_48k')) {
+            audioFormat = 'pcm16_48k';
+        } else if (audioContext.sampleRate !== relaySampleRate) {
+            audioContext.close();
+            audioContext = new AudioContext({ sampleRate: relaySampleRate });
+        }
+        console.log(`Format audio przekaźnika: ${audioFormat} (${audioContext.sampleRate} Hz)`);
+        
+        const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
+        const traceparent = newTraceparent();
+        const traceQuery = traceparent ? `&traceparent=${traceparent}` : '';
+        const socket = new WebSocket(`${protocol}//${window.location.host}/api/relay/${encodeURIComponent(sessionId)}?audio_format=${audioFormat}${traceQuery}`);
+        socket.binaryType = 'arraybuffer';
+        
+        await new Promise((resolve, reject) => {
+            socket.onopen = resolve;
+            socket.onerror = () => reject(new Error('Nie udało się połączyć z przekaźnikiem Realtime'));
+        });
+        
+        socket.onmessage = (event) => {
+            let message;
+            try {
+                message = JSON.parse(event.data);
+            } catch (error) {
+                console.error('Niepoprawna wiadomość z przekaźnika:', event.data);
+                return;
+            }
+            
+            if (message.type === 'n8n.response') {
+                console.log('Odpowiedź z n8n:', message.data);
+            } else if (message.type === 'error' && message.status) {
+                showMessage(`Błąd: ${message.status} - ${message.detail}`, 'error');
+            } else if (message.type === 'response.audio.delta') {
+                playRelayAudio(message.delta);
+            } else {
+                handleDataChannelMessage({ data: event.data });
+            }
+        };
+        socket.onclose = () => {
+            console.log('Przekaźnik Realtime zamknięty');
+            if (relaySocket === socket) {
+                relaySocket = null;
+                showMessage('Połączenie z OpenAI zamknięte', 'info');
+            }
+        };
+        relaySocket = socket;
+        
+        const source = audioContext.createMediaStreamSource(localStream);
+        audioProcessor = audioContext.createScriptProcessor(4096, 1, 1);
+        audioProcessor.onaudioprocess = (event) => {
+            if (!isListening || !relaySocket || relaySocket.readyState !== WebSocket.OPEN) return;
+            const samples = event.inputBuffer.getChannelData(0);
+            const pcm16 = new Int16Array(samples.length);
+            for (let i = 0; i < samples.length; i++) {
+                const sample = Math.max(-1, Math.min(1, samples[i]));
+                pcm16[i] = sample < 0 ? sample * 0x8000 : sample * 0x7fff;
+            }
+            relaySocket.send(pcm16.buffer);
+        };
+        source.connect(audioProcessor);
+        audioProcessor.connect(audioContext.destination);
+        
+        showMessage('Połączenie z OpenAI ustanowione', 'success');
+    }
+    
+    // Queue a chunk of PCM16 reply audio from the relay
+    function playRelayAudio(base64Audio) {
+        if (!audioContext || !base64Audio) return;
+        const bytes = Uint8Array.from(atob(base64Audio), c => c.charCodeAt(0));
+        const pcm16 = new Int16Array(bytes.buffer, 0, bytes.length >> 1);
+        const buffer = audioContext.createBuffer(1, pcm16.length, relaySampleRate);
+        const channel = buffer.getChannelData(0);
+        for (let i = 0; i < pcm16.length; i++) {
+            channel[i] = pcm16[i] / 0x8000;
+        }
+        const node = audioContext.createBufferSource();
+        node.buffer = buffer;
+        node.connect(audioContext.destination);
+        playbackTime = Math.max(playbackTime, audioContext.currentTime);
+        node.start(playbackTime);
+        playbackTime += buffer.duration;
+    }
+    
     // Start listening mode
     function startListening() {
-        if (!peerConnection || !dataChannel) {
+        if (!relaySocket && (!peerConnection || !dataChannel)) {
             showMessage('Sesja nie została zainicjalizowana', 'error');
             return;
         }
@@ -417,12 +556,41 @@ document.addEventListener('DOMContentLoaded', () => {
             localStream = null;
         }
         
+        // Close the relay and its audio graph
+        if (relaySocket) {
+            const socket = relaySocket;
+            relaySocket = null;
+            socket.close();
+        }
+        if (audioProcessor) {
+            audioProcessor.disconnect();
+            audioProcessor = null;
+        }
+        if (audioContext) {
+            audioContext.close();
+            audioContext = null;
+            playbackTime = 0;
+        }
+        
         // Reset audio element
         if (audioElement) {
             audioElement.srcObject = null;
             audioElement = null;
         }
         
+        // Close the turn channel and the session event stream
+        closeTurnChannel();
+        closeEventStream();
+        lastEventSeq = 0;
+        
+        // Tell the backend the session is over so it can drop the mapping
+        if (sessionId) {
+            fetch(`/api/realtime/session/${encodeURIComponent(sessionId)}`, {
+                method: 'DELETE',
+                keepalive: true
+            }).catch(error => console.error('Błąd podczas kończenia sesji:', error));
+        }
+        
         // Reset application state
         ephemeralToken = null;
         sessionId = null;
@@ -525,6 +693,9 @@ document.addEventListener('DOMContentLoaded', () => {
             // Update conversation UI with transcription
             updateUserMessage(itemId, transcription);
             
+            // In relay mode the backend has already sent this turn to n8n
+            if (relaySocket) return;
+            
             // Forward transcription to n8n
             if (sessionId) {
                 console.log(`Przygotowanie do wysłania transkrypcji do n8n, sessionId: ${sessionId}`);
@@ -532,36 +703,26 @@ document.addEventListener('DOMContentLoaded', () => {
                 // Tworzenie danych do wysłania
                 const postData = {
                     transcription: transcription,
-                    session_id: sessionId
+                    session_id: sessionId,
+                    item_id: itemId  // Lets the backend drop duplicate deliveries of this turn
                 };
                 
                 console.log('Dane do wysłania:', postData);
                 
                 // Send transcription to our backend to forward to n8n
                 try {
-                    console.log('Wysyłanie do endpointu /api/forward-to-n8n');
-                    const response = await fetch('/api/forward-to-n8n', {
-                        method: 'POST',
-                        headers: {
-                            'Content-Type': 'application/json',
-                        },
-                        body: JSON.stringify(postData)
-                    });
-                    
-                    console.log('Otrzymano odpowiedź:', response.status);
-                    
-                    if (!response.ok) {
-                        const errorText = await response.text();
-                        throw new Error(`Nie udało się przekazać transkrypcji do n8n: ${response.status} - ${errorText}`);
-                    }
-                    
-                    // Log the response
-                    const responseData = await response.json();
+                    // One trace per turn links this call to the backend and n8n spans
+                    const traceparent = newTraceparent();
+                    const turnStart = performance.now();
+                    const responseData = await sendTurn(postData, traceparent);
                     console.log('Odpowiedź z n8n:', responseData);
                     
                     console.log('Transkrypcja przekazana do n8n');
+                    if (traceparent) {
+                        console.log(`Tura: ${Math.round(performance.now() - turnStart)} ms, trace_id: ${traceparent.split('-')[1]}`);
+                    }
                 } catch (fetchError) {
-                    console.error('Błąd podczas wysyłania fetch:', fetchError);
+                    console.error('Błąd podczas wysyłania transkrypcji:', fetchError);
                     throw fetchError;
                 }
             } else {
@@ -573,6 +734,182 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     }
     
+    // Open a WebSocket used for every turn of the conversation
+    function openTurnChannel() {
+        if (!sessionId || !('WebSocket' in window)) return;
+        
+        const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
+        const socket = new WebSocket(`${protocol}//${window.location.host}/api/ws/${encodeURIComponent(sessionId)}`);
+        
+        socket.onopen = () => {
+            console.log('Kanał tur otwarty');
+        };
+        socket.onmessage = (event) => {
+            let message;
+            try {
+                message = JSON.parse(event.data);
+            } catch (error) {
+                console.error('Niepoprawna wiadomość z kanału tur:', event.data);
+                return;
+            }
+            
+            // Results of async jobs arrive after the turn was accepted
+            if (message.seq !== undefined) {
+                handleSessionEvent(message, message.seq);
+                return;
+            }
+            
+            const pending = pendingTurns.get(message.id);
+            if (!pending) return;
+            pendingTurns.delete(message.id);
+            
+            if (message.type === 'n8n.chunk') {
+                // Streamed reply - keep the turn pending until n8n.done
+                pending.chunks.push(message.data.text);
+                console.log('Fragment odpowiedzi z n8n:', message.data.text);
+                pendingTurns.set(message.id, pending);
+            } else if (message.type === 'n8n.done') {
+                pending.resolve({ text: pending.chunks.join('') });
+            } else if (message.type === 'n8n.response') {
+                pending.resolve(message.data);
+            } else if (message.type === 'job.accepted') {
+                pending.resolve({ job_id: message.job_id });
+            } else if (message.type === 'error') {
+                pending.reject(new Error(`Nie udało się przekazać transkrypcji do n8n: ${message.status} - ${message.detail}`));
+            }
+        };
+        socket.onclose = () => {
+            console.log('Kanał tur zamknięty');
+            if (turnSocket === socket) {
+                turnSocket = null;
+                // Results of jobs already started now arrive over SSE
+                if (jobMode) openEventStream();
+            }
+            rejectPendingTurns(new Error('Kanał tur został zamknięty'));
+        };
+        socket.onerror = (event) => {
+            console.error('Błąd kanału tur', event);
+        };
+        
+        turnSocket = socket;
+    }
+    
+    // Close the turn channel and fail any turns still waiting for a reply
+    function closeTurnChannel() {
+        if (turnSocket) {
+            const socket = turnSocket;
+            turnSocket = null;
+            socket.close();
+        }
+        rejectPendingTurns(new Error('Sesja zakończona'));
+    }
+    
+    function rejectPendingTurns(error) {
+        pendingTurns.forEach(pending => pending.reject(error));
+        pendingTurns.clear();
+    }
+    
+    // Subscribe to the session's events over SSE (async job results and n8n callbacks)
+    function openEventStream() {
+        if (eventSource || !sessionId || !('EventSource' in window)) return;
+        
+        // The browser reconnects on its own, resuming from the last event id
+        const source = new EventSource(`/api/events/${encodeURIComponent(sessionId)}?after=${lastEventSeq}`);
+        ['job.completed', 'job.failed', 'n8n.callback'].forEach(type => {
+            source.addEventListener(type, (event) => {
+                let message;
+                try {
+                    message = JSON.parse(event.data);
+                } catch (error) {
+                    console.error('Niepoprawne zdarzenie sesji:', event.data);
+                    return;
+                }
+                handleSessionEvent(message, Number(event.lastEventId));
+            });
+        });
+        source.onerror = () => {
+            console.error('Błąd strumienia zdarzeń sesji');
+        };
+        eventSource = source;
+    }
+    
+    function closeEventStream() {
+        if (eventSource) {
+            eventSource.close();
+            eventSource = null;
+        }
+    }
+    
+    // Handle a session event from the turn channel or SSE; each event is handled once
+    function handleSessionEvent(message, seq) {
+        if (seq) {
+            if (seq <= lastEventSeq) return;
+            lastEventSeq = seq;
+        }
+        
+        if (message.type === 'job.completed' || message.type === 'n8n.callback') {
+            handleN8nReply(message.data, message.event);
+        } else if (message.type === 'job.failed') {
+            showMessage(`Błąd zadania n8n: ${message.status} - ${message.detail}`, 'error');
+        }
+    }
+    
+    // An n8n reply delivered later: log it like a synchronous reply and add
+    // the formatted conversation.item.create to the Realtime conversation
+    function handleN8nReply(data, realtimeEvent) {
+        console.log('Odpowiedź z n8n:', data);
+        if (realtimeEvent && dataChannel && dataChannel.readyState === 'open') {
+            dataChannel.send(JSON.stringify(realtimeEvent));
+        }
+    }
+    
+    // Start a W3C trace context, or null when the backend does not trace
+    function newTraceparent() {
+        if (!traceSampleRate || !window.crypto) return null;
+        const hex = (bytes) => Array.from(crypto.getRandomValues(new Uint8Array(bytes)), b => b.toString(16).padStart(2, '0')).join('');
+        const sampled = Math.random() < traceSampleRate;
+        return `00-${hex(16)}-${hex(8)}-${sampled ? '01' : '00'}`;
+    }
+    
+    function traceHeaders(headers, traceparent) {
+        return traceparent ? { ...headers, traceparent } : headers;
+    }
+    
+    // Send a turn over the WebSocket, falling back to HTTP when it is not open
+    async function sendTurn(postData, traceparent = null) {
+        if (turnSocket && turnSocket.readyState === WebSocket.OPEN) {
+            const id = `turn-${Date.now()}-${++turnMessageCounter}`;
+            console.log('Wysyłanie transkrypcji kanałem tur, id:', id);
+            return new Promise((resolve, reject) => {
+                pendingTurns.set(id, { resolve, reject, chunks: [] });
+                const message = { type: 'transcription', id, stream: !jobMode, job: jobMode, ...postData };
+                if (traceparent) message.traceparent = traceparent;
+                turnSocket.send(JSON.stringify(message));
+            });
+        }
+        
+        // Job results are pushed later; subscribe before the job can finish
+        if (jobMode) openEventStream();
+        
+        console.log('Wysyłanie do endpointu /api/forward-to-n8n');
+        const response = await fetch('/api/forward-to-n8n', {
+            method: 'POST',
+            headers: traceHeaders({
+                'Content-Type': 'application/json',
+            }, traceparent),
+            body: JSON.stringify({ ...postData, job: jobMode })
+        });
+        
+        console.log('Otrzymano odpowiedź:', response.status);
+        
+        if (!response.ok) {
+            const errorText = await response.text();
+            throw new Error(`Nie udało się przekazać transkrypcji do n8n: ${response.status} - ${errorText}`);
+        }
+        
+        return response.json();
+    }
+    
     // Create a new conversation entry
     function addConversationEntry(entryId, role) {
         // Check if we have too many entries and remove the oldest
@@ -4,14 +4,22 @@ Prosty plik uruchomieniowy dla aplikacji N8N Voice Interface z Realtime API
 import logging
 import os
 import json
+import asyncio
+from contextlib import asynccontextmanager
 from typing import Optional, Dict, Any
 from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.responses import JSONResponse
-from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 import uvicorn
-import requests
+import aiohttp
+
+from backend.http_client import start_http_client, close_http_client, get_http_client, get_pool_stats
+from backend.session_store import create_session_store
+from backend.circuit_breaker import n8n_breakers, CircuitOpenError, is_failure_status
+from backend.webhook import N8N_TIMEOUT
+from backend.admission import AdmissionController
+from backend.static_assets import create_static_app
 
 # Configure logging
 logging.basicConfig(
@@ -20,11 +28,21 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Application lifespan - owns the shared HTTP client pool
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await start_http_client()
+    try:
+        yield
+    finally:
+        await close_http_client()
+
 # Initialize FastAPI app
 app = FastAPI(
     title="N8N Voice Interface with Realtime API",
     description="A voice interface for n8n workflows using OpenAI's Realtime API",
-    version="2.0.0"
+    version="2.0.0",
+    lifespan=lifespan
 )
 
 # Add CORS middleware
@@ -36,12 +54,18 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Store active realtime sessions
-active_sessions = {}
+# Store active realtime sessions (TTL + LRU bounded, optionally shared by workers)
+active_sessions = create_session_store()
+
+# Bounds n8n calls per webhook host and per session
+admission = AdmissionController()
 
 # Constants for OpenAI API
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-REALTIME_API_URL = "https://api.openai.com/v1/realtime/sessions"
+REALTIME_API_URL = os.getenv("OPENAI_REALTIME_SESSIONS_URL", "https://api.openai.com/v1/realtime/sessions")
+OPENAI_CONNECT_TIMEOUT = float(os.getenv("OPENAI_CONNECT_TIMEOUT", "5"))
+OPENAI_READ_TIMEOUT = float(os.getenv("OPENAI_READ_TIMEOUT", "15"))
+OPENAI_TOTAL_TIMEOUT = float(os.getenv("OPENAI_TOTAL_TIMEOUT", "20"))
 
 # Model for the frontend configuration
 class FrontendConfig(BaseModel):
@@ -86,46 +110,71 @@ async def send_to_n8n(webhook_url: str, data: Dict[str, Any]) -> Dict[str, Any]:
             "Accept": "application/json"
         }
         
-        # Send the request
-        response = requests.post(webhook_url, headers=headers, json=payload)
+        # Fail fast while the webhook host is known to be unhealthy
+        breaker = n8n_breakers.get(webhook_url)
+        try:
+            breaker.before_call()
+        except CircuitOpenError as e:
+            logger.warning(f"Webhook call refused: {str(e)}")
+            return {"text": f"Error: {str(e)}", "retry_after": round(e.retry_after)}
         
-        # Check response
-        if response.status_code == 200:
-            try:
-                # Try to parse as JSON
-                response_text = response.text
-                logger.info(f"Webhook successful. Response: {response_text}")
-                
-                try:
-                    response_json = json.loads(response_text)
+        # Send the request over the shared connection pool
+        session = get_http_client()
+        healthy = None
+        try:
+            async with session.post(webhook_url, headers=headers, json=payload, timeout=N8N_TIMEOUT) as response:
+                response_text = await response.text()
+                healthy = not is_failure_status(response.status)
+            
+                # Check response
+                if response.status == 200:
+                    try:
+                        # Try to parse as JSON
+                        logger.info(f"Webhook successful. Response: {response_text}")
                     
-                    # Check if the response has a text field
-                    if isinstance(response_json, dict) and "text" in response_json:
-                        return response_json
-                    else:
-                        # Try to extract text from different formats
-                        if isinstance(response_json, dict):
-                            # Try common formats
-                            for key in ["message", "response", "content", "result"]:
-                                if key in response_json and isinstance(response_json[key], str):
-                                    return {"text": response_json[key]}
-                        
-                        # If response is just a string, wrap it
-                        if isinstance(response_json, str):
-                            return {"text": response_json}
+                        try:
+                            response_json = json.loads(response_text)
                         
-                        # If we can't find a text field, use the whole response as text
-                        return {"text": response_text}
-                except json.JSONDecodeError:
-                    # If it's not JSON, use the raw text
-                    return {"text": response_text}
-            except Exception as e:
-                logger.error(f"Error parsing webhook response: {str(e)}")
-                return {"text": "Error parsing response from webhook"}
-        else:
-            error_text = response.text
-            logger.error(f"Webhook failed with status {response.status_code}: {error_text}")
-            return {"text": f"Webhook error {response.status_code}"}
+                            # Check if the response has a text field
+                            if isinstance(response_json, dict) and "text" in response_json:
+                                return response_json
+                            else:
+                                # Try to extract text from different formats
+                                if isinstance(response_json, dict):
+                                    # Try common formats
+                                    for key in ["message", "response", "content", "result"]:
+                                        if key in response_json and isinstance(response_json[key], str):
+                                            return {"text": response_json[key]}
+                            
+                                # If response is just a string, wrap it
+                                if isinstance(response_json, str):
+                                    return {"text": response_json}
+                            
+                                # If we can't find a text field, use the whole response as text
+                                return {"text": response_text}
+                        except json.JSONDecodeError:
+                            # If it's not JSON, use the raw text
+                            return {"text": response_text}
+                    except Exception as e:
+                        logger.error(f"Error parsing webhook response: {str(e)}")
+                        return {"text": "Error parsing response from webhook"}
+                else:
+                    logger.error(f"Webhook failed with status {response.status}: {response_text}")
+                    return {"text": f"Webhook error {response.status}"}
+        except asyncio.TimeoutError:
+            healthy = False
+            logger.error(f"Webhook timed out: {webhook_url}")
+            return {"text": "Error: Webhook timed out"}
+        except aiohttp.ClientError:
+            healthy = False
+            raise
+        finally:
+            if healthy is True:
+                breaker.record_success()
+            elif healthy is False:
+                breaker.record_failure()
+            else:
+                breaker.release()
     
     except Exception as e:
         logger.error(f"Error sending webhook: {str(e)}", exc_info=True)
@@ -155,16 +204,22 @@ async def create_realtime_session() -> Dict[str, Any]:
             # Polish language configuration will be sent by client after connection
         }
         
-        # Make the API request
-        response = requests.post(REALTIME_API_URL, headers=headers, json=payload)
-        
-        # Check for errors
-        if response.status_code != 200:
-            logger.error(f"OpenAI API error: {response.status_code} - {response.text}")
-            raise Exception(f"Failed to create Realtime session: {response.text}")
-        
-        # Return session data including ephemeral token
-        session_data = response.json()
+        # Make the API request over the shared connection pool
+        timeout = aiohttp.ClientTimeout(
+            total=OPENAI_TOTAL_TIMEOUT,
+            sock_connect=OPENAI_CONNECT_TIMEOUT,
+            sock_read=OPENAI_READ_TIMEOUT
+        )
+        session = get_http_client()
+        async with session.post(REALTIME_API_URL, headers=headers, json=payload, timeout=timeout) as response:
+            # Check for errors
+            if response.status != 200:
+                error_text = await response.text()
+                logger.error(f"OpenAI API error: {response.status} - {error_text}")
+                raise Exception(f"Failed to create Realtime session: {error_text}")
+            
+            # Return session data including ephemeral token
+            session_data = await response.json()
         logger.info(f"Created Realtime session with ID: {session_data.get('id')}")
         
         return session_data
@@ -206,15 +261,25 @@ async def create_session(request: RealtimeSessionRequest):
         # Store webhook URL with session ID
         session_id = session_data.get('id')
         if session_id:
-            active_sessions[session_id] = {
+            await active_sessions.set(session_id, {
                 "webhook_url": request.webhook_url
-            }
+            })
         
         return session_data
     except Exception as e:
         logger.error(f"Error creating session: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+# End Realtime session endpoint
+@app.delete("/api/realtime/session/{session_id}")
+async def end_session(session_id: str):
+    """
+    End a Realtime session and forget its webhook mapping.
+    """
+    if not await active_sessions.delete(session_id):
+        raise HTTPException(status_code=404, detail="Session not found")
+    return {"status": "ended", "session_id": session_id}
+
 # Process n8n response for Realtime API
 @app.post("/api/realtime/n8n-response")
 async def process_n8n_response(response: N8nResponse):
@@ -244,7 +309,7 @@ async def n8n_webhook(session_id: str, request: Request):
     """
     try:
         # Get the webhook URL for this session
-        session = active_sessions.get(session_id)
+        session = await active_sessions.get(session_id)
         if not session:
             raise HTTPException(status_code=404, detail="Session not found")
             
@@ -258,6 +323,8 @@ async def n8n_webhook(session_id: str, request: Request):
         )
         
         return realtime_event
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error handling webhook: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -270,19 +337,22 @@ async def forward_to_n8n(data: N8nRealtimeResponse):
     """
     try:
         # Get the webhook URL for this session
-        session = active_sessions.get(data.session_id)
+        session = await active_sessions.get(data.session_id)
         if not session:
             raise HTTPException(status_code=404, detail="Session not found")
             
         webhook_url = session["webhook_url"]
         
-        # Send the transcription to n8n
-        n8n_response = await send_to_n8n(webhook_url, {
-            "transcription": data.transcription,
-            "session_id": data.session_id
-        })
+        # Send the transcription to n8n once admitted (429/503 with Retry-After otherwise)
+        async with admission.admit(webhook_url, data.session_id):
+            n8n_response = await send_to_n8n(webhook_url, {
+                "transcription": data.transcription,
+                "session_id": data.session_id
+            })
         
         return n8n_response
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error forwarding to n8n: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -304,7 +374,13 @@ async def health_check():
     """
     Health check endpoint to verify the API is running.
     """
-    return {"status": "ok"}
+    return {
+        "status": "ok",
+        "http_pool": get_pool_stats(),
+        "sessions": active_sessions.get_stats(),
+        "circuit_breakers": n8n_breakers.get_stats(),
+        "admission": admission.get_stats()
+    }
 
 # Statyczna ścieżka do plików frontendowych
 static_files_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "frontend")
@@ -312,7 +388,7 @@ static_files_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fr
 # Sprawdź, czy katalog frontend istnieje
 if os.path.exists(static_files_path):
     # Mount static files for the frontend
-    app.mount("/", StaticFiles(directory=static_files_path, html=True), name="frontend")
+    app.mount("/", create_static_app(static_files_path), name="frontend")
 else:
     logger.warning(f"Katalog frontend nie znaleziony: {static_files_path}")
 
@@ -0,0 +1,66 @@
+"""
+Shared fixtures: the local fakes from bench/fakes.py, served from a
+background thread, with the backend pointed at them.
+
+Upstream URLs are read by backend modules at import time, so the
+environment is set here, before any test module imports the backend.
+"""
+import os
+import socket
+import asyncio
+import threading
+
+import pytest
+from aiohttp import web
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+FAKES_PORT = _free_port()
+FAKES_URL = f"http://127.0.0.1:{FAKES_PORT}"
+# Latency of the fake OpenAI sessions endpoint (seconds)
+OPENAI_LATENCY = 0.5
+
+os.environ.update({
+    "OPENAI_API_KEY": "test-key",
+    "OPENAI_REALTIME_SESSIONS_URL": f"{FAKES_URL}/v1/realtime/sessions",
+    "OPENAI_REALTIME_URL": f"ws://127.0.0.1:{FAKES_PORT}/v1/realtime",
+    "REALTIME_SESSION_POOL_SIZE": "0",
+    "LOG_LEVEL": "WARNING",
+    "LOOP_MONITOR": "false",
+})
+
+from bench.fakes import create_app  # noqa: E402 - needs the environment above
+
+@pytest.fixture(scope="session")
+def fakes() -> str:
+    """
+    Serve the fake n8n webhook and OpenAI endpoints for the test session.
+
+    Returns:
+        Base URL of the fakes
+    """
+    loop = asyncio.new_event_loop()
+    runner = web.AppRunner(create_app(
+        n8n_latency=0.01,
+        openai_latency=OPENAI_LATENCY,
+        turn_bytes=4800,
+        transcribe_latency=0.05
+    ))
+    loop.run_until_complete(runner.setup())
+    loop.run_until_complete(web.TCPSite(runner, "127.0.0.1", FAKES_PORT).start())
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    yield FAKES_URL
+    asyncio.run_coroutine_threadsafe(runner.cleanup(), loop).result(timeout=5)
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join(timeout=5)
+    # Handlers of requests the client gave up on may still be sleeping
+    pending = asyncio.all_tasks(loop)
+    for task in pending:
+        task.cancel()
+    if pending:
+        loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+    loop.close()
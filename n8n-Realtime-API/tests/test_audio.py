@@ -0,0 +1,45 @@
+"""
+Packetising and gating of relayed audio.
+"""
+import array
+
+from backend.audio import AudioIngest, TARGET_RATE, AUDIO_PACKET_MS
+
+PACKET_SAMPLES = TARGET_RATE * AUDIO_PACKET_MS // 1000
+
+def _packets(values) -> bytes:
+    """
+    24 kHz PCM16 with one constant sample value per packet.
+    """
+    samples = array.array("h")
+    for value in values:
+        samples.extend([value] * PACKET_SAMPLES)
+    return samples.tobytes()
+
+def _values(packets) -> list:
+    return [array.array("h", bytes(packet))[0] for packet in packets]
+
+def test_frame_longer_than_the_ring_keeps_every_packet():
+    ingest = AudioIngest("pcm16", silence_gate=False)
+    slots = len(ingest.ring._ring) // ingest.ring.packet_bytes
+    values = list(range(1, 2 * slots + 3))
+
+    packets = ingest.feed(_packets(values))
+
+    assert _values(packets) == values
+    for packet, value in zip(packets, values):
+        assert set(array.array("h", bytes(packet))) == {value}
+
+def test_preroll_survives_a_frame_that_wraps_the_ring():
+    ingest = AudioIngest("pcm16", silence_gate=True)
+    preroll = ingest.gate.preroll_packets
+    slots = len(ingest.ring._ring) // ingest.ring.packet_bytes
+    # Too quiet to open the gate, so the last `preroll` packets are held
+    silence = list(range(1, preroll + 3))
+    assert ingest.feed(_packets(silence)) == []
+
+    # Speech long enough to reuse every slot before the gate sees it
+    speech = [1000 + n for n in range(slots - 1)]
+    packets = ingest.feed(_packets(speech))
+
+    assert _values(packets) == silence[-preroll:] + speech
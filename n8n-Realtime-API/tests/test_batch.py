@@ -0,0 +1,39 @@
+"""
+Batch forwarding through /api/forward-to-n8n/batch.
+"""
+import asyncio
+from urllib.parse import quote
+
+import httpx
+
+from backend.app import app
+
+GENUINE = "Error: disk full is what the log says"
+
+async def _batch(fakes: str) -> None:
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=10) as client:
+            genuine = await client.post("/api/realtime/session", json={"webhook_url": f"{fakes}/webhook/batch?text={quote(GENUINE)}"})
+            # The fake refuses unknown modes with 400
+            failing = await client.post("/api/realtime/session", json={"webhook_url": f"{fakes}/webhook/batch?mode=bogus"})
+
+            reply = await client.post("/api/forward-to-n8n/batch", json={"items": [
+                {"session_id": genuine.json()["id"], "transcription": "how is the disk"},
+                {"session_id": failing.json()["id"], "transcription": "how is the disk"},
+            ]})
+            assert reply.status_code == 200
+            body = reply.json()
+            results = body["results"]
+
+            # n8n output that reads like an error is still a successful item
+            assert results[0]["ok"]
+            assert results[0]["data"]["text"] == GENUINE
+
+            assert not results[1]["ok"]
+            assert results[1]["status"] == 502
+            assert results[1]["detail"] == "Error: Webhook returned status 400"
+            assert (body["items"], body["succeeded"], body["failed"]) == (2, 1, 1)
+
+def test_batch_tells_failed_calls_from_replies_reading_like_errors(fakes):
+    asyncio.run(_batch(fakes))
@@ -0,0 +1,46 @@
+"""
+n8n callbacks on /api/webhook/{session_id} only reach the session's
+clients when they answer a pending job or carry the shared secret.
+"""
+import asyncio
+
+import httpx
+
+from backend import jobs
+from backend.app import app, job_hub
+
+async def _callbacks(fakes: str, monkeypatch) -> None:
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=10) as client:
+            created = await client.post("/api/realtime/session", json={"webhook_url": f"{fakes}/webhook/callbacks"})
+            session_id = created.json()["id"]
+
+            # Unsolicited callbacks are formatted but not published
+            reply = await client.post(f"/api/webhook/{session_id}", json={"text": "spoofed"})
+            assert reply.status_code == 200
+            assert reply.json()["type"] == "conversation.item.create"
+            assert job_hub.last_sequence(session_id) == 0
+
+            # A job id that is not pending is refused
+            reply = await client.post(f"/api/webhook/{session_id}?job_id=0123abcd", json={"text": "spoofed"})
+            assert reply.status_code == 404
+            assert job_hub.last_sequence(session_id) == 0
+
+            # A pending job is completed and published
+            job_id = job_hub.create(session_id)
+            reply = await client.post(f"/api/webhook/{session_id}?job_id={job_id}", json={"text": "answer"})
+            assert reply.status_code == 200
+            assert job_hub.last_sequence(session_id) == 1
+
+            # With the shared secret configured, only callbacks presenting it are pushed
+            monkeypatch.setattr(jobs, "N8N_CALLBACK_SECRET", "s3cret")
+            headers = {jobs.CALLBACK_SECRET_HEADER: "wrong"}
+            await client.post(f"/api/webhook/{session_id}", json={"text": "spoofed"}, headers=headers)
+            assert job_hub.last_sequence(session_id) == 1
+            headers = {jobs.CALLBACK_SECRET_HEADER: "s3cret"}
+            await client.post(f"/api/webhook/{session_id}", json={"text": "pushed"}, headers=headers)
+            assert job_hub.last_sequence(session_id) == 2
+
+def test_callbacks_need_a_pending_job_or_the_secret(fakes, monkeypatch):
+    asyncio.run(_callbacks(fakes, monkeypatch))
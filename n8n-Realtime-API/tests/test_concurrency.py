@@ -0,0 +1,49 @@
+"""
+Session creation and n8n forwarding wait on slow upstreams; neither may
+hold up the other.
+"""
+import time
+import uuid
+import asyncio
+
+import httpx
+
+from backend.app import app
+from tests.conftest import OPENAI_LATENCY
+
+# Latency of the fake n8n webhook for this test (seconds)
+N8N_LATENCY = 0.5
+
+async def _overlap(fakes: str) -> float:
+    webhook_url = f"{fakes}/webhook/concurrency?latency={N8N_LATENCY}"
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=10) as client:
+            created = await client.post("/api/realtime/session", json={
+                "webhook_url": webhook_url,
+                "merge_window_ms": 0
+            })
+            assert created.status_code == 200
+            session_id = created.json()["id"]
+
+            started = time.perf_counter()
+            session, forwarded = await asyncio.gather(
+                client.post("/api/realtime/session", json={"webhook_url": webhook_url}),
+                client.post("/api/forward-to-n8n", json={
+                    "session_id": session_id,
+                    "transcription": f"concurrency {uuid.uuid4().hex}"
+                })
+            )
+            elapsed = time.perf_counter() - started
+
+    assert session.status_code == 200
+    assert forwarded.status_code == 200
+    return elapsed
+
+def test_session_creation_and_forwarding_overlap(fakes):
+    elapsed = asyncio.run(_overlap(fakes))
+
+    slowest = max(OPENAI_LATENCY, N8N_LATENCY)
+    assert elapsed >= slowest
+    # Run one after the other the two calls would take the sum of the latencies
+    assert elapsed < slowest + 0.6 * min(OPENAI_LATENCY, N8N_LATENCY)
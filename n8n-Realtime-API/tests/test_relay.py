@@ -0,0 +1,102 @@
+"""
+RealtimeRelay against the fake Realtime server and the fake n8n webhook.
+"""
+import math
+import time
+import array
+import asyncio
+
+import aiohttp
+
+from backend.relay import RealtimeRelay, RELAY_SAMPLE_RATE
+from backend.webhook import send_to_n8n
+from backend.http_client import start_http_client, close_http_client
+
+def _tone(seconds: float, frequency: float = 300.0, amplitude: float = 0.3) -> bytes:
+    """
+    24 kHz PCM16 sine tone, loud enough to pass the silence gate.
+    """
+    samples = array.array("h", (
+        int(amplitude * 32767 * math.sin(2 * math.pi * frequency * n / RELAY_SAMPLE_RATE))
+        for n in range(int(seconds * RELAY_SAMPLE_RATE))
+    ))
+    return samples.tobytes()
+
+async def _fake_stats(fakes: str) -> dict:
+    async with aiohttp.ClientSession() as session:
+        async with session.get(f"{fakes}/stats") as response:
+            return await response.json()
+
+async def _wait_for(condition, timeout: float = 5.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condition not met in time"
+        await asyncio.sleep(0.02)
+
+async def _round_trip(fakes: str) -> None:
+    await start_http_client()
+    events = []
+    turns = []
+
+    async def handle_turn(session_id, transcript, item_id):
+        turns.append((transcript, item_id))
+        return await send_to_n8n(f"{fakes}/webhook/relay", {"transcription": transcript, "session_id": session_id})
+
+    async def send_to_client(event):
+        events.append(event)
+
+    def assistant_items():
+        return [
+            event for event in events
+            if event.get("type") == "conversation.item.created" and event["item"].get("role") == "assistant"
+        ]
+
+    before = await _fake_stats(fakes)
+    relay = RealtimeRelay("relay_test", handle_turn, send_to_client)
+    await relay.connect()
+    pump = asyncio.create_task(relay.pump())
+    try:
+        # Shorter than the fake's turn size, so the commit makes it one turn
+        await relay.send_audio(_tone(0.05))
+        assert await relay.send_client_event({"type": "input_audio_buffer.commit"})
+
+        await _wait_for(lambda: assistant_items())
+
+        transcript, item_id = turns[0]
+        assert transcript.startswith("fake transcript of")
+        reply = next(event for event in events if event.get("type") == "n8n.response")
+        assert reply["item_id"] == item_id
+        assert reply["data"]["text"]
+        item = assistant_items()[0]["item"]
+        assert item["content"][0]["text"] == reply["data"]["text"]
+
+        after = await _fake_stats(fakes)
+        assert after["realtime_items_created"] - before["realtime_items_created"] == 1
+        assert after["webhook"] > before["webhook"]
+        assert relay.get_audio_stats()["bytes_out"] > 0
+    finally:
+        await relay.close()
+        await asyncio.wait_for(pump, 5)
+        await close_http_client()
+
+async def _send_after_close(fakes: str) -> None:
+    await start_http_client()
+    relay = RealtimeRelay("relay_closed", send_to_n8n, lambda event: asyncio.sleep(0))
+    await relay.connect()
+    pump = asyncio.create_task(relay.pump())
+    try:
+        await relay._upstream.close()
+        await asyncio.wait_for(pump, 5)
+
+        # Late audio and events are dropped instead of raising ConnectionResetError
+        await relay.send_audio(_tone(0.3))
+        assert await relay.send_client_event({"type": "input_audio_buffer.commit"})
+    finally:
+        await relay.close()
+        await close_http_client()
+
+def test_transcription_is_answered_by_n8n_and_injected(fakes):
+    asyncio.run(_round_trip(fakes))
+
+def test_sends_after_upstream_close_are_dropped(fakes):
+    asyncio.run(_send_after_close(fakes))
@@ -0,0 +1,88 @@
+"""
+RealtimeSessionPool against the fake OpenAI sessions endpoint.
+"""
+import time
+import asyncio
+
+from backend.session_pool import RealtimeSessionPool
+from backend.http_client import start_http_client, close_http_client
+from tests.conftest import OPENAI_LATENCY
+
+async def _wait_for(condition, timeout: float = 5.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condition not met in time"
+        await asyncio.sleep(0.02)
+
+async def _hits_misses_refill() -> None:
+    await start_http_client()
+    pool = RealtimeSessionPool(size=2, model_types=["standard"], retry_delay=0.1)
+    try:
+        await pool.start()
+        # Pre-minting fills the pool without any request
+        await _wait_for(lambda: pool.get_stats()["ready"]["standard"] == 2)
+        assert pool.minted == 2
+
+        # A pooled session comes back without waiting for OpenAI
+        started = time.perf_counter()
+        first, hit = await pool.acquire("standard")
+        assert hit
+        assert time.perf_counter() - started < OPENAI_LATENCY / 2
+        assert first["client_secret"]["value"]
+
+        second, hit = await pool.acquire("standard")
+        assert hit
+        assert second["id"] != first["id"]
+
+        # The pool is drained: the next caller mints its own session
+        started = time.perf_counter()
+        third, hit = await pool.acquire("standard")
+        assert not hit
+        assert time.perf_counter() - started >= OPENAI_LATENCY
+        assert third["id"] not in (first["id"], second["id"])
+
+        # Taken sessions are replaced in the background
+        await _wait_for(lambda: pool.get_stats()["ready"]["standard"] == 2)
+        stats = pool.get_stats()
+        assert (stats["hits"], stats["misses"], stats["errors"]) == (2, 1, 0)
+        assert stats["minted"] == 4
+    finally:
+        await pool.stop()
+        await close_http_client()
+
+async def _replaced_before_expiry() -> None:
+    await start_http_client()
+    # Fake sessions live 60 s; with min_ttl=58 each is usable for about 2 s
+    # and its replacement is minted during the last second of that
+    pool = RealtimeSessionPool(size=1, model_types=["standard"], min_ttl=58, refill_lead=1, retry_delay=0.1)
+    # Each pass of the refill loop prunes first, so this counts its iterations
+    passes = 0
+    prune = pool._prune
+
+    def counting_prune(model_type):
+        nonlocal passes
+        passes += 1
+        prune(model_type)
+
+    pool._prune = counting_prune
+    try:
+        await pool.start()
+        await _wait_for(lambda: pool.minted == 1)
+        original = pool._entries["standard"][0][1]["id"]
+
+        await _wait_for(lambda: pool.discarded == 1)
+        assert pool.minted >= 2
+        session, hit = await pool.acquire("standard")
+        assert hit
+        assert session["id"] != original
+        # Waiting for the replaced entry to go stale must not spin the loop
+        assert passes < 50
+    finally:
+        await pool.stop()
+        await close_http_client()
+
+def test_pool_hits_misses_and_refill(fakes):
+    asyncio.run(_hits_misses_refill())
+
+def test_pool_replaces_sessions_before_they_expire(fakes):
+    asyncio.run(_replaced_before_expiry())
@@ -0,0 +1,35 @@
+"""
+Failed n8n calls are told apart from n8n output by type, not by text.
+"""
+import asyncio
+from urllib.parse import quote
+
+from backend.webhook import send_to_n8n, stream_from_n8n, is_error_reply
+from backend.http_client import start_http_client, close_http_client
+
+PAYLOAD = {"transcription": "hello", "session_id": "webhook_test"}
+GENUINE = "Error: disk full is what the log says"
+
+async def _replies(fakes: str) -> None:
+    await start_http_client()
+    try:
+        reply = await send_to_n8n(f"{fakes}/webhook/genuine?text={quote(GENUINE)}", PAYLOAD)
+        assert reply["text"] == GENUINE
+        assert not is_error_reply(reply)
+
+        # The fake refuses unknown modes with 400
+        failed = await send_to_n8n(f"{fakes}/webhook/failing?mode=bogus", PAYLOAD)
+        assert is_error_reply(failed)
+        assert failed == {"text": "Error: Webhook returned status 400"}
+
+        chunks = [chunk async for chunk in stream_from_n8n(f"{fakes}/webhook/genuine?text={quote(GENUINE)}", PAYLOAD)]
+        assert "".join(chunk["text"] for chunk in chunks) == GENUINE
+        assert not any(is_error_reply(chunk) for chunk in chunks)
+
+        chunks = [chunk async for chunk in stream_from_n8n(f"{fakes}/webhook/failing?mode=bogus", PAYLOAD)]
+        assert len(chunks) == 1 and is_error_reply(chunks[0])
+    finally:
+        await close_http_client()
+
+def test_replies_starting_with_error_are_not_failures(fakes):
+    asyncio.run(_replies(fakes))